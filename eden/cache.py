@@ -0,0 +1,225 @@
+"""Functions for caching downloaded web pages on disk between runs."""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Location of the cache relative to the package directory
+CACHE_DIR = "data/temp/http_cache"
+# Total compressed bytes kept before the least recently used pages are evicted
+MAX_BYTES = 4 * 1024**3
+DAY = 24 * 60 * 60
+# Seconds a cached page stays fresh for each source, hosts not listed are never cached
+TTLS = {
+    "www.bestplaces.net": 180 * DAY,
+    "www.freedomfirstsociety.org": 30 * DAY,
+    "www.congress.gov": 180 * DAY,
+    "churchofjesuschristtemples.org": 30 * DAY,
+}
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of HTTP responses stored as gzip files.
+
+    Each response is keyed by the hash of its method, url and request body,
+    so the same POST query with a different payload gets its own entry.
+    An entry's modification time is its last access time, which lets
+    the least recently used entries be evicted once the cache is larger
+    than ``max_bytes``.
+
+    Parameters
+    ----------
+    directory : str
+        Folder where the compressed responses are stored.
+    max_bytes : int
+        Size budget for the folder. Eviction trims it to 90% of this.
+    ttls : dict[str, float]
+        Seconds each host's responses stay fresh.
+
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES, ttls: dict = None) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = TTLS if ttls is None else ttls
+        self.size = None
+        # Reentrant, evict removes entries while store holds the lock
+        self.lock = threading.RLock()
+
+    def path(self, method: str, url: str, body=None) -> str:
+        """Returns the file holding the response for a request."""
+        digest = hashlib.sha256(f"{method.upper()} {url}\n".encode())
+        if body:
+            digest.update(body if isinstance(body, bytes) else str(body).encode())
+        key = digest.hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.gz")
+
+    def ttl(self, url: str):
+        """Returns how long responses from this url stay fresh, None if uncached."""
+        return self.ttls.get(urlparse(url).netloc)
+
+    def load(self, method: str, url: str, body=None):
+        """
+        Returns the cached response for a request or None if missing or stale.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method, e.g. "GET" or "POST".
+        url : str
+            The requested url.
+        body : str | bytes
+            The request body, if any.
+
+        Returns
+        -------
+        response : requests.Response | None
+            The stored response with ``from_cache`` set to True.
+
+        """
+        ttl = self.ttl(url)
+        if ttl is None:
+            return None
+        path = self.path(method, url, body)
+        try:
+            header, content = self.read(path)
+        except (OSError, EOFError, ValueError):
+            return None
+
+        # Stale pages are dropped so they are fetched again
+        if time.time() - header["time"] > ttl:
+            self.remove(path)
+            return None
+        # Another thread may have evicted the entry since it was read
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+
+        response = requests.Response()
+        response.status_code = header["status"]
+        response.reason = header["reason"]
+        response.url = url
+        response.encoding = header["encoding"]
+        response.headers.update(header["headers"])
+        response._content = content
+        response.from_cache = True
+
+        return response
+
+    def read(self, path: str) -> tuple[dict, bytes]:
+        """Returns the stored header and raw content of a single entry."""
+        with gzip.open(path, "rb") as cachef:
+            header = json.loads(cachef.readline())
+            content = cachef.read()
+
+        return header, content
+
+    def store(self, method: str, url: str, body, response: requests.Response) -> None:
+        """Compresses and stores a successful response, evicting old entries if needed."""
+        if self.ttl(url) is None or response.status_code != 200:
+            return
+        path = self.path(method, url, body)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {
+            "url": url,
+            "time": time.time(),
+            "status": response.status_code,
+            "reason": response.reason,
+            "encoding": response.encoding,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+        }
+
+        # Write to a temporary file so a crash never leaves a partial entry
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, "wb") as cachef:
+            cachef.write(json.dumps(header).encode() + b"\n")
+            cachef.write(response.content)
+
+        with self.lock:
+            # An entry stored again replaces the old one, only the difference in size is added
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            os.replace(temp_path, path)
+            if self.size is None:
+                self.size = self.disk_usage()
+            else:
+                self.size += os.path.getsize(path) - old_size
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def forget(self, method: str, url: str, body=None) -> None:
+        """Drops the cached response for a request so it is downloaded again."""
+        self.remove(self.path(method, url, body))
+
+    def remove(self, path: str) -> None:
+        """Deletes a single entry, ignoring entries already removed."""
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            if self.size is not None:
+                self.size -= size
+
+    def entries(self) -> list[os.DirEntry]:
+        """Lists every stored entry."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if e.name.endswith(".gz"))
+        return entries
+
+    def disk_usage(self) -> int:
+        """Returns the total bytes used by stored entries."""
+        return sum(entry.stat().st_size for entry in self.entries())
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until under 90% of the budget."""
+        with self.lock:
+            entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+            self.size = sum(entry.stat().st_size for entry in entries)
+            for entry in entries:
+                if self.size <= self.max_bytes * 0.9:
+                    break
+                self.remove(entry.path)
+
+
+_cache = None
+
+
+def configure_cache(directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES, ttls: dict = None) -> ResponseCache:
+    """
+    Creates the module-level response cache used by eden.fetch.
+
+    Pass ``ttls={}`` to turn caching off for every host.
+
+    Returns
+    -------
+    cache : ResponseCache
+        The newly configured shared cache.
+
+    """
+    global _cache
+    _cache = ResponseCache(directory, max_bytes, ttls)
+
+    return _cache
+
+
+def get_cache() -> ResponseCache:
+    """Returns the shared cache, creating it with the defaults if needed."""
+    if _cache is None:
+        configure_cache()
+    return _cache
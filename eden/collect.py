@@ -1,20 +1,46 @@
 """Functions for collecting geographical features for all cities in the US."""
 
 import json
+import eden.cache as cache
+import eden.extract as extract
+import eden.fetch as fetch
+import eden.geo as geo
+import eden.integration as integration
+import eden.match as match
 import eden.process as process
+import eden.schema as schema
+import eden.storage as storage
+import functools
+import multiprocessing
 import os
 import pandas as pd
 from bs4 import BeautifulSoup
-import requests
-from urllib.request import urlretrieve
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
 import shutil
-import re
 import time
 import random
-from requests.packages.urllib3.exceptions import InsecureRequestWarning  # MAC
 from zipfile import ZipFile
 
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+# Downloaded NIBRS state tables and census county population estimates
+NIBRS_ZIP = "data/temp/nibrs-statetables-2022.zip"
+COUNTY_POP_XLSX = "data/temp/co-est2022-pop.xlsx"
+# Features collected for every place from the BestPlaces climate, health and housing pages
+PLACE_FEATURES = {
+    "climate": ["HotScore", "ColdScore", "ClimateScore", "Rainfall", "Snowfall", "Precipitation",
+                "Sunshine", "UV", "Elevation", "Above90", "Below30", "Below0"],
+    "health": ["Physicians", "HealthCosts", "WaterQuality", "AirQuality"],
+    "housing": ["Median Home Age", "Property Tax Rate", "Median Home Cost"],
+}
+# Days a collected place stays fresh for each BestPlaces source before refresh_places collects it again
+REFRESH_TTLS = {
+    "climate": 365,
+    "health": 180,
+    "housing": 90,
+    "voting": 365,
+}
 
 
 def get_places() -> pd.DataFrame:
@@ -42,11 +68,9 @@ def get_places() -> pd.DataFrame:
     if not os.path.exists("data/temp"):
         os.mkdir("data/temp")
     # Check if Place data already exists
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-        if "Place" in base_df:
-            place_df = pd.read_csv("data/base.csv", keep_default_na=False)
-            place_df = place_df[["Place", "StateCode"]]
+    if storage.exists("base"):
+        if "Place" in storage.columns("base"):
+            place_df = storage.read("base", columns=["Place", "StateCode"])
             print("Place data exists in Base.")
             return place_df
     elif os.path.isfile("data/temp/places.csv"):
@@ -68,7 +92,7 @@ def get_places() -> pd.DataFrame:
     # Loop through all state pages using the base url and each state code
     for index, state_code in enumerate(state_codes):
         print(f"Retrieving Places for {state_names[index]}.")
-        result = requests.get(base_state_url + state_code, verify=False)
+        result = fetch.get(base_state_url + state_code)
         doc = BeautifulSoup(result.text, "html.parser")
 
         # Select the div containing the place list and grab name from end of href
@@ -109,122 +133,78 @@ def get_counties(place_df: pd.DataFrame) -> pd.DataFrame:
         place_df with additional county information added.
     """
 
-    # Look for county complete data, checkpoint, or no data
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-        if "County" in base_df:
-            print("County data exists in Base.")
-            county_df = base_df[["Place", "StateCode", "County"]]
-            return county_df
-    elif os.path.isfile("data/temp/county_checkpoint.csv"):
-        print("Partial county data exists in checkpoint.")
-        county_df = pd.read_csv(
-            "data/temp/county_checkpoint.csv", keep_default_na=False
-        )
-    elif os.path.isfile("data/temp/county_raw.csv"):
+    # Look for county complete data, raw data, checkpoint, or no data
+    if storage.exists("base") and "County" in storage.columns("base"):
+        print("County data exists in Base.")
+        county_df = storage.read("base", columns=["Place", "StateCode", "County"])
+        return county_df
+    checkpoint = integration.Checkpoint("county", ["Place", "StateCode"], path="data/temp/county_raw.csv")
+    if checkpoint.exists():
         print("Raw county data exists.")
-        county_df = pd.read_csv("data/temp/county_raw.csv")
+        county_df = pd.read_csv(checkpoint.path)
         return county_df
-    else:
-        print("No county data exists.")
-        county_df = place_df.assign(County="").reset_index(drop=True)
+    county_df = checkpoint.resume(place_df.assign(County="").reset_index(drop=True), fill=True)
 
     # Loop through the county dataframe to generate url skip if already exists
     base_place_url = "https://www.bestplaces.net/city/"
     state_dict = process.state_codes()
-    for index, row in county_df.iterrows():
-        place = row["Place"]
-        code = row["StateCode"]
-        state = state_dict[code]
-        county = row["County"]
-
-        # If the county has already been found, continue
-        if county:
-            continue
-
-        # Identify and format the county name
-        result = requests.get(f"{base_place_url}/{state}/{place}", verify=False)
-        doc = BeautifulSoup(result.text, "html.parser")
-        county_parent = doc.find("b", text=re.compile(r"County:"))
-        # Skip cities that return a 401 error and label with a "?"
-        if county_parent != None:
-            county_raw = county_parent.find_next_sibling().find("a").text
-            county = county_raw.strip().lower()
-        else:
-            county = "?"
+    urls = [
+        (index, f"{base_place_url}/{state_dict[row['StateCode']]}/{row['Place']}")
+        for index, row in county_df.iterrows()
+        if not checkpoint.done(row["Place"], row["StateCode"])
+    ]
+
+    def store_county(index, county):
+        place = county_df.loc[index, "Place"]
+        code = county_df.loc[index, "StateCode"]
         county_df.loc[index, "County"] = county
 
-        # Save the counties out to a checkpoint file
+        # Save the counties out to the checkpoint journal
         print(f"Collected {place}, {code}")
-        county_df.to_csv("./data/temp/county_checkpoint.csv", index=False)
+        checkpoint.add({"Place": place, "StateCode": code, "County": county})
 
-    # Save out the finalized data and delete the checkpoint file
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
+    with checkpoint:
+        # Identify and format the county names in the parser processes
+        # Pages without a county are recorded as "?"
+        fetch.fetch_all(urls, store_county, parser=extract.parse_county, retry_queue=fetch.RetryQueue("county"),
+                        on_parse_error=lambda index, error: store_county(index, extract.MISSING))
 
-    # After the data has been collected write to csv and delete the checkpoint
-    county_df.to_csv("data/temp/county_raw.csv", index=False)
-    os.remove("data/temp/county_checkpoint.csv")
+    # After the data has been collected write to csv and delete the checkpoints
+    checkpoint.promote(county_df, expected=zip(county_df["Place"], county_df["StateCode"]))
 
     return county_df
 
 
-def get_congressional_districts() -> pd.DataFrame:
+def get_congressional_districts(boundaries: str = geo.DISTRICTS_FILE) -> pd.DataFrame:
     """
-    Retrieves congressional districts from 2020 and appends them to the base dataframe.
+    Assigns congressional districts and appends them to the base dataframe.
 
-    This function retrieves the data and adds it to the final df.
+    Districts are found offline by testing every city's latitude and
+    longitude against local district boundary polygons in one batch.
+
+    Parameters
+    ----------
+    boundaries : str
+        GeoJSON file with the congressional district boundaries.
 
     Returns
     -------
     districts_df : pd.DataFrame
         The base dataframe with the appended congressional district data.
     """
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-    if os.path.isfile("data/temp/districts_raw.csv"):
+    districts_df = storage.read("base")
+    if "CongressionalDistrict" in districts_df and (districts_df["CongressionalDistrict"].fillna("") != "").all():
         print("Districts data exists.")
-        districts_df = pd.read_csv("data/temp/districts_raw.csv", keep_default_na=False)
-        districts_df.to_csv("data/base.csv", index=False)
-
         return districts_df
-    elif os.path.isfile("data/temp/districts_checkpoint.csv"):
-        print("Partial districts data exists.")
-        districts_df = pd.read_csv(
-            "data/temp/districts_checkpoint.csv", keep_default_na=False
-        )
-    else:
-        print("No districts data exists.")
-        districts_df = base_df if "CongressionalDistrict" in base_df else base_df.assign(CongressionalDistrict="").reset_index(drop=True)
-
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
-
-    for ind in base_df.index:
-        lat = base_df["Latitude"][ind]
-        long = base_df["Longitude"][ind]
-        district = districts_df["CongressionalDistrict"][ind]
-
-        if district:
-            continue
-
-        url = f"https://api.mapbox.com/v4/govtrack.cd-117-2020/tilequery/{long},{lat}.json?radius=0&access_token="
-
-        result = requests.get(url, verify=False).json()
-        state = result["features"][0]["properties"]["state"]
-        district_no = result["features"][0]["properties"]["number"]
-        district = f"{state}-{district_no}"
-        districts_df.loc[ind, "CongressionalDistrict"] = district
-
-        # Save the districts out to a checkpoint file
-        print(f"Collected {ind}, {district}")
-
-        districts_df.to_csv("./data/temp/districts_checkpoint.csv", index=False)
+    if not os.path.isfile(boundaries):
+        print(f"No district boundaries exist, save the census congressional district GeoJSON to {boundaries}.")
+        return districts_df
 
-    # After the data has been collected write to csv and delete the checkpoint
-    districts_df.to_csv("data/temp/districts_raw.csv", index=False)
-    os.remove("data/temp/districts_checkpoint.csv")
-    districts_df.to_csv("data/base.csv", index=False)
+    print("Assigning congressional districts from local boundaries.")
+    districts_df["CongressionalDistrict"] = geo.assign_districts(
+        districts_df["Latitude"], districts_df["Longitude"], boundaries
+    )
+    storage.write("base", districts_df)
 
     return districts_df
 
@@ -243,85 +223,86 @@ def get_districts_by_bioguide_ids() -> pd.DataFrame:
     congresses = [112, 113, 114, 115, 116, 117, 118]
     sessions = ["1", "2"]
     parties = ["republican", "democrat"]
-    # TODO extract this csv logic into a function to be used everwhere possibly
     csv_name = "bioguide_district_info"
+    columns = ["BioguideIds"] + [str(congress) for congress in congresses]
 
-    if os.path.isfile(f"data/{csv_name}.csv"):
+    checkpoint = integration.Checkpoint(csv_name, ["BioguideIds"])
+    if checkpoint.exists():
         print("Districts data exists.")
-        df = pd.read_csv(f"data/{csv_name}.csv", keep_default_na=False)
+        df = pd.read_csv(checkpoint.path, keep_default_na=False)
 
         return df
-    elif os.path.isfile(f"data/temp/{csv_name}_checkpoint.csv"):
-        print("Partial districts data exists.")
-        df = pd.read_csv(f"data/temp/{csv_name}_checkpoint.csv", keep_default_na=False)
-    else:
-        print("No districts data exists.")
-        df = pd.DataFrame(columns=["BioguideIds"] + congresses)
-
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
-
-    for congress in congresses:
-        for session in sessions:
-            for party in parties:
-                payload = json.dumps({
-                    "congress": congress,
-                    "session": session,
-                    "branch": "house",
-                    "party": party
-                })
+    # Index the representatives that have already been collected
+    df = checkpoint.resume(pd.DataFrame(columns=columns))
+
+    # Every representative appears in several sessions, look each one up once
+    queries = [
+        {"congress": congress, "session": session, "branch": "house", "party": party}
+        for congress in congresses for session in sessions for party in parties
+    ]
+    members: dict[str, tuple[str, str]] = {}
+    for response in _query_scorecards(queries):
+        for voter in response["votes"]:
+            bioguide_id = voter["voter_meta"]["bioguide_id"]
+            if not checkpoint.done(bioguide_id):
+                members.setdefault(bioguide_id, (voter["voter_meta"]["name"], voter["voter_meta"]["state"]))
+    print(f"Looking up {len(members)} representatives.")
+
+    # TODO: Url is no longer accessible by BeautifulSoup. Find a new way to collect districts by term
+    urls = [
+        (bioguide_id, f"https://www.congress.gov/member/{name}/{bioguide_id}")
+        for bioguide_id, (name, state) in members.items()
+    ]
+
+    def store_member(bioguide_id, terms):
+        state = members[bioguide_id][1]
+        congress_info = {column: "" for column in columns}
+        congress_info["BioguideIds"] = bioguide_id
+        for term_congresses, district_no in terms:
+            for term_congress in term_congresses:
+                if term_congress in congresses:
+                    congress_info[str(term_congress)] = f"{state}-{district_no:02d}"
+        rows.append(congress_info)
+        checkpoint.add(congress_info)
+        print(congress_info)
+
+    rows: list[dict] = []
+    with checkpoint:
+        # Members whose page has no profile are recorded without districts
+        fetch.fetch_all(urls, store_member, parser=extract.parse_member_terms,
+                        retry_queue=fetch.RetryQueue(csv_name),
+                        on_parse_error=lambda bioguide_id, error: store_member(bioguide_id, []))
+
+    # After the data has been collected build the frame once, write to csv and delete the checkpoints
+    df = pd.concat([df, pd.DataFrame(rows, columns=columns)], ignore_index=True)
+    checkpoint.promote(df, expected=[(bioguide_id,) for bioguide_id in members])
 
-                print(payload)
-
-                response = requests.request("POST", "https://www.freedomfirstsociety.org/wp-admin/admin-ajax.php?action=scorecard_query_bills", headers={
-                    'Content-Type': 'application/json'
-                }, data=payload).json()
-
-                for voter in response["votes"]:
-                    bioguide_id = voter["voter_meta"]["bioguide_id"]
-
-                    name = voter["voter_meta"]["name"]
-                    state = voter["voter_meta"]["state"]
-
-                    if bioguide_id in df["BioguideIds"].values:
-                        continue
+    return df
 
-                    # TODO: Url is no longer accessible by BeautifulSoup. Find a new way to collect districts by term
-                    representative_url = f'https://www.congress.gov/member/{name}/{bioguide_id}'
-                    result = requests.get(representative_url, verify=False)
-                    representative_html = BeautifulSoup(result.text, "html.parser").find(
-                        "div", {"class": "overview-member-column-profile"}).findAll("th", {"class": "member_chamber"})
-                    congress_info = {"BioguideIds": bioguide_id, 112: "", 113: "", 114: "", 115: "", 116: "", 117: "", 118: ""}
 
-                    for member_chamber in representative_html:
-                        district_text = member_chamber.findNext("td").getText()
-                        district_text_pieces = district_text.split()
-                        term_congresses_text = district_text_pieces[-2]
-                        term_congresses = re.findall(r'\d+', term_congresses_text)
-                        term_congresses = [int(c) for c in term_congresses]
+def _query_scorecards(queries: list[dict]) -> list[dict]:
+    """
+    Runs Freedom First Society scorecard queries concurrently.
 
-                        if len(term_congresses) > 1:
-                            term_congresses = list(range(term_congresses[0], term_congresses[1]+1))
+    Parameters
+    ----------
+    queries : list[dict]
+        Payloads with the congress, session, branch and party to query.
 
-                        if "District At Large" in district_text or "District" not in district_text:
-                            district = f'{state}-00'
-                        else:
-                            district_no = int(district_text_pieces[district_text_pieces.index('District') + 1])
-                            district = f'{state}-0{district_no}' if district_no < 10 else f'{state}-{district_no}'
+    Returns
+    -------
+    responses : list[dict]
+        The decoded bills and votes of each query, in the same order.
+    """
+    url = "https://www.freedomfirstsociety.org/wp-admin/admin-ajax.php?action=scorecard_query_bills"
 
-                        for term_congress in term_congresses:
-                            if term_congress not in congresses:
-                                continue
-                            congress_info[term_congress] = district
+    def query(payload):
+        print(payload)
+        return fetch.post(url, headers={"Content-Type": "application/json"}, data=json.dumps(payload)).json()
 
-                    df_dictionary = pd.DataFrame([congress_info])
-                    df = pd.concat([df, df_dictionary], ignore_index=True)
-                    print(congress_info)
-                    df.to_csv(f"data/temp/{csv_name}_checkpoint.csv", index=False)
+    with ThreadPoolExecutor(max_workers=fetch.CONCURRENCY) as executor:
+        return list(executor.map(query, queries))
 
-    # After the data has been collected write to csv and delete the checkpoint
-    df.to_csv(f"data/{csv_name}.csv", index=False)
-    os.remove(f"data/temp/{csv_name}_checkpoint.csv")
 
 def get_percent_constitutionality(update=False) -> pd.DataFrame:
     """
@@ -338,119 +319,52 @@ def get_percent_constitutionality(update=False) -> pd.DataFrame:
     if not update:
         return
     
-    congress_to_years = {
-        112: {
-            "1": 2011,
-            "2":2012
-        },
-        113: {
-            "1":2013,
-            "2": 2014
-        },
-        114: {
-            "1":2015,
-            "2": 2016
-        },
-        115: {
-            "1": 2017,
-            "2": 2018
-        },
-        116: {
-            "1":2019,
-            "2": 2020
-        },
-        117: {
-            "1":2021,
-            "2": 2022
-        },
-        118: {
-            "1":2023,
-            "2": 2024
-        }
-    }
     congresses = [112, 113, 114, 115, 116, 117, 118]
     sessions = ["1", "2"]
     branches = ["house", "senate"]
     parties = ["republican", "democrat"]
-
-    house_info = {2011: {}, 2012:{}, 2013: {}, 2014: {}, 2015:{}, 2016:{}, 2017:{}, 2018:{}, 2019:{}, 2020:{}, 2021:{}, 2022:{}, 2023: {}, 2024: {}}
-    senate_info = {2011: {}, 2012:{}, 2013: {}, 2014: {}, 2015:{}, 2016:{}, 2017:{}, 2018:{}, 2019:{}, 2020:{}, 2021:{}, 2022:{}, 2023: {}, 2024: {}}
-    bioguide_district_info = pd.read_csv(f"data/bioguide_district_info.csv", keep_default_na=False)
-
-    for congress in congresses:
-        for session in sessions:
-            year = congress_to_years[congress][session]
-            for branch in branches:
-                for party in parties:
-                    payload = json.dumps({
-                        "congress": congress,
-                        "session": session,
-                        "branch": branch,
-                        "party": party
-                    })
-
-                    print(payload)
-
-                    response = requests.request("POST", "https://www.freedomfirstsociety.org/wp-admin/admin-ajax.php?action=scorecard_query_bills", headers={
-                        'Content-Type': 'application/json'
-                    }, data=payload).json()
-
-                    for voter in response["votes"]:
-                        bioguide_id = voter["voter_meta"]["bioguide_id"]
-                        state = voter["voter_meta"]["state"]
-
-                        if branch == "senate":
-                            if state not in senate_info[year]:
-                                senate_info[year][state] = {"correct_votes": 0, "incorrect_votes": 0, "total_votes": 0, "constitutional": 0}
-
-                            for bill_no, bill_info in response["bills"].items():
-                                if (bill_no not in voter):
-                                    continue      
-                                senate_info[year][state]["total_votes"] += 1
-
-                                if bill_info["correct_vote"] == voter[bill_no]:
-                                    senate_info[year][state]["correct_votes"] += 1
-                                else:
-                                    senate_info[year][state]["incorrect_votes"] += 1
-                                senate_info[year][state]["constitutional"] =  round(senate_info[year][state]["correct_votes"] / senate_info[year][state]["total_votes"], 2)
-                                
-                            continue
-
-                        district = bioguide_district_info.loc[bioguide_district_info['BioguideIds'] == bioguide_id][str(congress)].iloc[0]
-
-                        if not district:
-                            print(f"District doesn't exist for {bioguide_id} during congress {congress}")
-
-                            continue
-
-                        if district not in house_info[year]:
-                            house_info[year][district] = {"state": state, "correct_votes": 0, "incorrect_votes": 0, "total_votes": 0, "constitutional": 0}
-
-                        for bill_no, bill_info in response["bills"].items():  
-                            if (bill_no not in voter):
-                                continue
-                            house_info[year][district]["total_votes"] += 1
-
-                            if bill_info["correct_vote"] == voter[bill_no]:
-                                house_info[year][district]["correct_votes"] += 1
-                            else:
-                                house_info[year][district]["incorrect_votes"] += 1
-                            house_info[year][district]["constitutional"] =  round(house_info[year][district]["correct_votes"] / house_info[year][district]["total_votes"], 2)
-
-    df = pd.DataFrame(columns=["CongressionalDistrict", "Branch", "Year", "Constitutional (0-1)", "State"])
-    
-    for year in range(2011, 2025):
-        for district in house_info[year]:
-            state = house_info[year][district]["state"]
-            constitutional = house_info[year][district]["constitutional"]
-            voting_info = {"CongressionalDistrict": district, "Branch": "house", "Year": year, "Constitutional (0-1)": constitutional, "State": state}
-            df_dictionary = pd.DataFrame([voting_info])
-            df = pd.concat([df, df_dictionary], ignore_index=True)
-        for state in senate_info[year]:
-            constitutional = senate_info[year][state]["constitutional"]
-            voting_info = {"CongressionalDistrict": "N\A", "Branch": "senate", "Year": year, "Constitutional (0-1)": constitutional, "State": state}
-            df_dictionary = pd.DataFrame([voting_info])
-            df = pd.concat([df, df_dictionary], ignore_index=True)
+    columns = ["CongressionalDistrict", "Branch", "Year", "Constitutional (0-1)", "State"]
+
+    queries = [
+        {"congress": congress, "session": session, "branch": branch, "party": party}
+        for congress in congresses for session in sessions for branch in branches for party in parties
+    ]
+
+    # Flatten every scorecard into one long table with a row per vote
+    votes = []
+    for query, response in zip(queries, _query_scorecards(queries)):
+        # The 112th congress sat in 2011 and 2012, one session per year
+        year = 2011 + 2 * (query["congress"] - 112) + int(query["session"]) - 1
+        for voter in response["votes"]:
+            bioguide_id = voter["voter_meta"]["bioguide_id"]
+            state = voter["voter_meta"]["state"]
+            for bill_no, bill_info in response["bills"].items():
+                if bill_no in voter:
+                    votes.append((query["congress"], year, query["branch"], bioguide_id, state, bill_no, voter[bill_no], bill_info["correct_vote"]))
+    votes = pd.DataFrame(votes, columns=["Congress", "Year", "Branch", "BioguideIds", "State", "Bill", "Vote", "CorrectVote"])
+    votes["Correct"] = votes["Vote"] == votes["CorrectVote"]
+
+    # Look up each representative's district for the congress they voted in
+    bioguide_district_info = pd.read_csv(f"data/bioguide_district_info.csv", keep_default_na=False, dtype=str)
+    districts = bioguide_district_info.melt(id_vars="BioguideIds", var_name="Congress", value_name="CongressionalDistrict")
+    districts["Congress"] = districts["Congress"].astype(int)
+    house = votes[votes["Branch"] == "house"].merge(districts, on=["BioguideIds", "Congress"], how="left")
+    missing = house["CongressionalDistrict"].isna() | (house["CongressionalDistrict"] == "")
+    for bioguide_id, congress in house.loc[missing, ["BioguideIds", "Congress"]].drop_duplicates().itertuples(index=False):
+        print(f"District doesn't exist for {bioguide_id} during congress {congress}")
+    house = house[~missing]
+
+    # Senators are grouped by state and representatives by district
+    senate = votes[votes["Branch"] == "senate"].assign(CongressionalDistrict="N\\A")
+    house = house.groupby(["Year", "CongressionalDistrict"], sort=False).agg(
+        State=("State", "first"), Constitutional=("Correct", "mean")).reset_index()
+    senate = senate.groupby(["Year", "State"], sort=False).agg(
+        CongressionalDistrict=("CongressionalDistrict", "first"), Constitutional=("Correct", "mean")).reset_index()
+
+    df = pd.concat([house.assign(Branch="house"), senate.assign(Branch="senate")], ignore_index=True)
+    df = df.sort_values(["Year", "Branch"], kind="stable", ignore_index=True)
+    df["Constitutional"] = df["Constitutional"].round(2)
+    df = df.rename(columns={"Constitutional": "Constitutional (0-1)"})[columns]
 
     df.to_csv(f"data/constitutional_voting_info.csv", index=False)
 
@@ -471,78 +385,42 @@ def collect_voting_data(update=False):
     """
     csv_name = "voting"
 
-    if os.path.isfile(f"data/{csv_name}.csv") and not update:
-        print("Districts data exists.")
-        df = pd.read_csv(f"data/{csv_name}.csv", keep_default_na=False)
+    checkpoint = _place_checkpoint(csv_name)
+    if checkpoint.exists() and not update:
+        print("Voting data exists.")
+        df = pd.read_csv(checkpoint.path, keep_default_na=False)
 
         return df
-    elif os.path.isfile(f"data/temp/{csv_name}_checkpoint.csv"):
-        print("Partial voting data exists.")
-        df = pd.read_csv(f"data/temp/{csv_name}_checkpoint.csv", keep_default_na=False)
-    else:
-        print("No voting data exists.")
-        df = pd.DataFrame(columns=["Date", "Place", "StateCode", "RepVote", "DemVote"])
-
-
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
 
-    base_df = pd.read_csv("data/base.csv")
-    base_df = base_df[["Place", "StateCode"]]
+    base_df = storage.read("base", columns=["Place", "StateCode"])
     base_place_url = "https://www.bestplaces.net"
     state_dict = process.state_codes()
-    # df_last_row = df.iloc[-1]
-    start = False
-
-    for index, row in base_df.iterrows():
-        place = row["Place"]
-        code = row["StateCode"]
-
-        state = state_dict[code]
-        default_timeline = [2000, 2004, 2008, 2012, 2016, 2020, 2024]
-
-        # if df_last_row["Place"] == place and df_last_row["StateCode"] == code and df_last_row["Date"] == "2020-01-01":
-        #     start = True
-            
-        #     continue
-
-        # if not start:
-        #     continue
-
-        url = f"{base_place_url}/voting/city/{state}/{place}"
-        result = requests.get(url, verify=False)
-        # TODO: update after next election because html has changed. However, current data is up to date
-        html = BeautifulSoup(result.text, "html.parser").findAll(
-            "div", {"class": "card-body m-0 p-0"})
-
-        try:
-            chart_javscript = html[2].find("script").text
-            lists = [l.strip("][\"").split(",") for l in re.findall(r'\[.*?\]', chart_javscript)]
-            timeline, democrat, republican, _ = lists
-            timeline = [int(year.strip("\' ")) for year in timeline]
-            democrat = [float(percentage) for percentage in democrat]
-            republican = [float(percentage) for percentage in republican]
-        except:
-            democrat = ["?", "?", "?", "?", "?", "?", "?"]
-            republican = ["?", "?", "?", "?", "?", "?", "?"]
-            timeline = default_timeline
 
-        voting_data = []
+    # Places already in the checkpoint or journal are skipped
+    df = checkpoint.resume(*_empty_table(csv_name))
+    urls = [
+        (index, f"{base_place_url}/voting/city/{state_dict[row['StateCode']]}/{row['Place']}")
+        for index, row in base_df.iterrows()
+        if not checkpoint.done(row["Place"], row["StateCode"])
+    ]
 
-        for index, year in enumerate(timeline):
-            voting_info = {
-                "Date":f"{year}-01-01", "Place":place, "StateCode":code, "RepVote":republican[index], "DemVote":democrat[index]
-            }
-            voting_data.append(voting_info)
+    # TODO: update after next election because html has changed. However, current data is up to date
+    def store_voting(index, record):
+        place = base_df.loc[index, "Place"]
+        code = base_df.loc[index, "StateCode"]
 
-        df_dictionary = pd.DataFrame(voting_data)
-        df = pd.concat([df, df_dictionary], ignore_index=True)
+        voting_data = _place_rows("voting", place, code, record)
+        rows.extend(voting_data)
+        for voting_info in voting_data:
+            checkpoint.add(voting_info)
 
-        time.sleep(float(random.uniform(0, 2)))
+    rows: list[dict] = []
+    with checkpoint:
+        fetch.fetch_all(urls, store_voting, parser=extract.parse_voting, retry_queue=fetch.RetryQueue(csv_name),
+                        on_parse_error=lambda index, error: store_voting(index, None))
+    df = pd.concat([df, pd.DataFrame(rows, columns=df.columns)], ignore_index=True)
 
-        df.to_csv(f"data/temp/{csv_name}_checkpoint.csv", index=False)
-
-    df.to_csv(f"data/{csv_name}.csv", index=False)
+    checkpoint.promote(df, expected=zip(base_df["Place"], base_df["StateCode"]))
 
     return df
 
@@ -559,70 +437,41 @@ def collect_housing_data():
     """
     csv_name = "housing"
 
-    if os.path.isfile(f"data/{csv_name}.csv"):
+    checkpoint = _place_checkpoint(csv_name)
+    if storage.exists(csv_name):
         print(f"{csv_name} data exists.")
-        df = pd.read_csv(f"data/{csv_name}.csv", keep_default_na=False, low_memory=False)
+        df = storage.read(csv_name)
 
         return df
-    elif os.path.isfile(f"data/temp/{csv_name}_checkpoint.csv"):
-        print(f"Partial {csv_name} data exists.")
-        df = pd.read_csv(f"data/temp/{csv_name}_checkpoint.csv", keep_default_na=False)
-    else:
-        print(f"No {csv_name} data exists.")
-        df = pd.DataFrame()
-
-
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
 
-    base_df = pd.read_csv("data/base.csv")
-    base_df = base_df[["Place", "StateCode"]]
+    base_df = storage.read("base", columns=["Place", "StateCode"])
     base_place_url = "https://www.bestplaces.net"
     state_dict = process.state_codes()
-    df_last_row = {"Place": "", "StateCode": ""} if df.empty else df.iloc[-1]
-    start = False
-
-    for index, row in base_df.iterrows():
-        place = row["Place"]
-        code = row["StateCode"]
-        housing_data = {"Place": place, "StateCode":code}
-        state = state_dict[code]
-
-        
-        if df.empty:
-            start = True
-        elif (df_last_row["Place"] == place and df_last_row["StateCode"] == code):
-            start = True
-            
-            continue
-
-        if not start:
-            continue
-
-        url = f"{base_place_url}/housing/city/{state}/{place}"
-        result = requests.get(url, verify=False)
-        html = BeautifulSoup(result.text, "html.parser").find(
-            "table", {"id": "mainContent_dgHousing"})
-
-        try:
-            for table_row in html.find_all("tr", class_=lambda x: x != 'header'):
-                title = table_row.find("u")
 
-                if title == None:
-                    continue
-                housing_data[title.text] = (table_row.find_all("td")[1]).text
-        except:
-            for column in df.columns:
-                housing_data[column] = "?"
+    # Pages arrive out of order so resume from the set of collected places
+    df = checkpoint.resume(*_empty_table(csv_name))
+    urls = [
+        (index, f"{base_place_url}/housing/city/{state_dict[row['StateCode']]}/{row['Place']}")
+        for index, row in base_df.iterrows()
+        if not checkpoint.done(row["Place"], row["StateCode"])
+    ]
 
-        df_dictionary = pd.DataFrame([housing_data])
-        df = pd.concat([df, df_dictionary], ignore_index=True)
+    # Pages without a housing table are recorded with "?" features
+    def store_housing(index, record):
+        place = base_df.loc[index, "Place"]
+        code = base_df.loc[index, "StateCode"]
+        housing_data = _place_rows("housing", place, code, record)[0]
 
-        time.sleep(float(random.uniform(0, 2)))
+        rows.append(housing_data)
+        checkpoint.add(housing_data)
 
-        df.to_csv(f"data/temp/{csv_name}_checkpoint.csv", index=False)
+    rows: list[dict] = []
+    with checkpoint:
+        fetch.fetch_all(urls, store_housing, parser=extract.parse_housing, retry_queue=fetch.RetryQueue(csv_name),
+                        on_parse_error=lambda index, error: store_housing(index, None))
+    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
 
-    df.to_csv(f"data/{csv_name}.csv", index=False)
+    checkpoint.promote(df, expected=zip(base_df["Place"], base_df["StateCode"]))
 
     return df
 
@@ -637,55 +486,58 @@ def collect_temple_data(update=False):
     """
     csv_name = "temples"
 
-    if os.path.isfile(f"data/{csv_name}.csv") and not update:
+    # States are collected one at a time, so a resumed collection skips the states already done
+    checkpoint = integration.Checkpoint(csv_name, ["State"])
+    if checkpoint.exists() and not update:
         print("Temples data exists.")
-        df = pd.read_csv(f"data/{csv_name}.csv", keep_default_na=False)
+        df = pd.read_csv(checkpoint.path, keep_default_na=False)
 
         return df
-    else:
-        df = pd.DataFrame(columns=["Name", "Latitude", "Longitude"])
-
-    if not os.path.exists("data/temp"):
-        os.mkdir("data/temp")
+    df = checkpoint.resume(pd.DataFrame(columns=["Name", "Latitude", "Longitude", "State"]))
 
     domain = "https://churchofjesuschristtemples.org"
 
     state_dict = process.state_codes()
-    for code in state_dict:
-        state = state_dict[code].replace("_", "-" )
-        url = f"{domain}/statistics/locations/united-states/{state}"
-        result = requests.get(url, verify=False)
-        statistics_table = BeautifulSoup(result.text, "html.parser").find('table', class_="statistics")
+    with checkpoint:
+        for code in state_dict:
+            if checkpoint.done(code):
+                continue
+            state = state_dict[code].replace("_", "-" )
+            url = f"{domain}/statistics/locations/united-states/{state}"
+            result = fetch.get(url)
+            statistics_table = BeautifulSoup(result.text, "html.parser").find('table', class_="statistics")
 
-        if statistics_table == None:
-            continue
+            if statistics_table == None:
+                continue
 
-        table_rows = statistics_table.find_all('tr', attrs={'data-href' : True})
-        temple_path = table_rows[0]["data-href"]
-        url = f"{domain}{temple_path}"
-        temple_html = BeautifulSoup(result.text, "html.parser").find_all("script")
-        buildings = temple_html[-2].text.split("var locations = ")[1].split(";")[0][1:-1].split(",\n")
-        temple_data = []
-        for building_string in buildings:
-            if "temple" not in building_string:
+            table_rows = statistics_table.find_all('tr', attrs={'data-href' : True})
+            temple_path = table_rows[0]["data-href"]
+            url = f"{domain}{temple_path}"
+            temple_html = BeautifulSoup(result.text, "html.parser").find_all("script")
+            buildings = temple_html[-2].text.split("var locations = ")[1].split(";")[0][1:-1].split(",\n")
+            temple_data = []
+            for building_string in buildings:
+                if "temple" not in building_string:
+                    continue
+                temple_info = building_string[1:-1].split(", ")
+                temple_name = temple_info[0][1:-1]
+                temple_lat = float(temple_info[1])
+                temple_long = float(temple_info[2])
+                temple_data.append({
+                    "Name":temple_name, "Latitude":temple_lat, "Longitude":temple_long, "State": code
+                })
+
+            if len(temple_data) == 0:
                 continue
-            temple_info = building_string[1:-1].split(", ")
-            temple_name = temple_info[0][1:-1]
-            temple_lat = float(temple_info[1])
-            temple_long = float(temple_info[2])
-            temple_data.append({
-                "Name":temple_name, "Latitude":temple_lat, "Longitude":temple_long
-            })
-
-        if len(temple_data) == 0:
-            continue
 
-        df_dictionary = pd.DataFrame(temple_data)
-        df = pd.concat([df, df_dictionary], ignore_index=True)
+            for temple in temple_data:
+                checkpoint.add(temple)
+            df_dictionary = pd.DataFrame(temple_data)
+            df = pd.concat([df, df_dictionary], ignore_index=True)
 
-        time.sleep(float(random.uniform(0, 2)))
+            time.sleep(float(random.uniform(0, 2)))
 
-    df.to_csv(f"data/{csv_name}.csv", index=False)
+    checkpoint.promote(df)
 
     return df
 
@@ -702,24 +554,20 @@ def download_geodata() -> pd.DataFrame:
     """
 
     # Look for geodata exists
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-        if "Fips" in base_df:
+    if storage.exists("base"):
+        if "Fips" in storage.columns("base"):
             print("Geodata data exists in Base data.")
-            geodata_df = pd.read_csv("data/base.csv", keep_default_na=False)
-            geodata_df = geodata_df[
-                [
-                    "City",
-                    "StateCode",
-                    "Fips",
-                    "County",
-                    "Latitude",
-                    "Longitude",
-                    "Population",
-                    "Density",
-                    "Zip",
-                ]
-            ]
+            geodata_df = storage.read("base", columns=[
+                "City",
+                "StateCode",
+                "Fips",
+                "County",
+                "Latitude",
+                "Longitude",
+                "Population",
+                "Density",
+                "Zip",
+            ])
             return geodata_df
     elif os.path.isfile("data/temp/geodata_raw.csv"):
         print("Raw geodata exists.")
@@ -731,7 +579,8 @@ def download_geodata() -> pd.DataFrame:
     unpack_loc = "data/temp"
     url = "https://simplemaps.com//static/data/us-cities/1.75/basic/simplemaps_uscities_basicv1.75.zip"
     zip_loc = f"{unpack_loc}/geodata.zip"
-    urlretrieve(url, zip_loc)
+    with fetch.get(url, stream=True) as response, open(zip_loc, "wb") as zipf:
+        shutil.copyfileobj(response.raw, zipf)
 
     # Unpack the zip file and then delete the unused files
     shutil.unpack_archive(zip_loc, unpack_loc)
@@ -766,74 +615,44 @@ def get_climate(base_df: pd.DataFrame) -> pd.DataFrame:
         Base dataframe with all key city identifiers.
     """
     # Check if the current main dataframe already contains the climate data
-    if os.path.isfile("data/climate.csv"):
+    checkpoint = _place_checkpoint("climate")
+    if storage.exists("climate"):
         print("Climate data exists.")
-        climate_df = pd.read_csv("data/climate.csv")
+        climate_df = storage.read("climate")
         return climate_df
-    # Check if it is currently being collected (deleted when finished)
-    elif os.path.isfile("data/temp/climate_checkpoint.csv"):
-        print("Partial climate data exists.")
-        climate_df = pd.read_csv("data/temp/climate_checkpoint.csv", keep_default_na=False)
-    # Data collection never started
-    else:
-        print("No climate data exists.")
-        base_df = pd.read_csv("data/base.csv")
-        base_df = base_df[["Place", "StateCode"]]
-        climate_df = base_df.assign(HotScore="", ColdScore="", ClimateScore="", Rainfall="", Snowfall="", Precipitation="",
-                                    Sunshine="", UV="", Elevation="", Above90="", Below30="", Below0="").reset_index(drop=True)
+    # Resume from the places collected so far (deleted when finished)
+    climate_df = _with_tracking(checkpoint.resume(*_empty_table("climate")))
 
     # Loop through the cities to generate URL, skip if already exists
     base_place_url = "https://www.bestplaces.net"
     state_dict = process.state_codes()
-    for index, row in climate_df.iterrows():
-        feature_list: list[str] = []
-        place = row["Place"]
-        code = row["StateCode"]
-        state = state_dict[code]
-        ft = ["HotScore", "ColdScore", "ClimateScore", "Rainfall", "Snowfall",
-              "Precipitation", "Sunshine", "UV", "Elevation", "Above90", "Below30", "Below0"]
-        # If all features are already in the row continue without collecting
-        if all([row[f] for f in ft]):
-            continue
-        # Retrieve web page as a BS4 object
-        url = f"{base_place_url}/climate/city/{state}/{place}"
-        result = requests.get(url, verify=False)
-        doc = BeautifulSoup(result.text, "html.parser")
-
-        # Get the climate scores
-        score = doc.find("div", class_="display-4").string
-        hot, cold = map(float, score.strip().split("/"))
-        climate = round((hot + cold) / 2.0, 2)
-        feature_list.extend([hot, cold, climate])
-
-        # Get rainfall, snowfall, precipitation, sunshine, uv, and elevation
-        table = doc.find_all('table')[0]
-        for r in table.find_all('tr'):
-            rows = r.find_all('td')[1].text.strip()
-            feature_list.append(rows)
-
-        # Remove rows containing unuseful features
-        feature_list = [v for i, v in enumerate(feature_list) if i not in [3, 8, 9, 10]]
-
-        # Get days above 90°, days below 30°, and days below 0°
-        above90_tag = doc.find('h6', text=re.compile('over 90°')).text
-        above90 = float(above90_tag.split(",")[1].split(" ")[3])
-        below30_tag = doc.find('h6', text=re.compile('falls below freezing')).text
-        below30 = float(below30_tag.split(",")[1].split(" ")[3])
-        below0_tag = doc.find('h6', text=re.compile('falls below zero°')).text
-        below0 = float(below0_tag.split(",")[1].split(" ")[3])
-        feature_list.extend([above90, below30, below0])
+    ft = PLACE_FEATURES["climate"]
+    # If all features are already in the row continue without collecting
+    urls = [
+        (index, f"{base_place_url}/climate/city/{state_dict[row['StateCode']]}/{row['Place']}")
+        for index, row in climate_df.iterrows()
+        if not checkpoint.done(row["Place"], row["StateCode"])
+    ]
+
+    # Pages that fail to parse are recorded with "?" features, like any other missing value
+    def store_climate(index, record):
+        place = climate_df.loc[index, "Place"]
+        code = climate_df.loc[index, "StateCode"]
+        climate_data = _place_rows("climate", place, code, record)[0]
 
         # Add the data to the dataframe
-        climate_df.loc[index, ft] = feature_list
+        climate_df.loc[index, ft + schema.TRACKING_COLUMNS] = [
+            climate_data[f] for f in ft + schema.TRACKING_COLUMNS]
 
-        # Save df to checkpoint every 50 cities in case you lose connection
-        climate_df.to_csv("./data/temp/climate_checkpoint.csv", index=False)
+        # Journal the row, flushed every 50 cities in case you lose connection
+        checkpoint.add(climate_data)
         print(f"Collected {place}, {code}")
-        time.sleep(float(random.uniform(0, 2)))
 
-    climate_df.to_csv("data/climate.csv", index=False)
-    # os.remove("data/temp/climate_checkpoint.csv")
+    with checkpoint:
+        fetch.fetch_all(urls, store_climate, parser=extract.parse_climate, retry_queue=fetch.RetryQueue("climate"),
+                        on_parse_error=lambda index, error: store_climate(index, None))
+
+    checkpoint.promote(climate_df, expected=zip(climate_df["Place"], climate_df["StateCode"]))
 
     return climate_df
 
@@ -855,74 +674,334 @@ def get_health(base_df: pd.DataFrame) -> pd.DataFrame:
     health_df : pd.DataFrame
         Dataframe with raw health scores.
     """
-    # Check if the current main dataframe already contains the climate data
-    if os.path.isfile("data/health.csv"):
+    # Check if the current main dataframe already contains the health data
+    checkpoint = _place_checkpoint("health")
+    if storage.exists("health"):
         print("Health data exists.")
-        health_df = pd.read_csv("data/health.csv")
+        health_df = storage.read("health")
         return health_df
-    # Check if it is currently being collected (deleted when finished)
-    elif os.path.isfile("data/temp/health_checkpoint.csv"):
-        print("Partial health data exists.")
-        health_df = pd.read_csv("data/temp/health_checkpoint.csv", keep_default_na=False)
-    # Data collection never started
-    else:
-        print("No health data exists.")
-        base_df = pd.read_csv("data/base.csv")
-        base_df = base_df[["Place", "StateCode"]]
-        health_df = base_df.assign(Physicians="", HealthCosts="", WaterQuality="",
-                                   AirQuality="").reset_index(drop=True)
+    # Resume from the places collected so far (deleted when finished)
+    health_df = _with_tracking(checkpoint.resume(*_empty_table("health")))
 
     # Loop through the cities to generate URL, skip if already exists
     base_place_url = "https://www.bestplaces.net"
     state_dict = process.state_codes()
-    for index, row in health_df.iterrows():
-        feature_list: list[str] = []
-        place = row["Place"]
-        code = row["StateCode"]
-        state = state_dict[code]
-        ft = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality"]
-        # If all features are already in the row continue without collecting
-        if all([row[f] for f in ft]):
+    ft = PLACE_FEATURES["health"]
+    # If all features are already in the row continue without collecting
+    urls = [
+        (index, f"{base_place_url}/health/city/{state_dict[row['StateCode']]}/{row['Place']}")
+        for index, row in health_df.iterrows()
+        if not checkpoint.done(row["Place"], row["StateCode"])
+    ]
+
+    def store_health(index, record):
+        place = health_df.loc[index, "Place"]
+        code = health_df.loc[index, "StateCode"]
+
+        # Physicians, health cost index, water quality, and air quality
+        health_data = _place_rows("health", place, code, record)[0]
+        health_df.loc[index, ft + schema.TRACKING_COLUMNS] = [
+            health_data[f] for f in ft + schema.TRACKING_COLUMNS]
+
+        # Journal the row, flushed every 50 cities in case you lose connection
+        checkpoint.add(health_data)
+        print(f"Collected {place}, {code}")
+
+    with checkpoint:
+        fetch.fetch_all(urls, store_health, parser=extract.parse_health, retry_queue=fetch.RetryQueue("health"),
+                        on_parse_error=lambda index, error: store_health(index, None))
+
+    checkpoint.promote(health_df, expected=zip(health_df["Place"], health_df["StateCode"]))
+
+    return health_df
+
+
+@functools.lru_cache(maxsize=None)
+def source_version(source: str) -> str:
+    """Returns the version of a BestPlaces source's parser, it changes whenever the parser's code does."""
+    return integration.code_version([extract.PARSERS[source]])[:12]
+
+
+def _place_rows(source: str, place: str, code: str, record) -> list[dict]:
+    """
+    Converts a parsed BestPlaces page into the rows journaled for its source.
+
+    Every row records when it was collected and the version of the parser used.
+    A record of None stands for a page the parser rejected, its features are "?".
+    """
+    tracking = {
+        "CollectedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "SourceVersion": source_version(source),
+    }
+    if record is None and source == "voting":
+        record = extract.parse_voting("")
+    elif record is None:
+        return [{"Place": place, "StateCode": code, **{f: extract.MISSING for f in PLACE_FEATURES[source]}, **tracking}]
+    if source == "voting":
+        return [
+            {"Date": f"{year}-01-01", "Place": place, "StateCode": code, "RepVote": republican, "DemVote": democrat,
+             **tracking}
+            for year, republican, democrat in zip(record.Timeline, record.RepVote, record.DemVote)
+        ]
+    if source == "housing":
+        return [{"Place": place, "StateCode": code, **record.values, **tracking}]
+
+    return [{"Place": place, "StateCode": code, **asdict(record), **tracking}]
+
+
+def _with_tracking(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds empty tracking columns to tables collected before rows were tracked."""
+    for column in schema.TRACKING_COLUMNS:
+        if column not in df:
+            df[column] = ""
+
+    return df
+
+
+def _place_checkpoint(source: str) -> integration.Checkpoint:
+    """Returns the checkpoint of a BestPlaces source, keyed by place."""
+    save = (lambda df: storage.write(source, df)) if source in storage.TABLES else None
+
+    return integration.Checkpoint(source, ["Place", "StateCode"], path=storage.csv_path(source), save=save)
+
+
+def _empty_table(source: str) -> tuple[pd.DataFrame, bool]:
+    """
+    Creates the table a BestPlaces source starts collecting into.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Climate and health tables have a row for every place with empty
+        features, housing and voting tables start without rows.
+    fill : bool
+        Whether collected rows fill in the table's rows instead of being appended.
+    """
+    if source in ("climate", "health"):
+        base_df = storage.read("base", columns=["Place", "StateCode"])
+        empty = {column: "" for column in PLACE_FEATURES[source] + schema.TRACKING_COLUMNS}
+        return base_df.assign(**empty).reset_index(drop=True), True
+    if source == "voting":
+        return pd.DataFrame(columns=["Date", "Place", "StateCode", "RepVote", "DemVote", *schema.TRACKING_COLUMNS]), False
+
+    return pd.DataFrame(), False
+
+
+def collect_places(sources: tuple = ("climate", "health", "housing", "voting")) -> None:
+    """
+    Scrapes every BestPlaces source for each place in a single pass.
+
+    A place is one unit of work. Its climate, health, housing and voting
+    pages are requested together over the shared connection and each
+    parsed page is recorded in its own source's journal.
+    One pass over base.csv refills every feature table, after which each
+    source's checkpoint is promoted to its finished csv. Sources with
+    pages that could not be fetched keep their checkpoint for the next run.
+
+    Parameters
+    ----------
+    sources : tuple[str]
+        The BestPlaces sources to collect.
+    """
+    base_df = storage.read("base", columns=["Place", "StateCode"])
+    base_place_url = "https://www.bestplaces.net"
+    state_dict = process.state_codes()
+
+    # Each source resumes from its own checkpoint
+    checkpoints = {}
+    for source in sources:
+        checkpoint = _place_checkpoint(source)
+        if checkpoint.exists():
+            print(f"{source.capitalize()} data exists.")
             continue
-        # Retrieve web page as a BS4 object
-        url = f"{base_place_url}/health/city/{state}/{place}"
-        result = requests.get(url, verify=False)
-        doc = BeautifulSoup(result.text, "html.parser")
+        checkpoint.resume(*_empty_table(source))
+        checkpoints[source] = checkpoint
 
-        # Get the health cost index, water quality, and air quality
-        health = doc.find_all("div", class_="display-4")
-        try:
-            healthcost = float(health[0].get_text().replace(" ", "").split("/")[0])
-        except:
-            healthcost = "?"
-        try:
-            waterquality = float(health[1].get_text().replace(" ", "").split("/")[0])
-        except:
-            waterquality = "?"
+    # Urls are ordered by place so all pages of a place are requested together
+    urls = []
+    for index, row in base_df.iterrows():
+        place = row["Place"]
+        code = row["StateCode"]
+        for source, checkpoint in checkpoints.items():
+            if checkpoint.done(place, code):
+                continue
+            url = f"{base_place_url}/{source}/city/{state_dict[code]}/{place}"
+            urls.append(((index, source), url, extract.PARSERS[source]))
+    print(f"Collecting {len(urls)} pages for {len(base_df)} places.")
+
+    def store_page(key, record):
+        index, source = key
+        place = base_df.loc[index, "Place"]
+        code = base_df.loc[index, "StateCode"]
+        for row in _place_rows(source, place, code, record):
+            checkpoints[source].add(row)
+        print(f"Collected {source} for {place}, {code}")
+
+    with ExitStack() as stack:
+        for checkpoint in checkpoints.values():
+            stack.enter_context(checkpoint)
+        fetch.fetch_all(urls, store_page, retry_queue=fetch.RetryQueue("bestplaces"),
+                        on_parse_error=lambda key, error: store_page(key, None))
+
+    # Write out each source's final csv from its checkpoint without fetching again
+    unfinished = []
+    for source, checkpoint in checkpoints.items():
+        df = checkpoint.resume(*_empty_table(source))
+        if source in ("climate", "health"):
+            df = _with_tracking(df)
         try:
-            airquality = float(health[3].get_text().replace(" ", "").split("/")[0])
-        except:
-            airquality = "?"
+            checkpoint.promote(df, expected=zip(base_df["Place"], base_df["StateCode"]))
+        except RuntimeError as error:
+            print(error)
+            unfinished.append(source)
+    if unfinished:
+        raise RuntimeError(f"Run collect_places again to finish {', '.join(unfinished)}.")
 
-        # Get the number of physicians per 10,000 people
-        try:
-            physicians_text = BeautifulSoup(result.text, "html.parser").find(text=re.compile(r'physicians per'))
-            physicians = physicians_text.split(" ")[2]
-        except:
-            physicians = "?"
 
-        # Add to the feature list and then the dataframe
-        feature_list.extend([physicians, healthcost, waterquality, airquality])
-        health_df.loc[index, ft] = feature_list
+def _read_place_table(source: str) -> pd.DataFrame:
+    """Reads a finished BestPlaces source's table."""
+    if source in storage.TABLES:
+        return storage.read(source)
 
-        # Save df to checkpoint every 50 cities in case you lose connection
-        health_df.to_csv("./data/temp/health_checkpoint.csv", index=False)
-        print(f"Collected {place}, {code}")
-        time.sleep(float(random.uniform(0, 2)))
+    return pd.read_csv(storage.csv_path(source), keep_default_na=False)
 
-    health_df.to_csv("data/health.csv", index=False)
 
-    return health_df
+def stale_places(
+    df: pd.DataFrame, source: str, cutoff: datetime, state: str = None, missing: bool = False
+) -> list[tuple[str, str]]:
+    """
+    Lists the places of a BestPlaces source's table to collect again.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The source's table.
+    source : str
+        One of "climate", "health", "housing" or "voting".
+    cutoff : datetime
+        Places collected before this time are stale, as are places without
+        a collection time and places collected by an older parser.
+    state : str
+        Select the places of one state instead, e.g. "ut".
+    missing : bool
+        Select the places with a "?" or empty feature instead.
+        Combined with ``state`` only that state's places are checked.
+
+    Returns
+    -------
+    places : list[tuple[str, str]]
+        The (Place, StateCode) pairs, least recently collected first.
+    """
+    if "CollectedAt" in df:
+        collected_at = pd.to_datetime(df["CollectedAt"], utc=True, errors="coerce")
+    else:
+        collected_at = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+
+    if state or missing:
+        selected = pd.Series(True, index=df.index)
+        if state:
+            selected &= df["StateCode"] == state
+        if missing:
+            features = df.drop(columns=["Place", "StateCode", "Date", *schema.TRACKING_COLUMNS], errors="ignore")
+            selected &= (features.isna() | features.astype(str).isin([schema.MISSING, ""])).any(axis=1)
+    else:
+        version = df["SourceVersion"].astype(str) if "SourceVersion" in df else ""
+        selected = collected_at.isna() | (collected_at < cutoff) | (version != source_version(source))
+
+    # Voting tables have a row per election, a place is as old as its oldest row
+    places = df.loc[selected, ["Place", "StateCode"]].assign(CollectedAt=collected_at[selected])
+    oldest = places.groupby(["Place", "StateCode"], sort=False, observed=True)["CollectedAt"].min()
+
+    return list(oldest.sort_values(na_position="first").index)
+
+
+def refresh_places(
+    sources: tuple = ("climate", "health", "housing", "voting"),
+    state: str = None,
+    missing: bool = False,
+    limit: int = None,
+    ttls: dict = None,
+) -> dict:
+    """
+    Collects the stale places of finished BestPlaces sources again.
+
+    By default a place is stale once it is older than its source's TTL,
+    see stale_places for the filters selecting places instead. Only the
+    selected pages are requested, their cached copies are dropped first
+    so they are downloaded again. The new rows replace the place's old
+    rows, places whose page fails keep their old rows. A refresh that is
+    interrupted resumes from its own journal.
+
+    Parameters
+    ----------
+    sources : tuple[str]
+        The BestPlaces sources to refresh.
+    state : str
+        Refresh every place of one state, e.g. "ut".
+    missing : bool
+        Refresh every place with a "?" or empty feature.
+    limit : int
+        Maximum number of places refreshed per source, least recently
+        collected first, so a rolling refresh can run often at a fraction
+        of the cost of a full collection.
+    ttls : dict[str, float]
+        Days each source stays fresh, defaults to REFRESH_TTLS.
+
+    Returns
+    -------
+    refreshed : dict[str, int]
+        Number of places refreshed for each source.
+    """
+    ttls = REFRESH_TTLS if ttls is None else ttls
+    now = datetime.now(timezone.utc)
+    base_place_url = "https://www.bestplaces.net"
+    state_dict = process.state_codes()
+
+    refreshed = {}
+    for source in sources:
+        if not storage.exists(source):
+            print(f"No {source} data exists to refresh.")
+            continue
+        df = _read_place_table(source)
+        places = stale_places(df, source, now - timedelta(days=ttls[source]), state, missing)
+
+        # Places refreshed before an interruption are in the journal
+        checkpoint = integration.Checkpoint(
+            f"{source}_refresh", ["Place", "StateCode"], path=storage.csv_path(source),
+            save=_place_checkpoint(source).save)
+        new_df = checkpoint.resume(pd.DataFrame())
+        places = [(place, code) for place, code in places if not checkpoint.done(place, code)][:limit]
+        print(f"Refreshing {len(places)} {source} places.")
+
+        urls = []
+        for place, code in places:
+            url = f"{base_place_url}/{source}/city/{state_dict[code]}/{place}"
+            cache.get_cache().forget("GET", url)
+            urls.append(((place, code), url))
+
+        def store_page(key, record):
+            for row in _place_rows(source, *key, record):
+                rows.append(row)
+                checkpoint.add(row)
+            print(f"Refreshed {source} for {key[0]}, {key[1]}")
+
+        rows: list[dict] = []
+        with checkpoint:
+            fetch.fetch_all(urls, store_page, parser=extract.PARSERS[source],
+                            retry_queue=fetch.RetryQueue(f"{source}_refresh"))
+        new_df = pd.concat([new_df, pd.DataFrame(rows)], ignore_index=True)
+        if new_df.empty:
+            refreshed[source] = 0
+            continue
+
+        # Every row of a refreshed place is replaced
+        fresh = set(zip(new_df["Place"], new_df["StateCode"]))
+        kept = [key not in fresh for key in zip(df["Place"], df["StateCode"])]
+        checkpoint.promote(pd.concat([df[kept], new_df], ignore_index=True))
+        refreshed[source] = len(fresh)
+
+    return refreshed
+
 
 def get_crime() -> pd.DataFrame:
     """
@@ -940,112 +1019,217 @@ def get_crime() -> pd.DataFrame:
         Dataframe with raw crime values
     """
     # Check for exiting completed crime.csv
-    if os.path.isfile("data/crime.csv"):
+    if storage.exists("crime"):
         print("Crime data exists.")
-        crime_df = pd.read_csv("data/crime.csv")
+        crime_df = storage.read("crime")
         return crime_df
     else:
         print("No crime data exists.")
-        base_df = pd.read_csv("data/base.csv")
-        base_df = base_df[["Place","County","StateCode"]]
+        base_df = storage.read("base", columns=["Place","County","StateCode"])
         crime_df = base_df.assign(Population="", ViolentCrime="", PropertyCrime="", SocietalCrime="").reset_index(drop=True)
     state_dict = process.state_codes()
 
-    if not os.path.exists('data/temp/nibrs-statetables-2022.zip'):
-        cdn_request = requests.get("https://cde.ucr.cjis.gov/LATEST/s3/signedurl?key=nibrs/tables/2022/stateTables.zip")
+    if not os.path.exists(NIBRS_ZIP):
+        cdn_request = fetch.get("https://cde.ucr.cjis.gov/LATEST/s3/signedurl?key=nibrs/tables/2022/stateTables.zip")
         cdn_request_json = json.loads(cdn_request.text)
         cdn_url = cdn_request_json['nibrs/tables/2022/stateTables.zip']
-        nibrs_request = requests.get(cdn_url)
-        with open('data/temp/nibrs-statetables-2022.zip', 'wb') as zipf:
+        nibrs_request = fetch.get(cdn_url)
+        with open(NIBRS_ZIP, 'wb') as zipf:
             zipf.write(nibrs_request.content)
-    zipf = ZipFile('data/temp/nibrs-statetables-2022.zip', 'r')
 
-    if not os.path.exists('data/temp/co-est2022-pop.xlsx'):
-        county_pop_request = requests.get("https://www2.census.gov/programs-surveys/popest/tables/2020-2022/counties/totals/co-est2022-pop.xlsx")
-        with open('data/temp/co-est2022-pop.xlsx', 'wb') as popf:
+    if not os.path.exists(COUNTY_POP_XLSX):
+        county_pop_request = fetch.get("https://www2.census.gov/programs-surveys/popest/tables/2020-2022/counties/totals/co-est2022-pop.xlsx")
+        with open(COUNTY_POP_XLSX, 'wb') as popf:
             popf.write(county_pop_request.content)
-    with open('data/temp/co-est2022-pop.xlsx', 'rb') as popf:
-        county_pop_df = pd.read_excel(popf)
-    county_pop_df = county_pop_df.iloc[4:3148,:]
-    county_pop_df.drop(county_pop_df.columns[[1,2,3]], axis=1, inplace=True)
-    county_pop_df.columns = ("County, State", "Population")
-    county_pop_df = pd.concat([county_pop_df["County, State"].str.split(', ', expand=True),
-                           county_pop_df["Population"]], axis=1)
-    county_pop_df.columns = ("County", "State", "Population")     
-    county_pop_df["County"] = county_pop_df["County"].apply(lambda name: name.lower().strip(".").replace("county","").strip().replace(" ","_"))
-    county_pop_df["State"] = county_pop_df["State"].apply(lambda name: name.lower().strip().replace(" ","_"))
+
+    agencies_df, county_pop_df = _load_crime_tables(state_dict)
 
     # create dict containing DFs of crime per agency for each state
-    state_crime_dfs = {}
-    for state_code,state in state_dict.items():
-        statefilename = '_'.join([p.capitalize() for p in state.split('_')])
-        with zipf.open(f"{statefilename}_Offense_Type_by_Agency_2022.xlsx") as xlsxf:
-            raw_table = pd.read_excel(xlsxf)
-        
-        metrocounties_i = (raw_table.iloc[:,0].values == 'Metropolitan Counties').argmax()
-        nonmetrocounties_i = (raw_table.iloc[:,0].values == 'Nonmetropolitan Counties').argmax()
-        for i in range(nonmetrocounties_i+1, len(raw_table)):
-            if isinstance(raw_table.iloc[i,0], str):
-                break
-        nonmetrocounties_end_i = i
-
-        raw_data = raw_table.iloc[:,1:7]
-        raw_data.columns = ["Agency", "Population", "TotalOffenses", "ViolentCrime", "PropertyCrime", "SocietalCrime"]
-        raw_data = raw_data.drop(columns=["TotalOffenses"])
-        raw_data.fillna(0, inplace=True)
-        
-        raw_data["Agency"] = raw_data["Agency"].apply(lambda name: name.lower().strip().replace(" ","_") if isinstance(name, str) else "")
-
-        # All cities and colleges.
-        cities = raw_data.iloc[4:metrocounties_i-i,:]
-        # All counties listed under Metropolitan counties and Nonmetropolitan counties
-        counties = raw_data.iloc[metrocounties_i:nonmetrocounties_end_i,:]
-        others = raw_data.iloc[nonmetrocounties_end_i+1:-1,:]
-        #we only care about "other" agencies if they have county in their name
-        others = others[others["Agency"].str.contains("county", regex=False) == True]
-        state_crime_dfs[state_code] = (cities,counties,others)
-    zipf.close()
+    tables = dict(iter(agencies_df.groupby(["StateCode", "Table"], sort=False)))
+    empty = agencies_df.iloc[:0]
+    state_crime_dfs = {
+        state_code: tuple(tables.get((state_code, table), empty) for table in ("cities", "counties", "others"))
+        for state_code in state_dict
+    }
 
     # default to not found, represented by pd.NA
     features = ('Population', 'ViolentCrime', 'PropertyCrime', 'SocietalCrime')
     crime_df.loc[:,features] = (pd.NA, pd.NA, pd.NA, pd.NA) 
 
+    # County populations keyed by (state, county), the first listing wins
+    county_pops = {}
+    for county, state, population in county_pop_df[["County", "State", "Population"]].itertuples(index=False):
+        county_pops.setdefault((state, county), int(population))
+
     # add city agency data to crime_df, if a city agency exists
     # if a city agency does not exist, add crime data from the 
     # county agency and county population data from the census
-    for index, row in crime_df.iterrows():
-        if all(row[f] for f in features):
-            continue
-        state_code = row["StateCode"]
+    # Each state's agency names are indexed once and every place in the state is matched against it
+    matched_indices, matched_values = [], []
+    city_matches = county_matches = 0
+    for state_code, state_places in crime_df.groupby("StateCode", sort=False):
         state = state_dict[state_code]
-        county_name = row["County"]
-        city_name = row["Place"]
         cities, counties, others = state_crime_dfs[state_code]
-        
-        # add city crime data if it exists in NIBRS
-        city = cities[cities["Agency"].str.contains(city_name, regex=False) == True]
-        if len(city) != 0:
-            crime_df.loc[index, features] = (int(city['Population'].iloc[0]), int(city['ViolentCrime'].iloc[0]), int(city['PropertyCrime'].iloc[0]), int(city['SocietalCrime'].iloc[0]))
-            continue
+        city_agency = match.first_containing(state_places["Place"], zip(range(len(cities)), cities["Agency"]))
+        county_agency = match.first_containing(state_places["County"], zip(range(len(counties)), counties["Agency"]))
+        # If no record was found, search the other agencies at the end of the table
+        other_agency = match.first_containing(state_places["County"], zip(range(len(others)), others["Agency"]))
+
+        for index, city_name, county_name in state_places[["Place", "County"]].itertuples():
+            # add city crime data if it exists in NIBRS
+            if city_name in city_agency:
+                city = cities.iloc[city_agency[city_name]]
+                matched_indices.append(index)
+                matched_values.append((int(city['Population']), int(city['ViolentCrime']), int(city['PropertyCrime']), int(city['SocietalCrime'])))
+                city_matches += 1
+                continue
 
-        # find out if county has population data
-        county_pop = county_pop_df.loc[county_pop_df["State"] == state].loc[county_pop_df["County"] == county_name]
-        if len(county_pop) == 0:
-            #print(f"Population data not found for {county_name} county, {state}")
-            continue
-        county_pop = int(county_pop["Population"].iloc[0])
+            # find out if county has population data
+            county_pop = county_pops.get((state, county_name))
+            if county_pop is None:
+                continue
 
-        # Find a county police agency with the county in their name
-        county = counties[counties["Agency"].str.contains(county_name, regex=False) == True]
-        # If no record was found, search the other agencies at the end of the table
-        if len(county) == 0:
-            county = others.loc[others["Agency"].str.contains(county_name, regex=False) == True]
-        # If there was a match, add the county data
-        if len(county) != 0:
-            crime_df.loc[index,features] = (county_pop, int(county['ViolentCrime'].iloc[0]), int(county['PropertyCrime'].iloc[0]), int(county['SocietalCrime'].iloc[0]))
-        else:
-            pass #print(f"County crime data not found for {county_name} county, {state}")    
-    
-    crime_df.to_csv("data/crime.csv", index=False)
+            # Find a county police agency with the county in their name
+            if county_name in county_agency:
+                county = counties.iloc[county_agency[county_name]]
+            elif county_name in other_agency:
+                county = others.iloc[other_agency[county_name]]
+            else:
+                continue
+            matched_indices.append(index)
+            matched_values.append((county_pop, int(county['ViolentCrime']), int(county['PropertyCrime']), int(county['SocietalCrime'])))
+            county_matches += 1
+
+    if matched_indices:
+        crime_df.loc[matched_indices, list(features)] = matched_values
+    print(f"Matched {city_matches} places to a city agency and {county_matches} to a county agency, "
+          f"{len(crime_df) - city_matches - county_matches} of {len(crime_df)} places have no crime data.")
+
+    storage.write("crime", crime_df)
+
+    return crime_df
+
+
+def _load_crime_tables(state_dict: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns the NIBRS agency tables and census county populations.
+
+    Parsing the 50 state workbooks and the census workbook takes minutes,
+    so the normalized tables are cached as parquet files keyed by the hash
+    of the two downloads. A new download gets a new key and is parsed again.
+    The state workbooks are parsed in a process pool straight from the zip.
+
+    Parameters
+    ----------
+    state_dict : dict
+        State codes to state names as returned by process.state_codes().
+
+    Returns
+    -------
+    agencies_df : pd.DataFrame
+        Every state's cities, counties and other county agencies with
+        their population and crime counts, labeled by StateCode and Table.
+    county_pop_df : pd.DataFrame
+        County, State and Population of every county.
+
+    """
+    key = integration.file_hash(NIBRS_ZIP, COUNTY_POP_XLSX)[:16]
+    agencies_path = f"data/temp/nibrs_agencies_{key}.parquet"
+    county_pop_path = f"data/temp/county_population_{key}.parquet"
+    if os.path.isfile(agencies_path) and os.path.isfile(county_pop_path):
+        print("Parsed crime tables exist.")
+        return pd.read_parquet(agencies_path), pd.read_parquet(county_pop_path)
+
+    print("Parsing crime tables.")
+    # Spawned workers, since forking from a stage thread can copy a held lock into the child
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+        state_tables = executor.map(_read_agency_tables, state_dict.items())
+        county_pop_df = _read_county_populations(COUNTY_POP_XLSX)
+        agencies_df = pd.concat(list(state_tables), ignore_index=True)
+
+    # Write to temporary files so an interrupted run never leaves a partial cache
+    for df, path in ((agencies_df, agencies_path), (county_pop_df, county_pop_path)):
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+    return agencies_df, county_pop_df
+
+
+def _read_agency_tables(state_item: tuple[str, str]) -> pd.DataFrame:
+    """
+    Splits one state's NIBRS Offense Type by Agency workbook into agency tables.
+
+    Parameters
+    ----------
+    state_item : tuple[str, str]
+        The state code and state name, e.g. ("ny", "new_york").
+
+    Returns
+    -------
+    agencies_df : pd.DataFrame
+        The state's agencies with a Table column of "cities", "counties" or "others".
+
+    """
+    state_code, state = state_item
+    statefilename = '_'.join([p.capitalize() for p in state.split('_')])
+    with ZipFile(NIBRS_ZIP, 'r') as zipf:
+        with zipf.open(f"{statefilename}_Offense_Type_by_Agency_2022.xlsx") as xlsxf:
+            raw_table = pd.read_excel(xlsxf)
+
+    metrocounties_i = (raw_table.iloc[:,0].values == 'Metropolitan Counties').argmax()
+    nonmetrocounties_i = (raw_table.iloc[:,0].values == 'Nonmetropolitan Counties').argmax()
+    for i in range(nonmetrocounties_i+1, len(raw_table)):
+        if isinstance(raw_table.iloc[i,0], str):
+            break
+    nonmetrocounties_end_i = i
+
+    raw_data = raw_table.iloc[:,1:7]
+    raw_data.columns = ["Agency", "Population", "TotalOffenses", "ViolentCrime", "PropertyCrime", "SocietalCrime"]
+    raw_data = raw_data.drop(columns=["TotalOffenses"])
+    raw_data.fillna(0, inplace=True)
+
+    raw_data["Agency"] = raw_data["Agency"].apply(lambda name: name.lower().strip().replace(" ","_") if isinstance(name, str) else "")
+    # Section headings leave text in the count columns, store them as numbers
+    for column in ("Population", "ViolentCrime", "PropertyCrime", "SocietalCrime"):
+        raw_data[column] = pd.to_numeric(raw_data[column], errors="coerce").fillna(0)
+
+    # All cities and colleges.
+    cities = raw_data.iloc[4:metrocounties_i-i,:]
+    # All counties listed under Metropolitan counties and Nonmetropolitan counties
+    counties = raw_data.iloc[metrocounties_i:nonmetrocounties_end_i,:]
+    others = raw_data.iloc[nonmetrocounties_end_i+1:-1,:]
+    #we only care about "other" agencies if they have county in their name
+    others = others[others["Agency"].str.contains("county", regex=False) == True]
+
+    return pd.concat([
+        cities.assign(Table="cities"), counties.assign(Table="counties"), others.assign(Table="others")
+    ], ignore_index=True).assign(StateCode=state_code)
+
+
+def _read_county_populations(path: str) -> pd.DataFrame:
+    """
+    Reads the census county population estimates workbook.
+
+    Parameters
+    ----------
+    path : str
+        The co-est2022-pop.xlsx workbook.
+
+    Returns
+    -------
+    county_pop_df : pd.DataFrame
+        County, State and Population with names normalized like BestPlaces names.
+
+    """
+    with open(path, 'rb') as popf:
+        county_pop_df = pd.read_excel(popf)
+    county_pop_df = county_pop_df.iloc[4:3148,:]
+    county_pop_df.drop(county_pop_df.columns[[1,2,3]], axis=1, inplace=True)
+    county_pop_df.columns = ("County, State", "Population")
+    county_pop_df = pd.concat([county_pop_df["County, State"].str.split(', ', expand=True),
+                           county_pop_df["Population"]], axis=1)
+    county_pop_df.columns = ("County", "State", "Population")
+    county_pop_df["County"] = county_pop_df["County"].apply(lambda name: name.lower().strip(".").replace("county","").strip().replace(" ","_"))
+    county_pop_df["State"] = county_pop_df["State"].apply(lambda name: name.lower().strip().replace(" ","_"))
 
-    return crime_df
\ No newline at end of file
+    return county_pop_df.reset_index(drop=True)
@@ -0,0 +1,397 @@
+"""Functions for extracting features from downloaded BestPlaces pages."""
+
+import html
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+import eden.cache as cache
+import eden.schema as schema
+
+# The C-backed lxml parser is much faster than html.parser when it is installed
+try:
+    import lxml  # noqa: F401
+
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Only the tags a page type needs are built into the tree
+_CLIMATE_TAGS = SoupStrainer(["table", "h6"])
+_HOUSING_TABLE = SoupStrainer("table", id="mainContent_dgHousing")
+
+# Precompiled patterns for values that can be read without building a tree
+_DISPLAY4 = re.compile(r'<div[^>]*\bclass="[^"]*\bdisplay-4\b[^"]*"[^>]*>(.*?)</div>', re.S)
+_PHYSICIANS = re.compile(r">([^<]*physicians per[^<]*)<")
+_VOTING_CARD = re.compile(r'<div[^>]*\bclass="card-body m-0 p-0"[^>]*>')
+_SCRIPT = re.compile(r"<script[^>]*>(.*?)</script>", re.S)
+_JS_ARRAY = re.compile(r"\[.*?\]")
+_TAG = re.compile(r"<[^>]+>")
+
+# Feature value used by the collectors when a page is missing a value
+MISSING = schema.MISSING
+
+
+@dataclass
+class ClimateRecord:
+    """Climate features from a /climate/city page, named after climate.csv's columns."""
+
+    HotScore: float
+    ColdScore: float
+    ClimateScore: float
+    Rainfall: Union[float, str]
+    Snowfall: Union[float, str]
+    Precipitation: Union[float, str]
+    Sunshine: Union[float, str]
+    UV: Union[float, str]
+    Elevation: Union[float, str]
+    Above90: float
+    Below30: float
+    Below0: float
+
+
+@dataclass
+class HealthRecord:
+    """Health features from a /health/city page, named after health.csv's columns."""
+
+    Physicians: Union[float, str]
+    HealthCosts: Union[float, str]
+    WaterQuality: Union[float, str]
+    AirQuality: Union[float, str]
+
+
+@dataclass
+class HousingRecord:
+    """Housing table from a /housing/city page keyed by the row titles."""
+
+    values: dict[str, Union[float, str]] = field(default_factory=dict)
+
+
+@dataclass
+class VotingRecord:
+    """Presidential voting percentages from a /voting/city page by election year."""
+
+    Timeline: list[int]
+    DemVote: list[Union[float, str]]
+    RepVote: list[Union[float, str]]
+
+
+def _text(markup: str) -> str:
+    """Returns the visible text of an html fragment."""
+    return html.unescape(_TAG.sub("", markup))
+
+
+def _display4(text: str) -> list[str]:
+    """Returns the text of every div with the display-4 class in page order."""
+    return [_text(match) for match in _DISPLAY4.findall(text)]
+
+
+def parse_county(text: str) -> str:
+    """
+    Extracts the county name from a BestPlaces city page.
+
+    Parameters
+    ----------
+    text : str
+        The html of the page.
+
+    Returns
+    -------
+    county : str
+        The lowercase county name, "?" for cities whose page has no county.
+
+    Raises
+    ------
+    ValueError
+        If the county label is not followed by a county link.
+
+    """
+    doc = BeautifulSoup(text, PARSER)
+    county_parent = doc.find("b", string=re.compile(r"County:"))
+    # Cities that return a 401 error are labeled with a "?"
+    if county_parent is None:
+        return MISSING
+    try:
+        county_raw = county_parent.find_next_sibling().find("a").text
+    except AttributeError as error:
+        raise ValueError("malformed county label") from error
+
+    return county_raw.strip().lower()
+
+
+def parse_climate(text: str) -> ClimateRecord:
+    """
+    Extracts the climate features from a BestPlaces climate page.
+
+    Parameters
+    ----------
+    text : str
+        The html of the page.
+
+    Returns
+    -------
+    record : ClimateRecord
+        The hot and cold scores, the table of averages and the days
+        above 90°, below 30° and below 0°. Units such as "in." are
+        stripped so every value is a number.
+
+    Raises
+    ------
+    ValueError
+        If the page does not contain the climate data.
+
+    """
+    try:
+        # Get the climate scores
+        hot, cold = map(float, _display4(text)[0].strip().split("/"))
+        climate = round((hot + cold) / 2.0, 2)
+
+        # Get rainfall, snowfall, precipitation, sunshine, uv, and elevation
+        doc = BeautifulSoup(text, PARSER, parse_only=_CLIMATE_TAGS)
+        table = doc.find_all("table")[0]
+        rows = [schema.parse_number(r.find_all("td")[1].text.strip()) for r in table.find_all("tr")]
+        rainfall, snowfall, precipitation, sunshine = rows[1:5]
+        uv, elevation = rows[8:10]
+
+        # Get days above 90°, days below 30°, and days below 0°
+        days = []
+        for pattern in ("over 90°", "falls below freezing", "falls below zero°"):
+            tag = doc.find("h6", string=re.compile(pattern)).text
+            days.append(float(tag.split(",")[1].split(" ")[3]))
+    except (AttributeError, IndexError, ValueError) as error:
+        raise ValueError(f"climate data not found ({error})") from error
+
+    return ClimateRecord(hot, cold, climate, rainfall, snowfall, precipitation, sunshine, uv, elevation, *days)
+
+
+def parse_health(text: str) -> HealthRecord:
+    """
+    Extracts the health features from a BestPlaces health page.
+
+    Each value that is missing from the page is returned as "?".
+
+    Parameters
+    ----------
+    text : str
+        The html of the page.
+
+    Returns
+    -------
+    record : HealthRecord
+        Physicians per capita and the health cost, water and air quality indices.
+
+    """
+    health = _display4(text)
+
+    def index(position):
+        try:
+            return float(health[position].replace(" ", "").split("/")[0])
+        except (IndexError, ValueError):
+            return MISSING
+
+    # Get the number of physicians per 10,000 people
+    physicians_text = _PHYSICIANS.search(text)
+    try:
+        physicians = schema.parse_number(html.unescape(physicians_text.group(1)).split(" ")[2])
+    except (AttributeError, IndexError):
+        physicians = MISSING
+
+    return HealthRecord(physicians, index(0), index(1), index(3))
+
+
+def parse_housing(text: str) -> HousingRecord:
+    """
+    Extracts the housing table from a BestPlaces housing page.
+
+    Parameters
+    ----------
+    text : str
+        The html of the page.
+
+    Returns
+    -------
+    record : HousingRecord
+        The value of each titled row of the housing table, e.g. "$245,000"
+        is stored as 245000.0.
+
+    Raises
+    ------
+    ValueError
+        If the page does not contain the housing table.
+
+    """
+    table = BeautifulSoup(text, PARSER, parse_only=_HOUSING_TABLE).find("table")
+    if table is None:
+        raise ValueError("housing table not found")
+
+    record = HousingRecord()
+    for table_row in table.find_all("tr", class_=lambda x: x != "header"):
+        title = table_row.find("u")
+        if title is None:
+            continue
+        try:
+            record.values[title.text] = schema.parse_number(table_row.find_all("td")[1].text)
+        except IndexError as error:
+            raise ValueError(f"malformed housing row {title.text}") from error
+
+    return record
+
+
+def parse_voting(text: str, default_timeline: list[int] = None) -> VotingRecord:
+    """
+    Extracts the presidential voting chart data from a BestPlaces voting page.
+
+    The chart data is read straight out of the chart's javascript arrays.
+    If the chart can not be read every year is marked with "?".
+
+    Parameters
+    ----------
+    text : str
+        The html of the page.
+    default_timeline : list[int]
+        Election years used when the chart is missing.
+
+    Returns
+    -------
+    record : VotingRecord
+        Election years with the democrat and republican percentages.
+
+    """
+    if default_timeline is None:
+        default_timeline = [2000, 2004, 2008, 2012, 2016, 2020, 2024]
+    try:
+        # The chart lives in the third card body on the page
+        card = list(_VOTING_CARD.finditer(text))[2]
+        chart_javascript = _SCRIPT.search(text, card.end()).group(1)
+        lists = [l.strip("][\"").split(",") for l in _JS_ARRAY.findall(chart_javascript)]
+        timeline, democrat, republican, _ = lists
+        timeline = [int(year.strip("' ")) for year in timeline]
+        democrat = [float(percentage) for percentage in democrat]
+        republican = [float(percentage) for percentage in republican]
+    except (AttributeError, IndexError, ValueError):
+        timeline = default_timeline
+        democrat = [MISSING] * len(timeline)
+        republican = [MISSING] * len(timeline)
+
+    return VotingRecord(timeline, democrat, republican)
+
+
+def parse_member_terms(text: str) -> list[tuple[list[int], int]]:
+    """
+    Extracts the district a representative held in each congress from a congress.gov member page.
+
+    Parameters
+    ----------
+    text : str
+        The html of the member page.
+
+    Returns
+    -------
+    terms : list[tuple[list[int], int]]
+        The congresses of each term with the district number held,
+        0 for at-large seats and senate terms.
+
+    Raises
+    ------
+    ValueError
+        If the page does not contain the member profile or a term can not be read.
+
+    """
+    profile = BeautifulSoup(text, PARSER).find("div", {"class": "overview-member-column-profile"})
+    if profile is None:
+        raise ValueError("member profile not found")
+
+    terms = []
+    for member_chamber in profile.find_all("th", {"class": "member_chamber"}):
+        try:
+            district_text = member_chamber.find_next("td").get_text()
+            district_text_pieces = district_text.split()
+            term_congresses = [int(c) for c in re.findall(r"\d+", district_text_pieces[-2])]
+            if len(term_congresses) > 1:
+                term_congresses = list(range(term_congresses[0], term_congresses[1] + 1))
+
+            if "District At Large" in district_text or "District" not in district_text:
+                district_no = 0
+            else:
+                district_no = int(district_text_pieces[district_text_pieces.index("District") + 1])
+        except (AttributeError, IndexError, ValueError) as error:
+            raise ValueError(f"malformed member term {member_chamber.get_text()!r}") from error
+        terms.append((term_congresses, district_no))
+
+    return terms
+
+
+PARSERS = {
+    "climate": parse_climate,
+    "health": parse_health,
+    "housing": parse_housing,
+    "voting": parse_voting,
+}
+
+
+def benchmark(limit: int = 200, repeat: int = 3) -> dict:
+    """
+    Compares pages parsed per second before and after the extraction layer.
+
+    Uses BestPlaces pages already stored in the HTTP cache. The "before"
+    number is a full html.parser tree of each page, which is what every
+    collector built before this module existed, and the "after" number
+    is the matching parse_* function.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of cached pages of each type to time.
+    repeat : int
+        Number of passes over the pages, the fastest pass is reported.
+
+    Returns
+    -------
+    results : dict[str, tuple[float, float]]
+        Pages per second (before, after) for each page type.
+
+    """
+    # Group the cached pages by their page type
+    pages: dict[str, list[str]] = {page_type: [] for page_type in PARSERS}
+    response_cache = cache.get_cache()
+    for entry in response_cache.entries():
+        try:
+            header, content = response_cache.read(entry.path)
+        except (OSError, EOFError, ValueError):
+            continue
+        page_type = header.get("url", "").replace("https://www.bestplaces.net/", "").split("/")[0]
+        if page_type in pages and len(pages[page_type]) < limit:
+            pages[page_type].append(content.decode(header["encoding"] or "utf-8", errors="replace"))
+
+    def pages_per_second(parse, texts):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                try:
+                    parse(text)
+                except ValueError:
+                    pass
+            best = min(best, time.perf_counter() - start)
+        return len(texts) / best
+
+    results = {}
+    print(f"Parser: {PARSER}")
+    print("  Page    | Pages | Before (pages/s) | After (pages/s)")
+    for page_type, texts in pages.items():
+        if not texts:
+            continue
+        before = pages_per_second(lambda text: BeautifulSoup(text, "html.parser"), texts)
+        after = pages_per_second(PARSERS[page_type], texts)
+        results[page_type] = (before, after)
+        print(" %8s | %5d | %16.1f | %15.1f" % (page_type, len(texts), before, after))
+
+    return results
+
+
+if __name__ == "__main__":
+    # Run from the eden folder after a collection has filled the HTTP cache
+    benchmark()
@@ -0,0 +1,127 @@
+"""Functions for building the normalized feature matrix used to score cities."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import eden.integration as integration
+import eden.storage as storage
+
+# Location of the memory-mapped matrix, its row index and its column metadata
+MATRIX_DIR = "data/features"
+# Columns identifying the city of each matrix row
+INDEX_COLUMNS = ["Place", "StateCode", "Fips"]
+# Features used by the Eden model, in matrix column order
+FEATURES = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality", "HotScore", "ClimateScore",
+            "ColdScore", "Rainfall", "Snowfall", "Sunshine", "UV", "Above90", "Elevation",
+            "Below30", "Below0", "Density", "HouseConstitutionality", "SenateConstitutionality",
+            "HomeInsurance", "Drought", "DemVotePred", "RepVotePred", "MedianHomeAge", "PropertyTaxRate",
+            "MedianHomeCost", "TempleDistance", "SocietalCrime", "PropertyCrime", "ViolentCrime"
+            ]
+
+
+def _paths(directory: str) -> tuple[str, str, str]:
+    """Returns the matrix, row index and metadata files in a directory."""
+    return f"{directory}/matrix.npy", f"{directory}/index.parquet", f"{directory}/columns.json"
+
+
+def bin_snowfall(snowfall: pd.Series) -> pd.Series:
+    """Buckets inches of snow into none (0), some (0.4) and a lot (1)."""
+    binned = snowfall.copy()
+    binned[snowfall < 25] = 0
+    binned[(snowfall >= 25) & (snowfall < 35)] = 0.4
+    binned[snowfall >= 35] = 1
+
+    return binned
+
+
+def build_matrix(directory: str = MATRIX_DIR) -> dict:
+    """
+    Writes the min-max normalized features of every city as a float32 matrix.
+
+    The matrix is one contiguous C-ordered array saved with np.save so it
+    can be memory-mapped. Snowfall is binned before it is normalized.
+    The matrix is keyed on the hash of all.parquet and only rebuilt when
+    all changes.
+
+    Parameters
+    ----------
+    directory : str
+        Folder for matrix.npy, index.parquet and columns.json.
+
+    Returns
+    -------
+    metadata : dict
+        The source hash and the name, min and max of each column.
+
+    """
+    matrix_path, index_path, metadata_path = _paths(directory)
+    # Listing the columns also brings all.parquet up to date with all.csv
+    available = storage.columns("all")
+    key = integration.file_hash(storage.path("all"))
+    if os.path.isfile(metadata_path) and os.path.isfile(matrix_path):
+        with open(metadata_path) as metadataf:
+            metadata = json.load(metadataf)
+        if metadata["key"] == key:
+            return metadata
+
+    print("Building the feature matrix.")
+    columns = [f for f in FEATURES if f in available]
+    all_df = storage.read("all", columns=[c for c in INDEX_COLUMNS if c in available] + columns)
+    features_df = all_df[columns].apply(pd.to_numeric, errors="coerce")
+    if "Snowfall" in features_df:
+        features_df["Snowfall"] = bin_snowfall(features_df["Snowfall"])
+
+    # Normalize each feature between 0 and 1 in one pass over the columns
+    values = features_df.to_numpy(dtype=np.float64)
+    minimums = np.nanmin(values, axis=0)
+    maximums = np.nanmax(values, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix = np.ascontiguousarray((values - minimums) / (maximums - minimums), dtype=np.float32)
+
+    os.makedirs(directory, exist_ok=True)
+    metadata = {
+        "key": key,
+        "columns": columns,
+        "min": minimums.tolist(),
+        "max": maximums.tolist(),
+    }
+    with open(f"{matrix_path}.tmp", "wb") as matrixf:
+        np.save(matrixf, matrix)
+    os.replace(f"{matrix_path}.tmp", matrix_path)
+    all_df.drop(columns=columns).to_parquet(f"{index_path}.tmp", index=False)
+    os.replace(f"{index_path}.tmp", index_path)
+    # The metadata is written last, its key marks the matrix as complete
+    with open(f"{metadata_path}.tmp", "w") as metadataf:
+        json.dump(metadata, metadataf)
+    os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    return metadata
+
+
+def open_matrix(directory: str = MATRIX_DIR) -> tuple[np.ndarray, pd.DataFrame, dict]:
+    """
+    Opens the feature matrix without copying it into memory.
+
+    Parameters
+    ----------
+    directory : str
+        Folder written by build_matrix.
+
+    Returns
+    -------
+    matrix : np.ndarray
+        Read-only memory-mapped float32 matrix, one row per city.
+    index_df : pd.DataFrame
+        Place, StateCode and Fips of each row.
+    metadata : dict
+        The source hash and the name, min and max of each column.
+
+    """
+    matrix_path, index_path, metadata_path = _paths(directory)
+    with open(metadata_path) as metadataf:
+        metadata = json.load(metadataf)
+
+    return np.load(matrix_path, mmap_mode="r"), pd.read_parquet(index_path), metadata
@@ -0,0 +1,507 @@
+"""Functions for fetching many web pages concurrently within a polite request rate."""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import Any, Callable, Hashable, Iterable
+from urllib.parse import urlparse
+
+import eden.cache as cache
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import InsecureRequestWarning  # MAC
+from urllib3.util.retry import Retry
+
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+# Default number of simultaneous requests allowed against a single host
+CONCURRENCY = 4
+# Default starting request rate against a single host (requests/second)
+RATE = 2.0
+# Bounds the adaptive rate moves within while a host is healthy or struggling
+MIN_RATE = 0.1
+MAX_RATE = 10.0
+# Statuses that mean the host is overloaded and the page should be retried
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+# Passes over the failed pages at the end of a run and the wait before the first
+RETRY_ROUNDS = 3
+RETRY_BACKOFF = 30.0
+# Each collector keeps its own queue, so collectors running at the same time never rewrite each other's
+RETRY_QUEUE = "data/temp/retry_{name}.jsonl"
+# Downloaded pages allowed to wait for each parser process
+QUEUE_SIZE = 8
+# Number of hosts with a kept-alive pool and the connections kept per host
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 16
+# Default (connect, read) timeout in seconds and retries for every request
+TIMEOUT = (10, 30)
+RETRIES = 3
+
+_session = None
+_timeout = TIMEOUT
+# Set to make every fetch_all in progress stop requesting pages, e.g. when a pipeline is interrupted
+stop = threading.Event()
+
+
+def configure_session(
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+    timeout: tuple[float, float] = TIMEOUT,
+    retries: int = RETRIES,
+) -> requests.Session:
+    """
+    Creates the module-level session shared by every collector.
+
+    The session keeps connections alive in a pool per host, so repeated
+    requests to the same site reuse one TCP and TLS handshake.
+    Call this before collecting to tune the pools for higher concurrency.
+
+    Parameters
+    ----------
+    pool_connections : int
+        Number of hosts to keep a connection pool for.
+    pool_maxsize : int
+        Connections kept open per host. Should be at least the
+        concurrency passed to fetch_all.
+    timeout : tuple[float, float]
+        Default (connect, read) timeout in seconds.
+    retries : int
+        Retries on connection errors and 5xx responses, with backoff.
+
+    Returns
+    -------
+    session : requests.Session
+        The newly configured shared session.
+
+    """
+    global _session, _timeout
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=None,
+        # Hand the last 5xx back so fetch_all's limiter can slow down
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Many of the sites fail certificate checks on Mac
+    session.verify = False
+
+    if _session is not None:
+        _session.close()
+    _session = session
+    _timeout = timeout
+
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it with the defaults if needed."""
+    if _session is None:
+        configure_session()
+    return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Sends a request through the shared session and the on-disk response cache.
+
+    Fresh cached responses are returned without touching the network.
+    Streamed downloads are never cached.
+
+    Parameters
+    ----------
+    method : str
+        The HTTP method, e.g. "GET" or "POST".
+    url : str
+        The url to request.
+    **kwargs
+        Passed through to requests.Session.request.
+
+    Returns
+    -------
+    response : requests.Response
+        The cached or freshly downloaded response.
+
+    """
+    use_cache = not kwargs.get("stream", False)
+    body = kwargs.get("data", kwargs.get("json"))
+    if use_cache:
+        response = cache.get_cache().load(method, url, body)
+        if response is not None:
+            return response
+
+    kwargs.setdefault("timeout", _timeout)
+    response = get_session().request(method, url, **kwargs)
+    if use_cache:
+        cache.get_cache().store(method, url, body, response)
+
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Sends a GET request through the shared session with the default timeout."""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """Sends a POST request through the shared session with the default timeout."""
+    return request("POST", url, **kwargs)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared by every request to a host.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    Each request consumes one token and waits when the bucket is empty,
+    which replaces the random sleeps between page requests.
+
+    Parameters
+    ----------
+    rate : float
+        Sustained number of requests allowed per second.
+    capacity : float
+        Largest burst of requests allowed after an idle period.
+
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter(TokenBucket):
+    """
+    Token bucket whose rate follows how healthy a host's responses are.
+
+    The rate grows additively after every run of healthy responses and
+    halves on a 429 or 5xx response. A Retry-After header pauses all
+    requests to the host until it has passed.
+
+    Parameters
+    ----------
+    rate : float
+        Starting number of requests allowed per second.
+    min_rate : float
+        Slowest rate the limiter backs off to.
+    max_rate : float
+        Fastest rate the limiter speeds up to.
+    step : float
+        Requests per second added after each healthy run.
+    healthy_run : int
+        Consecutive healthy responses needed before speeding up.
+
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = MIN_RATE,
+        max_rate: float = MAX_RATE,
+        step: float = 0.25,
+        healthy_run: int = 20,
+    ) -> None:
+        super().__init__(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.healthy_run = healthy_run
+        self.healthy = 0
+        self.paused_until = 0.0
+
+    async def acquire(self) -> None:
+        """Wait out any Retry-After pause, then wait for a token."""
+        while (delay := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await super().acquire()
+
+    def success(self) -> None:
+        """Records a healthy response and speeds up after a healthy run."""
+        self.healthy += 1
+        if self.healthy >= self.healthy_run:
+            self.healthy = 0
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def throttle(self, retry_after: float = None) -> None:
+        """Records an overloaded response, halving the rate and honoring Retry-After."""
+        self.healthy = 0
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        print(f"Slowing down to {self.rate:.2f} requests/second.")
+
+
+def retry_after(response: requests.Response):
+    """Returns the seconds a response asks us to wait, None if it does not say."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryQueue:
+    """
+    Persistent record of pages that could not be fetched.
+
+    Failures are appended to a JSON lines file as they happen and a
+    ``done`` line is appended once a queued url succeeds, so the file
+    always reflects the outstanding failures even after a crash.
+
+    Parameters
+    ----------
+    name : str
+        Name of the collector the queue belongs to, e.g. "climate".
+        Give every collector that can run at the same time its own name.
+    path : str
+        Location of the JSON lines file, data/temp/retry_{name}.jsonl by default.
+
+    """
+
+    def __init__(self, name: str = "default", path: str = None) -> None:
+        self.path = path or RETRY_QUEUE.format(name=name)
+        self.entries: dict[str, dict] = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as queuef:
+                for line in queuef:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("done"):
+                        self.entries.pop(entry["url"], None)
+                    else:
+                        self.entries[entry["url"]] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _write(self, entry: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as queuef:
+            queuef.write(json.dumps(entry) + "\n")
+
+    def add(self, url: str, error: str) -> None:
+        """Records a failed attempt at a url."""
+        entry = self.entries.get(url, {"url": url, "attempts": 0})
+        entry = {**entry, "attempts": entry["attempts"] + 1, "error": error, "time": time.time()}
+        self.entries[url] = entry
+        self._write(entry)
+
+    def remove(self, url: str) -> None:
+        """Marks a queued url as successfully fetched."""
+        if self.entries.pop(url, None) is not None:
+            self._write({"url": url, "done": True})
+
+    def compact(self) -> None:
+        """Rewrites the file with only the outstanding failures."""
+        if not os.path.isfile(self.path):
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as queuef:
+            for entry in self.entries.values():
+                queuef.write(json.dumps(entry) + "\n")
+        os.replace(temp_path, self.path)
+        if not self.entries:
+            os.remove(self.path)
+
+
+def fetch_all(
+    urls: Iterable[tuple],
+    callback: Callable[[Hashable, Any], None],
+    concurrency: int = CONCURRENCY,
+    rate: float = RATE,
+    parser: Callable[[str], Any] = None,
+    processes: int = None,
+    retry_queue: RetryQueue = None,
+    on_parse_error: Callable[[Hashable, ValueError], None] = None,
+    **kwargs,
+) -> None:
+    """
+    Fetches all urls concurrently and hands each response to a callback.
+
+    Requests are grouped by host. Each host gets its own pool of
+    ``concurrency`` workers and its own adaptive limiter, so a slow site
+    does not hold up the others. Each limiter starts at ``rate`` requests
+    per second, speeds up while the host answers normally and backs off
+    on 429 or 5xx responses and Retry-After headers.
+    The callback always runs on the calling thread, one result at a time,
+    so it can safely update a dataframe.
+
+    Pages that fail with a connection error, a 429 or a 5xx go to a
+    persistent retry queue. Once every url has been tried, the queue is
+    drained in a few backed-off rounds. Pages that still fail stay in
+    the queue file instead of being recorded as missing data.
+    Setting ``stop`` ends the run early, the pages already requested are
+    still delivered and the rest are left for the next run.
+
+    When a parser is given, collection becomes a producer/consumer pipeline.
+    Downloaded pages wait in a bounded queue and a process pool parses them,
+    so network waits and parsing overlap and parsing uses every core.
+    Pages the parser rejects with a ValueError are reported and handed to
+    ``on_parse_error`` so the caller can record them as missing data.
+
+    Parameters
+    ----------
+    urls : Iterable[tuple]
+        Pairs of (key, url). The key is passed back to the callback,
+        usually the dataframe index of the row being collected.
+        A (key, url, parser) triple overrides the parser for that url.
+    callback : Callable[[Hashable, Any], None]
+        Called with the key and the response of each successful request,
+        or with the key and the parsed record when a parser is given.
+    concurrency : int
+        Maximum number of simultaneous requests per host.
+    rate : float
+        Starting requests per second per host.
+    parser : Callable[[str], Any]
+        Module-level function that turns page html into a record.
+    processes : int
+        Number of parser processes, defaults to the number of cores.
+    retry_queue : RetryQueue
+        Where failed pages are recorded, defaults to data/temp/retry_default.jsonl.
+        Callers that can run at the same time must pass their own queue.
+    on_parse_error : Callable[[Hashable, ValueError], None]
+        Called with the key and the error of each page the parser rejects.
+    **kwargs
+        Passed through to get.
+
+    """
+    by_host: dict[str, list[tuple]] = defaultdict(list)
+    for key, url, *item_parser in urls:
+        by_host[urlparse(url).netloc].append((key, url, item_parser[0] if item_parser else parser))
+    if not by_host:
+        return
+    if retry_queue is None:
+        retry_queue = RetryQueue()
+
+    asyncio.run(_fetch_hosts(by_host, callback, concurrency, rate, processes, retry_queue, on_parse_error, kwargs))
+    retry_queue.compact()
+    if len(retry_queue):
+        print(f"{len(retry_queue)} pages could not be fetched, see {retry_queue.path}.")
+
+
+async def _fetch_hosts(by_host, callback, concurrency, rate, processes, retry_queue, on_parse_error, kwargs) -> None:
+    """Runs a bounded group of workers for every host until all urls are fetched and parsed."""
+    loop = asyncio.get_running_loop()
+    parsing = any(item[2] is not None for items in by_host.values() for item in items)
+    processes = processes or os.cpu_count() or 1
+    # Pages wait here for a parser, fetching pauses while the queue is full
+    pages: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE * processes)
+    limiters = {host: AdaptiveLimiter(rate) for host in by_host}
+    failed: list[tuple] = []
+
+    # Parsers run in spawned processes, forking from a stage thread can copy a held lock into the child
+    spawn = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(max_workers=concurrency * len(by_host)) as executor, \
+            (ProcessPoolExecutor(processes, mp_context=spawn) if parsing else nullcontext()) as pool:
+
+        async def deliver(key, url, parser, response: requests.Response) -> None:
+            retry_queue.remove(url)
+            if parser is None:
+                callback(key, response)
+            else:
+                await pages.put((key, url, parser, response.text))
+
+        async def fetcher(queue: asyncio.Queue, limiter: AdaptiveLimiter) -> None:
+            while not queue.empty() and not stop.is_set():
+                item = queue.get_nowait()
+                key, url, parser = item
+                # Cached pages skip the rate limit since they never reach the host
+                response = await loop.run_in_executor(executor, cache.get_cache().load, "GET", url)
+                if response is not None:
+                    await deliver(key, url, parser, response)
+                    continue
+                await limiter.acquire()
+                try:
+                    response = await loop.run_in_executor(executor, partial(get, url, **kwargs))
+                except requests.RequestException as error:
+                    limiter.throttle()
+                    failed.append(item)
+                    retry_queue.add(url, str(error))
+                    continue
+                if response.status_code in TRANSIENT_STATUSES:
+                    limiter.throttle(retry_after(response))
+                    failed.append(item)
+                    retry_queue.add(url, f"HTTP {response.status_code}")
+                    continue
+                limiter.success()
+                await deliver(key, url, parser, response)
+
+        async def consumer() -> None:
+            while (page := await pages.get()) is not None:
+                key, url, parser, text = page
+                try:
+                    record = await loop.run_in_executor(pool, parser, text)
+                except ValueError as error:
+                    print(f"Failed to parse {url}: {error}")
+                    if on_parse_error is not None:
+                        on_parse_error(key, error)
+                    continue
+                callback(key, record)
+
+        async def fetch_round(pending: dict[str, list[tuple]]) -> None:
+            fetchers = []
+            for host, items in pending.items():
+                queue: asyncio.Queue = asyncio.Queue()
+                for item in items:
+                    queue.put_nowait(item)
+                fetchers.extend(fetcher(queue, limiters[host]) for _ in range(min(concurrency, len(items))))
+            await asyncio.gather(*fetchers)
+
+        consumers = [consumer() for _ in range(processes if parsing else 0)]
+
+        async def producer() -> None:
+            await fetch_round(by_host)
+            # Drain the failed pages with a growing wait between rounds
+            for attempt in range(RETRY_ROUNDS):
+                if not failed or stop.is_set():
+                    break
+                delay = RETRY_BACKOFF * 2**attempt
+                print(f"Retrying {len(failed)} failed pages in {delay:.0f} seconds.")
+                # The wait ends early if the run is stopped
+                if await loop.run_in_executor(executor, stop.wait, delay):
+                    break
+                pending: dict[str, list[tuple]] = defaultdict(list)
+                for item in failed:
+                    pending[urlparse(item[1]).netloc].append(item)
+                failed.clear()
+                await fetch_round(pending)
+            # One stop signal for every consumer once all pages are queued
+            for _ in consumers:
+                await pages.put(None)
+
+        await asyncio.gather(producer(), *consumers)
@@ -0,0 +1,373 @@
+"""Functions for answering geographical questions about cities offline."""
+
+import json
+import os
+import re
+
+import joblib
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+from sklearn.neighbors import BallTree
+
+import eden.integration as integration
+
+# Shapely is only needed for the district polygons
+try:
+    import shapely
+    from shapely.geometry import shape
+except ImportError:
+    shapely = None
+
+# Mean radius of the earth, haversine distances in radians are scaled by it
+EARTH_RADIUS_MI = 3958.8
+
+# Prebuilt spatial index over every place in base.csv
+PLACES_INDEX = "data/temp/places_index.joblib"
+
+# Congressional district boundaries as GeoJSON, e.g. a census cartographic
+# boundary file (cb_2020_us_cd116_500k) converted with ogr2ogr or geopandas
+DISTRICTS_FILE = "data/temp/congressional_districts.geojson"
+
+# Census state FIPS codes to the two letter state codes
+STATE_FIPS = {
+    "01": "al", "02": "ak", "04": "az", "05": "ar", "06": "ca", "08": "co", "09": "ct",
+    "10": "de", "11": "dc", "12": "fl", "13": "ga", "15": "hi", "16": "id", "17": "il",
+    "18": "in", "19": "ia", "20": "ks", "21": "ky", "22": "la", "23": "me", "24": "md",
+    "25": "ma", "26": "mi", "27": "mn", "28": "ms", "29": "mo", "30": "mt", "31": "ne",
+    "32": "nv", "33": "nh", "34": "nj", "35": "nm", "36": "ny", "37": "nc", "38": "nd",
+    "39": "oh", "40": "ok", "41": "or", "42": "pa", "44": "ri", "45": "sc", "46": "sd",
+    "47": "tn", "48": "tx", "49": "ut", "50": "vt", "51": "va", "53": "wa", "54": "wv",
+    "55": "wi", "56": "wy", "72": "pr",
+}
+
+
+def district_label(properties: dict) -> str:
+    """
+    Formats a district's GeoJSON properties as a label like "AL-03".
+
+    Understands both GovTrack properties (state, number) and census
+    properties (STATEFP, CD116FP or any other CDxxxFP).
+    At-large and non-voting districts are numbered 00.
+
+    Parameters
+    ----------
+    properties : dict
+        The properties of one district feature.
+
+    Returns
+    -------
+    label : str
+        The state code and two digit district number.
+    """
+    if "state" in properties and "number" in properties:
+        state = properties["state"]
+        number = properties["number"]
+    else:
+        state = STATE_FIPS[properties["STATEFP"]]
+        number = next(value for key, value in properties.items() if re.fullmatch(r"CD\d+FP", key))
+    number = int(number)
+    # Census numbers at-large seats 00 and non-voting delegates 98
+    if number >= 98:
+        number = 0
+
+    return f"{state.upper()}-{number:02d}"
+
+
+def load_districts(path: str = DISTRICTS_FILE) -> tuple:
+    """
+    Loads district polygons and builds an STR-tree over them.
+
+    Parameters
+    ----------
+    path : str
+        GeoJSON feature collection of congressional districts.
+
+    Returns
+    -------
+    tree : shapely.STRtree
+        Spatial index over the district polygons.
+    labels : np.ndarray
+        District label of each polygon in the tree.
+    """
+    if shapely is None:
+        raise ImportError("Assigning districts offline requires shapely>=2.0.")
+    with open(path) as geojsonf:
+        collection = json.load(geojsonf)
+    features = [f for f in collection["features"] if f.get("geometry")]
+    polygons = [shape(f["geometry"]) for f in features]
+    labels = np.array([district_label(f["properties"]) for f in features])
+
+    return shapely.STRtree(polygons), labels
+
+
+def assign_districts(latitudes, longitudes, path: str = DISTRICTS_FILE) -> np.ndarray:
+    """
+    Finds the congressional district containing each point in one batch.
+
+    Points that fall just outside every polygon, usually on a coastline,
+    are given the nearest district.
+
+    Parameters
+    ----------
+    latitudes : array-like
+        Latitude of each point in degrees.
+    longitudes : array-like
+        Longitude of each point in degrees.
+    path : str
+        GeoJSON feature collection of congressional districts.
+
+    Returns
+    -------
+    districts : np.ndarray
+        District label of each point, e.g. "AL-03".
+    """
+    tree, labels = load_districts(path)
+    points = shapely.points(np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float))
+
+    # Points on a shared border match twice, keep the first match
+    point_index, polygon_index = tree.query(points, predicate="within")
+    matched, first = np.unique(point_index, return_index=True)
+    districts = np.full(len(points), "", dtype=labels.dtype)
+    districts[matched] = labels[polygon_index[first]]
+
+    unmatched = np.flatnonzero(districts == "")
+    if len(unmatched):
+        point_index, polygon_index = tree.query_nearest(points[unmatched])
+        matched, first = np.unique(point_index, return_index=True)
+        districts[unmatched[matched]] = labels[polygon_index[first]]
+
+    return districts
+
+
+class NearestIndex:
+    """
+    Haversine ball tree over points of interest such as temples or hospitals.
+
+    The tree is built once on the points' radian coordinates, so distances
+    are great-circle distances that stay correct near the poles and across
+    the antimeridian, unlike a KD-tree over raw degrees.
+
+    Parameters
+    ----------
+    latitudes : array-like
+        Latitude of each point of interest in degrees.
+    longitudes : array-like
+        Longitude of each point of interest in degrees.
+
+    """
+
+    def __init__(self, latitudes, longitudes) -> None:
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.tree = BallTree(np.radians(np.column_stack([self.latitudes, self.longitudes])), metric="haversine")
+
+    def query(self, latitudes, longitudes, k: int = 1, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest points of interest to every location in one batch.
+
+        Parameters
+        ----------
+        latitudes : array-like
+            Latitude of each location in degrees.
+        longitudes : array-like
+            Longitude of each location in degrees.
+        k : int
+            Number of nearest points of interest to return for each location.
+        exact : bool
+            Replace the distance to the nearest point of interest with the
+            geodesic distance on the WGS-84 ellipsoid. Only the winning
+            candidate is refined, the other k - 1 stay haversine distances.
+
+        Returns
+        -------
+        distances : np.ndarray
+            Miles to each of the k nearest points, shape (locations, k), nearest first.
+        indices : np.ndarray
+            Position of each of the k nearest points in the index.
+
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        coordinates = np.radians(np.column_stack([latitudes, longitudes]))
+        distances, indices = self.tree.query(coordinates, k=min(k, len(self.latitudes)))
+        distances *= EARTH_RADIUS_MI
+
+        if exact:
+            nearest = indices[:, 0]
+            distances[:, 0] = [
+                geodesic(location, poi).mi
+                for location, poi in zip(
+                    zip(latitudes, longitudes), zip(self.latitudes[nearest], self.longitudes[nearest])
+                )
+            ]
+
+        return distances, indices
+
+
+def nearest_distances(places_df, pois_df, exact: bool = True) -> np.ndarray:
+    """
+    Returns the miles from each place to its nearest point of interest.
+
+    Parameters
+    ----------
+    places_df : pd.DataFrame
+        Places with Latitude and Longitude columns, e.g. all.csv.
+    pois_df : pd.DataFrame
+        Points of interest with Latitude and Longitude columns, e.g. temples.csv.
+    exact : bool
+        Use the geodesic distance to the nearest point instead of the haversine distance.
+
+    Returns
+    -------
+    distances : np.ndarray
+        Miles from each place to the nearest point of interest.
+
+    """
+    index = NearestIndex(pois_df["Latitude"], pois_df["Longitude"])
+    distances, _ = index.query(places_df["Latitude"], places_df["Longitude"], exact=exact)
+
+    return distances[:, 0]
+
+
+class PlaceIndex:
+    """
+    Persistent haversine ball tree over every place in base.csv.
+
+    The tree is built once and saved with joblib next to the hash of
+    base.csv. It is loaded lazily on the first query with its arrays
+    memory-mapped, so opening the index costs almost nothing and several
+    processes share the same pages. The index is rebuilt when base.csv changes.
+    Places are identified by their row position in base.csv.
+
+    Parameters
+    ----------
+    path : str
+        Where the index is saved.
+    base_path : str
+        The base.csv the index is built from.
+
+    """
+
+    def __init__(self, path: str = PLACES_INDEX, base_path: str = "data/base.csv") -> None:
+        self.path = path
+        self.base_path = base_path
+        self._index = None
+
+    def _load(self) -> dict:
+        """Returns the saved index, building it first if it is missing or stale."""
+        if self._index is not None:
+            return self._index
+        key = integration.file_hash(self.base_path)
+        if os.path.isfile(self.path):
+            index = joblib.load(self.path, mmap_mode="r")
+            if index["key"] == key:
+                self._index = index
+                return index
+        print("Building the places spatial index.")
+        base_df = pd.read_csv(self.base_path, usecols=["Latitude", "Longitude", "Population"])
+        coordinates = np.radians(base_df[["Latitude", "Longitude"]].to_numpy(dtype=float))
+        index = {
+            "key": key,
+            "tree": BallTree(coordinates, metric="haversine"),
+            "population": pd.to_numeric(base_df["Population"], errors="coerce").fillna(0).to_numpy(),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        joblib.dump(index, f"{self.path}.tmp")
+        os.replace(f"{self.path}.tmp", self.path)
+        self._index = joblib.load(self.path, mmap_mode="r")
+
+        return self._index
+
+    @property
+    def tree(self) -> BallTree:
+        """The ball tree over the places' radian coordinates."""
+        return self._load()["tree"]
+
+    @property
+    def population(self) -> np.ndarray:
+        """The population of each place."""
+        return self._load()["population"]
+
+    def query_radius(self, latitudes, longitudes, miles: float, return_distance: bool = False):
+        """
+        Finds every place within a radius of each location in one batch.
+
+        Parameters
+        ----------
+        latitudes : array-like
+            Latitude of each location in degrees.
+        longitudes : array-like
+            Longitude of each location in degrees.
+        miles : float
+            The search radius in miles.
+        return_distance : bool
+            Also return the miles to each place found, sorted nearest first.
+
+        Returns
+        -------
+        indices : np.ndarray
+            Object array with the base.csv rows found for each location.
+        distances : np.ndarray
+            Object array with the miles to those rows, only if return_distance is True.
+
+        """
+        coordinates = np.radians(np.column_stack([np.atleast_1d(latitudes), np.atleast_1d(longitudes)]).astype(float))
+        radius = miles / EARTH_RADIUS_MI
+        if not return_distance:
+            return self.tree.query_radius(coordinates, r=radius)
+        indices, distances = self.tree.query_radius(coordinates, r=radius, return_distance=True, sort_results=True)
+
+        return indices, distances * EARTH_RADIUS_MI
+
+    def query_knn(self, latitudes, longitudes, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest places to each location in one batch.
+
+        Parameters
+        ----------
+        latitudes : array-like
+            Latitude of each location in degrees.
+        longitudes : array-like
+            Longitude of each location in degrees.
+        k : int
+            Number of places to return for each location.
+
+        Returns
+        -------
+        distances : np.ndarray
+            Miles to each of the k nearest places, shape (locations, k), nearest first.
+        indices : np.ndarray
+            The base.csv rows of the k nearest places.
+
+        """
+        coordinates = np.radians(np.column_stack([np.atleast_1d(latitudes), np.atleast_1d(longitudes)]).astype(float))
+        distances, indices = self.tree.query(coordinates, k=k)
+
+        return distances * EARTH_RADIUS_MI, indices
+
+    def population_within(self, miles: float) -> np.ndarray:
+        """
+        Sums the population within a radius of every place, including the place itself.
+
+        Parameters
+        ----------
+        miles : float
+            The neighborhood radius in miles.
+
+        Returns
+        -------
+        population : np.ndarray
+            Total population within the radius of each base.csv row.
+
+        """
+        tree = self.tree
+        population = self.population
+        # The tree keeps its own copy of the points in build order
+        neighborhoods = tree.query_radius(np.asarray(tree.data), r=miles / EARTH_RADIUS_MI)
+        sizes = np.fromiter((len(rows) for rows in neighborhoods), dtype=np.int64, count=len(neighborhoods))
+        if not sizes.sum():
+            return np.zeros(len(neighborhoods))
+        owners = np.repeat(np.arange(len(neighborhoods)), sizes)
+
+        return np.bincount(owners, weights=population[np.concatenate(neighborhoods)], minlength=len(neighborhoods))
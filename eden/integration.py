@@ -1,44 +1,555 @@
 """Functions for integrating data flow across functions and modules."""
 
 import pandas as pd
+import hashlib
+import inspect
+import json
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable
 
+# Number of collected records buffered before the journal is flushed to disk
+FLUSH_EVERY = 50
+# Fingerprints of the inputs each pipeline stage last ran successfully with
+PIPELINE_STATE = "data/temp/pipeline_state.json"
+# Number of pipeline stages run at the same time
+STAGE_WORKERS = 4
+# Fingerprints of the sources and code each feature group in all.csv was computed from
+FEATURE_GROUPS = "data/temp/feature_groups.json"
 
-def checkpoint_handler(function):
+# Stage state is recorded from the stage threads and the thread running the stages
+_state_lock = threading.Lock()
+
+
+class Journal:
+    """
+    Append-only JSON lines checkpoint for collectors that work row by row.
+
+    Collected records are buffered and appended to
+    ``data/temp/{name}_journal.jsonl`` every ``flush_every`` records,
+    followed by an fsync, so a crash loses at most one buffer.
+    Resuming replays the journal once, which is O(n) in the records
+    collected, instead of rewriting the whole checkpoint after every row.
+
+    Parameters
+    ----------
+    name : str
+        Name of the data being collected, e.g. "climate".
+    flush_every : int
+        Number of records buffered between writes to disk.
+
+    """
+
+    def __init__(self, name: str, flush_every: int = FLUSH_EVERY) -> None:
+        self.path = f"data/temp/{name}_journal.jsonl"
+        self.flush_every = flush_every
+        self.buffer: list[dict] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def append(self, record: dict) -> None:
+        """Buffers one collected record and flushes the buffer when it is full."""
+        self.buffer.append(record)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Appends the buffered records to the journal and syncs them to disk."""
+        if not self.buffer:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in self.buffer)
+        with open(self.path, "a") as journalf:
+            journalf.write(lines)
+            journalf.flush()
+            os.fsync(journalf.fileno())
+        self.buffer.clear()
+
+    def replay(self) -> list[dict]:
+        """
+        Reads back every record in the journal.
+
+        A crash in the middle of a write can leave a partial last line.
+        It is cut off here so later appends start on a clean line.
+
+        Returns
+        -------
+        records : list[dict]
+            The journaled records in the order they were collected.
+
+        """
+        records: list[dict] = []
+        if not os.path.isfile(self.path):
+            return records
+        valid_bytes = 0
+        with open(self.path, "rb") as journalf:
+            for line in journalf:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.path):
+            os.truncate(self.path, valid_bytes)
+
+        return records
+
+    def promote(self, df: pd.DataFrame, path: str) -> None:
+        """Atomically writes the finished data to its final file and deletes the journal."""
+        self.flush()
+        write_atomic(df, path)
+        self.clear()
+
+    def clear(self) -> None:
+        """Deletes the journal once its records are stored somewhere else."""
+        self.buffer.clear()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def write_atomic(df: pd.DataFrame, path: str) -> None:
+    """
+    Writes a dataframe to csv without ever leaving a partially written file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data to write.
+    path : str
+        The final csv location.
+
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", newline="") as csvf:
+        df.to_csv(csvf, index=False)
+        csvf.flush()
+        os.fsync(csvf.fileno())
+    os.replace(temp_path, path)
+
+
+def file_hash(*paths: str) -> str:
+    """
+    Hashes the contents of one or more files, e.g. to key derived data on its sources.
+
+    Parameters
+    ----------
+    paths : str
+        The files to hash, in order.
+
+    Returns
+    -------
+    digest : str
+        The hex sha256 digest of the files' contents.
+
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as hashf:
+            for chunk in iter(lambda: hashf.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline and the files it reads and writes.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the stage, used to remember its last run.
+    function : Callable
+        Called without arguments to run the stage.
+    reads : list[str]
+        Files the stage takes its input from. The stage is skipped when
+        their contents are unchanged since its last successful run.
+    writes : list[str]
+        Files the stage creates or updates. Stages that read or write a
+        file run after every earlier stage that writes it.
+    code : list[Callable]
+        Functions whose source is part of the stage's fingerprint, so
+        editing them reruns the stage. ``function`` is always included.
+
+    """
+
+    name: str
+    function: Callable
+    reads: list[str] = field(default_factory=list)
+    writes: list[str] = field(default_factory=list)
+    code: list[Callable] = field(default_factory=list)
+
+
+def fingerprint(paths: list[str]) -> dict:
+    """Returns the content hash of each file, None for files that do not exist."""
+    return {path: file_hash(path) if os.path.isfile(path) else None for path in paths}
+
+
+def code_version(functions: list[Callable]) -> str:
+    """Returns a hash of the source code of some functions."""
+    digest = hashlib.sha256()
+    for function in functions:
+        try:
+            digest.update(inspect.getsource(function).encode())
+        except (OSError, TypeError):
+            digest.update(repr(function).encode())
+
+    return digest.hexdigest()
+
+
+def group_fingerprint(sources: list[str], functions: list[Callable]) -> str:
+    """
+    Fingerprints a feature group by the contents of its sources and the code computing it.
+
+    Parameters
+    ----------
+    sources : list[str]
+        The files the group's columns are computed from.
+    functions : list[Callable]
+        The functions computing the group's columns.
+
+    Returns
+    -------
+    fingerprint : str
+        Changes whenever a source file or one of the functions changes.
+
+    """
+    inputs = {"sources": fingerprint(sources), "code": code_version(functions)}
+
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _feature_groups(path: str = FEATURE_GROUPS) -> dict:
+    """Reads the fingerprints of every feature group."""
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as groupsf:
+        return json.load(groupsf)
+
+
+def group_changed(group: str, group_fingerprint: str, path: str = FEATURE_GROUPS) -> bool:
+    """Checks whether a feature group's sources or code changed since it was last computed."""
+    return _feature_groups(path).get(group) != group_fingerprint
+
+
+def record_group(group: str, group_fingerprint: str, path: str = FEATURE_GROUPS) -> None:
+    """Remembers the fingerprint a feature group was just computed with."""
+    groups = _feature_groups(path)
+    groups[group] = group_fingerprint
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as groupsf:
+        json.dump(groups, groupsf, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+
+def record_stage(name: str, inputs: dict = None, path: str = PIPELINE_STATE) -> None:
+    """Remembers the inputs a stage last ran successfully with, forgets them when inputs is None."""
+    with _state_lock:
+        state = {}
+        if os.path.isfile(path):
+            with open(path) as statef:
+                state = json.load(statef)
+        if inputs is None:
+            state.pop(name, None)
+        else:
+            state[name] = inputs
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as statef:
+            json.dump(state, statef, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+
+def run_stages(
+    stages: list[Stage],
+    workers: int = STAGE_WORKERS,
+    state_path: str = PIPELINE_STATE,
+    store=None,
+    stop: threading.Event = None,
+) -> dict:
     """
-    Determines the current state of the data and executes next step.
+    Runs pipeline stages in dependency order, independent stages at the same time.
 
-    Checks three states: 1) Has data collection not been started?
-    2) Has it been started and a checkpoint file exists?
-    3) Has data collection already been completed?
+    A stage depends on every earlier stage in the list that writes a file
+    it reads or writes, so stages sharing a file keep their listed order.
+    Stages run in a thread pool as soon as their dependencies are done.
+    A stage whose inputs hash the same as on its last successful run,
+    and whose outputs all exist, is skipped unless a stage writing one of
+    its inputs ran first, since that stage may keep its output in memory.
+    If a stage fails, the stages depending on it are not run and the
+    others carry on. Stages writing through a FeatureStore only count as
+    done once the store has written the table to disk.
 
     Parameters
     ----------
-    function : list[str]
-       The function that needs to be run.
+    stages : list[Stage]
+        The stages in the order they would run one after another.
+    workers : int
+        Maximum number of stages running at once.
+    state_path : str
+        Where the fingerprints of successful runs are kept.
+    store : storage.FeatureStore
+        The table shared by the stages that write its csv.
+    stop : threading.Event
+        Set on Ctrl-C so the running stages wind down, e.g. fetch.stop.
+        Stages that have not started are cancelled.
 
     Returns
     -------
-    palce_df : pd.DataFrame
-        Pandas dataframe with all Places.
-
-    """
-    # Look for county complete data, checkpoint, or no data
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-        if "County" in base_df:
-            print("County data exists in Base.")
-            county_df = base_df[["Place", "StateCode", "County"]]
-            return county_df
-    elif os.path.isfile("data/temp/county_checkpoint.csv"):
-        print("Partial county data exists in checkpoint.")
-        county_df = pd.read_csv(
-            "data/temp/county_checkpoint.csv", keep_default_na=False
-        )
-    elif os.path.isfile("data/temp/county_raw.csv"):
-        print("Raw county data exists.")
-        county_df = pd.read_csv("data/temp/county_raw.csv")
-        return county_df
-    else:
-        print("No county data exists.")
-        county_df = place_df.assign(County="").reset_index(drop=True)
+    statuses : dict[str, str]
+        "ran", "skipped", "failed" or "blocked" for each stage.
+
+    """
+    state = {}
+    if os.path.isfile(state_path):
+        with open(state_path) as statef:
+            state = json.load(statef)
+
+    dependencies = {
+        stage.name: {
+            earlier.name for earlier in stages[:i]
+            if set(earlier.writes) & (set(stage.reads) | set(stage.writes))
+        }
+        for i, stage in enumerate(stages)
+    }
+    feeds = {
+        stage.name: {earlier.name for earlier in stages[:i] if set(earlier.writes) & set(stage.reads)}
+        for i, stage in enumerate(stages)
+    }
+
+    def run(stage):
+        code = code_version([stage.function, *stage.code])
+        inputs = {**fingerprint(stage.reads), "code": code}
+        updated = any(statuses.get(name) == "ran" for name in feeds[stage.name])
+        if not updated and state.get(stage.name) == inputs and all(os.path.exists(path) for path in stage.writes):
+            return "skipped", inputs
+        print(f"Running stage {stage.name}.")
+        stage.function()
+        # Hash again, an input may have been updated while the stage ran
+        return "ran", {**fingerprint(stage.reads), "code": code}
+
+    statuses: dict[str, str] = {}
+    pending = list(stages)
+    running = {}
+    if stop is not None:
+        stop.clear()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            for stage in list(pending):
+                if any(statuses.get(name) in ("failed", "blocked") for name in dependencies[stage.name]):
+                    statuses[stage.name] = "blocked"
+                    pending.remove(stage)
+                elif all(statuses.get(name) in ("ran", "skipped") for name in dependencies[stage.name]):
+                    running[executor.submit(run, stage)] = stage
+                    pending.remove(stage)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    statuses[stage.name], inputs = future.result()
+                except Exception as error:
+                    print(f"Stage {stage.name} failed: {error!r}")
+                    statuses[stage.name] = "failed"
+                    record_stage(stage.name, path=state_path)
+                    continue
+                if statuses[stage.name] == "skipped":
+                    continue
+                # Columns spliced into the store are lost if the run ends before the store is written
+                if store is not None and store.csv_path in stage.writes:
+                    record_stage(stage.name, path=state_path)
+                    store.defer(partial(record_stage, stage.name, inputs, state_path))
+                else:
+                    record_stage(stage.name, inputs, state_path)
+    except KeyboardInterrupt:
+        # Leaving a with block would wait for a collection that can take days, so the stages are told to stop
+        print("Interrupted, stopping the running stages.")
+        if stop is not None:
+            stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    for stage in stages:
+        print(f"{stage.name:>20} | {statuses[stage.name]}")
+
+    return statuses
+
+
+def apply_records(df: pd.DataFrame, records: list[dict], keys: list[str]) -> pd.DataFrame:
+    """
+    Fills in a dataframe with journaled records in a single aligned update.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe being collected, one row per key.
+    records : list[dict]
+        Journaled records containing the keys and the collected columns.
+    keys : list[str]
+        Columns identifying a row, e.g. ["Place", "StateCode"].
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The dataframe with the journaled values filled in. Record columns
+        it did not have, e.g. CollectedAt in a table written before rows
+        were tracked, are added and left missing for the other rows.
+
+    """
+    if not records:
+        return df
+    journal_df = pd.DataFrame(records).drop_duplicates(keys, keep="last").set_index(keys)
+    df = df.set_index(keys)
+    # update never adds columns, so the ones only the records have are added first
+    df = df.reindex(columns=df.columns.append(journal_df.columns.difference(df.columns)))
+    df.update(journal_df)
+
+    return df.reset_index()
+
+
+class Checkpoint:
+    """
+    Resumable row by row collection of one table.
+
+    Handles the "complete / partial / nothing" states every collector
+    used to check by hand. Collected rows are written to a Journal in
+    chunks of ``flush_every`` rows, each followed by an fsync, and the key
+    of every collected row is kept in a set, so resuming checks each row
+    in O(1). The finished table is written atomically before the journal
+    and any older checkpoint csv are deleted, so a crash at any point
+    leaves either the journal or the finished table on disk. A table with
+    rows that could not be collected is not promoted, so the next run
+    resumes and requests those rows again.
+
+    Parameters
+    ----------
+    name : str
+        Name of the data being collected, e.g. "climate".
+    keys : list[str]
+        Columns identifying a collected row, e.g. ["Place", "StateCode"].
+    path : str
+        The finished table, data/{name}.csv by default.
+    save : Callable[[pd.DataFrame], None]
+        Writes the finished table, by default atomically to ``path``.
+    flush_every : int
+        Number of rows buffered between writes to the journal.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: list[str],
+        path: str = None,
+        save: Callable[[pd.DataFrame], None] = None,
+        flush_every: int = FLUSH_EVERY,
+    ) -> None:
+        self.name = name
+        self.keys = keys
+        self.path = path or f"data/{name}.csv"
+        self.save = save or (lambda df: write_atomic(df, self.path))
+        # Checkpoint csv written by earlier versions, read once and deleted on promotion
+        self.legacy_path = f"data/temp/{name}_checkpoint.csv"
+        self.journal = Journal(name, flush_every)
+        self.completed: set[tuple] = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.journal.flush()
+
+    def exists(self) -> bool:
+        """Checks whether the finished table has been written."""
+        return os.path.isfile(self.path)
+
+    def resume(self, df: pd.DataFrame, fill: bool = False) -> pd.DataFrame:
+        """
+        Rebuilds the table collected so far and the set of completed keys.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The table to start from when nothing has been collected.
+        fill : bool
+            The table has one row per key whose empty ("") or missing cells
+            are collected, like climate.csv. Otherwise collected rows are
+            appended to it.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            The table with every row collected so far.
+
+        """
+        if os.path.isfile(self.legacy_path):
+            print(f"Partial {self.name} data exists.")
+            df = pd.read_csv(self.legacy_path, keep_default_na=False)
+        records = self.journal.replay()
+
+        if fill:
+            # Columns only the records have do not decide whether an older row was collected
+            columns = [column for column in df.columns if column not in self.keys]
+            df = apply_records(df, records, self.keys)
+            values = df[columns]
+            collected = df[(values != "").all(axis=1) & values.notna().all(axis=1)]
+        else:
+            columns = df.columns if len(df.columns) else None
+            df = pd.concat([df, pd.DataFrame(records, columns=columns)], ignore_index=True)
+            collected = df
+        self.completed = set() if collected.empty else set(collected[self.keys].itertuples(index=False, name=None))
+
+        if self.completed:
+            print(f"Resuming {self.name} data, {len(self.completed)} collected.")
+        else:
+            print(f"No {self.name} data exists.")
+
+        return df
+
+    def done(self, *key) -> bool:
+        """Checks whether the row with a key, e.g. ("Provo", "ut"), has been collected."""
+        return key in self.completed
+
+    def add(self, record: dict) -> None:
+        """Journals one collected row and marks its key as completed."""
+        self.journal.append(record)
+        self.completed.add(tuple(record[key] for key in self.keys))
+
+    def promote(self, df: pd.DataFrame, expected: Iterable[tuple] = None) -> None:
+        """
+        Writes the finished table, then deletes the journal and checkpoint.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The finished table.
+        expected : Iterable[tuple]
+            Keys that must have been collected, e.g. every (Place, StateCode)
+            in base.csv.
+
+        Raises
+        ------
+        RuntimeError
+            If an expected key has not been collected, for example because
+            its page could not be fetched. The journal is kept for the next run.
+
+        """
+        self.journal.flush()
+        pending = [key for key in expected or () if tuple(key) not in self.completed]
+        if pending:
+            raise RuntimeError(
+                f"{len(pending)} {self.name} rows could not be collected, run again to retry them.")
+        self.save(df)
+        self.journal.clear()
+        if os.path.isfile(self.legacy_path):
+            os.remove(self.legacy_path)
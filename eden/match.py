@@ -0,0 +1,113 @@
+"""Functions for matching place names against names from other datasets."""
+
+from collections import deque
+from typing import Hashable, Iterable
+
+
+class NameIndex:
+    """
+    Aho-Corasick automaton over a set of names.
+
+    Finds every indexed name that occurs as a substring of a text in a
+    single pass over the text, instead of one ``str.contains`` scan per name.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        The names to index. Empty names and missing values are ignored.
+
+    """
+
+    def __init__(self, names: Iterable[str]) -> None:
+        # Node 0 is the root, each node has its edges, a failure link and the names ending there
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[list[str]] = [[]]
+
+        for name in set(names):
+            if not isinstance(name, str) or not name:
+                continue
+            node = 0
+            for char in name:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node].append(name)
+
+        # Breadth first so every failure link points at an already linked node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, text: str) -> set[str]:
+        """
+        Returns the indexed names that occur anywhere in a text.
+
+        Parameters
+        ----------
+        text : str
+            The text to scan.
+
+        Returns
+        -------
+        names : set[str]
+            Every indexed name that is a substring of the text.
+
+        """
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            found.update(self.output[node])
+
+        return found
+
+
+def first_containing(names: Iterable[str], texts: Iterable[tuple[Hashable, str]]) -> dict[str, Hashable]:
+    """
+    Matches each name to the first text that contains it.
+
+    Equivalent to taking the first row of ``texts[texts.str.contains(name)]``
+    for every name, but the texts are only scanned once. Like str.contains,
+    an empty name matches the first text and texts that are not strings,
+    such as NaN, match nothing. Names that are not strings are left out,
+    str.contains can not search for them.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        The names to look for.
+    texts : Iterable[tuple[Hashable, str]]
+        Pairs of (key, text) in the order they should be searched.
+
+    Returns
+    -------
+    matches : dict[str, Hashable]
+        Key of the first text containing each name. Names found in no text are left out.
+
+    """
+    names = set(names)
+    index = NameIndex(names)
+    matches = {}
+    for key, text in texts:
+        if not isinstance(text, str):
+            continue
+        # Every text contains the empty name, the automaton has no node for it
+        if "" in names:
+            matches.setdefault("", key)
+        for name in index.search(text):
+            matches.setdefault(name, key)
+
+    return matches
@@ -1,8 +1,12 @@
 """Prebuilt pipelines using the Eden library."""
 
 import eden.collect as collect
+import eden.fetch as fetch
+import eden.integration as integration
 import eden.process as process
 import eden.predict as predict
+import eden.storage as storage
+from eden.integration import Stage
 import os
 
 def basic_pipline() -> None:
@@ -10,7 +14,9 @@ def basic_pipline() -> None:
     Pipeline that collects all necessary data.
 
     The pipeline checks the data folder and skips collection if it exits.
-    If you would like to update the data, clear the data folder.
+    If you would like to update the data, clear the data folder. Feature
+    groups in all.csv are recomputed on their own when their source files
+    or cleaning code change.
     """
 
     print("\n.---------------.")
@@ -34,50 +40,111 @@ def basic_pipline() -> None:
     # Clean the downloaded raw geodata
     geodata_df = process.clean_geodata(raw_geodata_df)
     # Generate base working df from the intersection of all dataframes
-    base_df = process.geodata_intersect(county_df, city_df, geodata_df)
+    process.geodata_intersect(county_df, city_df, geodata_df)
     # Append congessional districts column
     # collect.get_congressional_districts()
-    # Collect the raw climate data
-    raw_climate_df = collect.get_climate(base_df)
-    # Collect the health climate data
-    raw_health_df = collect.get_health(base_df)
-    # Clean the climate data
-    process.clean_climate(raw_climate_df)
-    # Clean the health data and store the final data in all.csv
-    process.clean_health(raw_health_df)
-    # Clean the home insurance data and add it to all.csv
-    process.merge_home_insurance()
-    # Clean drought data
-    process.clean_drought()
-    # Collects presidential voting data by city
-    collect.collect_voting_data()
-    process.add_house_voting_data()
-    process.add_senate_voting_data()
-    # predict.voting("RepVote")
-    # predict.voting("DemVote")
-
-    # Collect constitutionality data
-    collect.get_districts_by_bioguide_ids()
-    collect.get_percent_constitutionality()
-
-    # Collect housing data
-    collect.collect_housing_data()
-    process.add_housing_data()
-    
-    # Pass in True to re-collect temple data
-    collect.collect_temple_data()
-    process.compute_temple_distances()
 
-    # Collect and process crime data
-    crime_df = collect.get_crime()
-    process.clean_crime(crime_df, print_coverage=False)
+    # Once base.csv exists the remaining steps only depend on the files they share
+    # The steps adding features share all in memory, it is written when they are done
+    with storage.FeatureStore("all") as store:
+        integration.run_stages(basic_stages(store), store=store, stop=fetch.stop)
+
+    print("\nEden terminated.")
+
+
+def refresh_pipline(state: str = None, missing: bool = False, limit: int = None) -> None:
+    """
+    Pipeline that collects stale places again and updates all.csv.
+
+    Places older than their source's TTL, or matching a filter, are
+    collected again. Only the feature groups whose source tables changed
+    are then recomputed.
+
+    Parameters
+    ----------
+    state : str
+        Refresh every place of one state, e.g. "ut".
+    missing : bool
+        Refresh every place with a "?" or empty feature.
+    limit : int
+        Maximum number of places refreshed per source.
+    """
+    refreshed = collect.refresh_places(state=state, missing=missing, limit=limit)
+    for source, count in refreshed.items():
+        print(f"{source:>10} | {count} places refreshed")
 
-    # Calculate the scores for each city
-    predict.find_eden()
+    with storage.FeatureStore("all") as store:
+        integration.run_stages(basic_stages(store), store=store, stop=fetch.stop)
 
     print("\nEden terminated.")
 
 
+def basic_stages(store: storage.FeatureStore = None) -> list[Stage]:
+    """
+    Lists the steps of the basic pipeline that run after base.csv is built.
+
+    Each stage declares the files it reads and writes. Collection from
+    BestPlaces, temples, crime and congress.gov share no files, so they
+    run at the same time. The steps that add columns to all.csv run one
+    after another in the order listed.
+
+    Parameters
+    ----------
+    store : storage.FeatureStore
+        The all table shared by the steps that add features to it. Each
+        step writes all.csv itself when it is not given.
+
+    Returns
+    -------
+    stages : list[Stage]
+        The stages in the order they would run one after another.
+    """
+    base = "data/base.csv"
+    return [
+        # Scrape the climate, health, housing and voting pages in one pass
+        Stage("bestplaces", collect.collect_places, reads=[base],
+              writes=["data/climate.csv", "data/health.csv", "data/housing.csv", "data/voting.csv"]),
+        # Pass in True to re-collect temple data
+        Stage("temples", collect.collect_temple_data, writes=["data/temples.csv"]),
+        # Collect crime data
+        Stage("crime", collect.get_crime, reads=[base], writes=["data/crime.csv"]),
+        # Collect constitutionality data
+        Stage("districts", collect.get_districts_by_bioguide_ids, writes=["data/bioguide_district_info.csv"]),
+        Stage("constitutionality", collect.get_percent_constitutionality,
+              reads=["data/bioguide_district_info.csv"], writes=["data/constitutional_voting_info.csv"]),
+        # Clean the climate and health data and store the final data in all.csv
+        Stage("clean_climate", lambda: process.clean_climate(storage.read("climate"), store=store),
+              reads=["data/climate.csv"], writes=["data/all.csv"], code=[process.clean_climate]),
+        Stage("clean_health", lambda: process.clean_health(storage.read("health"), store=store),
+              reads=["data/health.csv"], writes=["data/all.csv"], code=[process.clean_health]),
+        # Clean the home insurance data into all_insurance.csv, all.csv itself is left unchanged
+        Stage("home_insurance", lambda: process.merge_home_insurance(store=store),
+              reads=["data/temp/home_insurance.csv"],
+              writes=["data/all_insurance.csv", "data/temp/home_insurance_applied.csv"],
+              code=[process.merge_home_insurance]),
+        # Clean drought data
+        Stage("drought", lambda: process.clean_drought(store=store),
+              reads=["data/temp/drought_raw.csv"], writes=["data/all.csv"], code=[process.clean_drought]),
+        # predict.voting("RepVote")
+        # predict.voting("DemVote")
+        Stage("house_voting", lambda: process.add_house_voting_data(store=store),
+              reads=["data/constitutional_voting_info.csv"], writes=["data/all.csv"],
+              code=[process.add_house_voting_data]),
+        Stage("senate_voting", lambda: process.add_senate_voting_data(store=store),
+              reads=["data/constitutional_voting_info.csv"], writes=["data/all.csv"],
+              code=[process.add_senate_voting_data]),
+        Stage("housing", lambda: process.add_housing_data(store=store),
+              reads=["data/housing.csv"], writes=["data/all.csv", "data/all_test.csv"], code=[process.add_housing_data]),
+        Stage("temple_distances", lambda: process.compute_temple_distances(store=store),
+              reads=["data/temples.csv"], writes=["data/all.csv"], code=[process.compute_temple_distances]),
+        Stage("clean_crime", lambda: process.clean_crime(storage.read("crime"), print_coverage=False, store=store),
+              reads=["data/crime.csv"], writes=["data/all.csv"], code=[process.clean_crime]),
+        # Calculate the scores for each city, writing all.csv before and after scoring
+        Stage("eden", lambda: predict.find_eden(store=store),
+              reads=["data/all.csv"], writes=["data/all.csv", "data/predict.csv"], code=[predict.find_eden]),
+    ]
+
+
 if __name__ == "__main__":
     # Python version of bash's cd $(realpath $(dirname $0))
     # Necessary because the process.py and collect.py functions use relative paths
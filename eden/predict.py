@@ -2,9 +2,41 @@
 
 import pandas as pd
 from sklearn import linear_model
-import os
 import numpy as np
 from datetime import date
+import eden.features as features
+import eden.integration as integration
+import eden.storage as storage
+
+# Weight of each normalized feature in the Eden Score, negative weights are unfavorable features
+EDEN_WEIGHTS = {
+    "Physicians": 0,
+    "HealthCosts": -0,
+    "WaterQuality": 2,
+    "AirQuality": 2,
+    "Elevation": 3,
+    "ColdScore": 1,
+    "HotScore": 4,
+    "Above90": -8,
+    "Below0": -2,
+    "Rainfall": 1,
+    "Snowfall": -7,
+    "Drought": -4,
+    "Sunshine": 3,
+    "Density": -1,
+    "HomeInsurance": -2,
+    "HouseConstitutionality": 1,
+    "SenateConstitutionality": 1,
+    "DemVotePred": -2,
+    "RepVotePred": 2,
+    "MedianHomeAge": -.5,
+    "PropertyTaxRate": -3,
+    "MedianHomeCost": -4,
+    "TempleDistance": -1,
+    "SocietalCrime": -1,
+    "PropertyCrime": -2,
+    "ViolentCrime": -3,
+}
 
 
 def drought_prediction() -> pd.DataFrame:
@@ -20,22 +52,16 @@ def drought_prediction() -> pd.DataFrame:
     drought_df = pd.read_csv("data/temp/drought.csv")
     fips = drought_df["FIPS"].unique()
 
-    # Check data collection progress based on whether a checkpoint file exists
-    if os.path.isfile("data/temp/drought_predict_checkpoint.csv"):
-        drought_pred_df = pd.read_csv("data/temp/drought_predict_checkpoint.csv")
-        completed = drought_pred_df.dropna()["Fips"].tolist()
-        print("Drought prediction checkpoint file exists.")
     # Early return if the prediction data already exists
-    elif os.path.isfile("data/temp/drought_predict.csv"):
-        drought_pred_df = pd.read_csv("data/temp/drought_predict.csv")
+    checkpoint = integration.Checkpoint("drought_predict", ["Fips"], path="data/temp/drought_predict.csv")
+    if checkpoint.exists():
+        drought_pred_df = pd.read_csv(checkpoint.path)
         print("Drought prediction data exists.")
         return drought_pred_df
-    # If the predictions have not been started create a new dataframe
-    else:
-        drought_pred_df = pd.DataFrame(fips, columns=["Fips"])
-        drought_pred_df["Predict"] = np.nan
-        completed = []
-        print("No drought prediction data exists.")
+    # Otherwise resume from the counties already predicted
+    drought_pred_df = pd.DataFrame(fips, columns=["Fips"])
+    drought_pred_df["Predict"] = np.nan
+    drought_pred_df = checkpoint.resume(drought_pred_df, fill=True)
 
     # Change to the data to the datetime pandas format
     drought_df['MapDate'] = drought_df['MapDate'].apply(lambda x: str(x)[:4]+"-"+str(x)[4:6]+"-"+str(x)[6:8])
@@ -44,28 +70,28 @@ def drought_prediction() -> pd.DataFrame:
     # Create a new column called Time representing the days since the start
     county_groups = drought_df.groupby("FIPS")
     prediction_count = 0
-    for county, county_df in county_groups:
-        if county in completed:
-            continue
-        first_date = drought_df['MapDate'].iat[-1]
-        county_df['Days'] = drought_df['MapDate'].apply(lambda curr_date: (curr_date - first_date).days)
-
-        # Build regression model and make a 5-year prediction
-        reg = linear_model.LinearRegression()
-        reg.fit(county_df[['Days']].values, county_df['Drought'].values)
-        prediction = float(reg.predict([[10000]]))
-        print(f"{prediction_count}. {county_df['County'].iat[0]} ({county}): {round(prediction, 3)}")
-
-        # Store the prediction in the prediction df and save to checkpoint file
-        drought_pred_df.loc[drought_pred_df["Fips"] == county, "Predict"] = prediction
-        prediction_count += 1
-        if prediction_count == 10:
-            drought_pred_df.to_csv("data/temp/drought_predict_checkpoint.csv", index=False)
-            prediction_count = 0
-
-    drought_pred_df.to_csv("data/temp/drought_predict.csv", index=False)
-    os.remove("data/temp/drought_predict_checkpoint.csv")
-    
+    with checkpoint:
+        for county, county_df in county_groups:
+            if checkpoint.done(county):
+                continue
+            first_date = drought_df['MapDate'].iat[-1]
+            county_df['Days'] = drought_df['MapDate'].apply(lambda curr_date: (curr_date - first_date).days)
+
+            # Build regression model and make a 5-year prediction
+            reg = linear_model.LinearRegression()
+            reg.fit(county_df[['Days']].values, county_df['Drought'].values)
+            prediction = float(reg.predict([[10000]]))
+            print(f"{prediction_count}. {county_df['County'].iat[0]} ({county}): {round(prediction, 3)}")
+
+            # Store the prediction in the prediction df and journal it in chunks
+            drought_pred_df.loc[drought_pred_df["Fips"] == county, "Predict"] = prediction
+            checkpoint.add({"Fips": int(county), "Predict": prediction})
+            prediction_count += 1
+
+    checkpoint.promote(drought_pred_df)
+
+    return drought_pred_df
+
 
 def voting(party) -> pd.DataFrame:
     """
@@ -75,23 +101,18 @@ def voting(party) -> pd.DataFrame:
     csv_name = "voting"
     voting_df = pd.read_csv(f"data/{csv_name}.csv")
 
-    # Does a checkpoint file exist
-    if os.path.isfile(f"data/temp/{csv_name}_predict_checkpoint.csv"):
-        voting_pred_df = pd.read_csv(f"data/temp/{csv_name}_predict_checkpoint.csv")
-        completed = voting_pred_df.dropna()["Place"].tolist()
-        print("Voting prediction checkpoint file exists.")
-    # Early return if the data exists
-    elif os.path.isfile(f"data/temp/{csv_name}_predict.csv"):
-        voting_pred_df = pd.read_csv(f"data/temp/{csv_name}_predict.csv")
+    # Early return if the data exists, each party has its own predictions
+    name = f"{csv_name}_{party}_predict"
+    checkpoint = integration.Checkpoint(name, ["Place", "StateCode"], path=f"data/temp/{name}.csv")
+    if checkpoint.exists():
+        voting_pred_df = pd.read_csv(checkpoint.path)
         print("Voting prediction data exists.")
         return voting_pred_df
-    # If unstarted, create a new dataframe
-    else:
-        voting_pred_df = voting_df.drop_duplicates(subset = ['Place','StateCode'], keep ='last').reset_index(drop=True)
-        voting_pred_df = voting_pred_df[["Place", "StateCode", party]]
-        voting_pred_df[f"{party}Pred"] = np.nan
-        completed = []
-        print("No voting prediction data exists.")
+    # Otherwise resume from the cities already predicted
+    voting_pred_df = voting_df.drop_duplicates(subset = ['Place','StateCode'], keep ='last').reset_index(drop=True)
+    voting_pred_df = voting_pred_df[["Place", "StateCode", party]]
+    voting_pred_df[f"{party}Pred"] = np.nan
+    voting_pred_df = checkpoint.resume(voting_pred_df, fill=True)
 
     # voting_pred_df only contains cities in rows not dates like voting_df
     # Change to dates to the datetime pandas format
@@ -100,30 +121,29 @@ def voting(party) -> pd.DataFrame:
     # Create a new column called Time representing the days since the start
     city_groups = voting_df.groupby(["Place", "StateCode"])
     prediction_count = 0
-    for city, city_df in city_groups:
-        if city in completed:
-            continue
-        first_date = voting_df['Date'].iat[-1]
-        city_df['Days'] = voting_df['Date'].apply(lambda curr_date: (curr_date - first_date).days)
-
-        # Sometime cities contain a "?" if the voting page was broken
-        if "?" in city_df[party].values:
-            continue
-        else:
-            # Build regression model and make a 4-year prediction
-            reg = linear_model.LinearRegression()
-            reg.fit(city_df[['Days']].values, city_df[party].values)
-            prediction = float(reg.predict([[1460]]))
-            print(f"{prediction_count}. {city[0]}, ({city[1]}): {round(prediction, 3)}")
-
-        # Store the prediction in the prediction df and save to checkpoint file
-        voting_pred_df.loc[(voting_pred_df['Place'] == city[0]) & (voting_pred_df['StateCode'] == city[1]), f"{party}Pred"] = prediction
-        prediction_count += 1
-        if prediction_count == 10:
-            voting_pred_df.to_csv(f"data/temp/{csv_name}_predict_checkpoint.csv", index=False)
-            prediction_count = 0
-
-    voting_pred_df.to_csv(f"data/temp/{csv_name}_predict.csv", index=False)
+    with checkpoint:
+        for city, city_df in city_groups:
+            if checkpoint.done(*city):
+                continue
+            first_date = voting_df['Date'].iat[-1]
+            city_df['Days'] = voting_df['Date'].apply(lambda curr_date: (curr_date - first_date).days)
+
+            # Sometime cities contain a "?" if the voting page was broken
+            if "?" in city_df[party].values:
+                continue
+            else:
+                # Build regression model and make a 4-year prediction
+                reg = linear_model.LinearRegression()
+                reg.fit(city_df[['Days']].values, city_df[party].values)
+                prediction = float(reg.predict([[1460]]))
+                print(f"{prediction_count}. {city[0]}, ({city[1]}): {round(prediction, 3)}")
+
+            # Store the prediction in the prediction df and journal it in chunks
+            voting_pred_df.loc[(voting_pred_df['Place'] == city[0]) & (voting_pred_df['StateCode'] == city[1]), f"{party}Pred"] = prediction
+            checkpoint.add({"Place": city[0], "StateCode": city[1], f"{party}Pred": prediction})
+            prediction_count += 1
+
+    checkpoint.promote(voting_pred_df)
 
     # Merge the results into all.csv
     all_df = pd.read_csv("data/all_test.csv")
@@ -132,65 +152,63 @@ def voting(party) -> pd.DataFrame:
 
 
 
-def find_eden():
+def eden_scores(matrix: np.ndarray, columns: list[str]) -> np.ndarray:
     """
-    Normalizes all the features and then assigns an Eden Score to each city.
+    Applies the Eden Function to a normalized feature matrix.
+
+    Only the weighted features are read, so a missing value in any other
+    feature, such as UV, leaves a place's score unchanged.
+
+    Parameters
+    ----------
+    matrix : np.ndarray
+        The normalized features, one row per place.
+    columns : list[str]
+        The feature of each matrix column.
+
+    Returns
+    -------
+    eden_score : np.ndarray
+        The Eden Score of each place rounded to 3 decimals.
+
+    Raises
+    ------
+    KeyError
+        If a weighted feature is not in the matrix.
 
     """
-    all_df = pd.read_csv("data/all.csv")
-
-    # List of features that will be used in the Eden model
-    features = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality", "HotScore", "ClimateScore",
-                "ColdScore", "Rainfall", "Snowfall", "Sunshine", "UV", "Above90", "Elevation",
-                "Below30", "Below0","Density", "HouseConstitutionality", "SenateConstitutionality",
-                "HomeInsurance", "Drought", "DemVotePred", "RepVotePred", "MedianHomeAge", "PropertyTaxRate",
-                "MedianHomeCost", "TempleDistance", "SocietalCrime", "PropertyCrime", "ViolentCrime"
-                ]
-    predict_df = all_df.filter(features)
-    
-    predict_df.loc[predict_df['Snowfall'] < 25, 'Snowfall'] = 0
-    predict_df.loc[(predict_df['Snowfall'] >= 25) & (predict_df['Snowfall'] < 35), 'Snowfall'] = 0.4
-    predict_df.loc[predict_df['Snowfall'] >= 35, 'Snowfall'] = 1
-
-    # Normalize the data
-    normalize = lambda x: (x-x.min()) / (x.max()-x.min())
-    predict_df = predict_df.apply(normalize)
- 
     # The Eden Function - Negative value indicate unfavorable features
-    eden = lambda x: round(x.Physicians*(0)
-                         - x.HealthCosts*(0) 
-                         + x.WaterQuality*(2) 
-                         + x.AirQuality*(2) 
-                         + x.Elevation*(3)
-                         + x.ColdScore*(1) 
-                         + x.HotScore*(4) 
-                         - x.Above90*(8) 
-                         - x.Below0*(2) 
-                         + x.Rainfall*(1) 
-                         - x.Snowfall*(7)
-                         - x.Drought*(4)
-                         + x.Sunshine*(3) 
-                         - x.Density*(1) 
-                         - x.HomeInsurance*(2) 
-                         + x.HouseConstitutionality*(1) 
-                         + x.SenateConstitutionality*(1) 
-                         - x.DemVotePred*(2)
-                         + x.RepVotePred*(2)
-                         - x.MedianHomeAge*(.5)
-                         - x.PropertyTaxRate*(3)
-                         - x.MedianHomeCost*(4)
-                         - x.TempleDistance*(1)
-                         - x.SocietalCrime*(1)
-                         - x.PropertyCrime*(2)
-                         - x.ViolentCrime*(3), 3)
-
-    predict_df["EdenScore"] = predict_df.apply(eden, axis = 1)
-    
+    missing = [feature for feature in EDEN_WEIGHTS if feature not in columns]
+    if missing:
+        raise KeyError(f"Features missing from all.csv: {', '.join(missing)}")
+    weighted = matrix[:, [columns.index(feature) for feature in EDEN_WEIGHTS]].astype(np.float64)
+    weights = np.array(list(EDEN_WEIGHTS.values()), dtype=np.float64)
+
+    return np.round(weighted @ weights, 3)
+
+
+@storage.uses_store
+def find_eden(store: storage.FeatureStore = None):
+    """
+    Normalizes all the features and then assigns an Eden Score to each city.
+
+    """
+    # The matrix is built from all on disk, so the features added so far are written first
+    store.checkpoint()
+    # Open the normalized features, rebuilt only when all has changed
+    features.build_matrix()
+    matrix, _, metadata = features.open_matrix()
+    columns = metadata["columns"]
+
+    eden_score = eden_scores(matrix, columns)
+
     # Add prediction to all.csv and write out
-    all_df["EdenScore"] = predict_df["EdenScore"].values
-    all_df.to_csv("data/all.csv", index=False)
+    store.assign(EdenScore=eden_score)
+    store.checkpoint()
+    predict_df = pd.DataFrame(matrix, columns=columns).assign(EdenScore=eden_score)
     predict_df.to_csv("data/predict.csv", index=False)
 
+
 if __name__ == "__main__":
     # Don't forget to update the feature you want to plot
     find_eden()
@@ -4,8 +4,117 @@ import pandas as pd
 import os
 import re
 import numpy as np
-from scipy import spatial
-from geopy.distance import geodesic
+import eden.geo as geo
+import eden.integration as integration
+import eden.schema as schema
+import eden.storage as storage
+import time
+
+
+def to_numbers(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """
+    Converts feature columns to floats in one vectorized pass per column.
+
+    Units like " in." or " days", thousands separators and "$" or "%" signs
+    are stripped, and "?" or empty cells become NaN.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw collected features.
+    columns : list[str]
+        The columns to convert.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The dataframe with the columns converted.
+    """
+    df = df.copy()
+    for column in columns:
+        df[column] = schema.parse_numbers(df[column])
+
+    return df
+
+
+def normalize(values: pd.Series, reverse: bool = False, decimals: int = 3) -> pd.Series:
+    """
+    Min-max normalizes a feature between 0 and 1.
+
+    Parameters
+    ----------
+    values : pd.Series
+        The numeric feature, NaN values are ignored and kept.
+    reverse : bool
+        Flip the scale so the smallest value becomes 1, for features where lower is better.
+    decimals : int
+        Number of decimals the result is rounded to.
+
+    Returns
+    -------
+    normalized : pd.Series
+        The normalized feature.
+    """
+    values = values.astype(float)
+    normalized = (values - values.min()) / (values.max() - values.min())
+    if reverse:
+        normalized = (normalized - 1).abs()
+
+    return normalized.round(decimals)
+
+
+def fill_group_median(df: pd.DataFrame, columns: list[str], by: str) -> pd.DataFrame:
+    """
+    Fills missing values with the median of their group, e.g. of their state.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe with missing values.
+    columns : list[str]
+        The columns to fill.
+    by : str
+        The column defining the groups.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The dataframe with the missing values filled where the group has any values.
+    """
+    df = df.copy()
+    medians = df.groupby(by, observed=True)[columns].transform("median")
+    df[columns] = df[columns].fillna(medians)
+
+    return df
+
+
+def group_is_current(store: storage.FeatureStore, group: str, fingerprint: str, column: str) -> bool:
+    """
+    Checks whether a feature group in all is up to date with its sources and code.
+
+    Parameters
+    ----------
+    store : storage.FeatureStore
+        The all table being built.
+    group : str
+        The feature group, e.g. "climate".
+    fingerprint : str
+        From integration.group_fingerprint.
+    column : str
+        A column of the group, if it is missing from all the group is not current.
+
+    Returns
+    -------
+    current : bool
+        False when the group has to be computed again.
+    """
+    if column not in store.columns():
+        return False
+    if integration.group_changed(group, fingerprint):
+        print(f"The {group} sources or code changed, recomputing {group} in all.csv.")
+        return False
+
+    return True
 
 
 def clean_counties(raw_county_df: pd.DataFrame) -> pd.DataFrame:
@@ -102,24 +211,20 @@ def clean_geodata(raw_geodata_df: pd.DataFrame) -> pd.DataFrame:
         Geodata with city, state, fip, county, lat, long, pop, density, zip.
     """
     # If data has already been collected in base.csv use that instead
-    if os.path.isfile("data/base.csv"):
-        base_df = pd.read_csv("data/base.csv")
-        if "Fips" in base_df:
+    if storage.exists("base"):
+        if "Fips" in storage.columns("base"):
             print("Geodata data exists.")
-            geodata_df = pd.read_csv("data/base.csv", keep_default_na=False)
-            geodata_df = geodata_df[
-                [
-                    "City",
-                    "StateCode",
-                    "Fips",
-                    "County",
-                    "Latitude",
-                    "Longitude",
-                    "Population",
-                    "Density",
-                    "Zip",
-                ]
-            ]
+            geodata_df = storage.read("base", columns=[
+                "City",
+                "StateCode",
+                "Fips",
+                "County",
+                "Latitude",
+                "Longitude",
+                "Population",
+                "Density",
+                "Zip",
+            ])
             return geodata_df
     elif os.path.isfile("data/temp/geodata_raw.csv"):
         geodata_df = pd.read_csv("data/temp/geodata_raw.csv")
@@ -184,9 +289,9 @@ def geodata_intersect(
         Merged data from with places, city, county, and geodata.
     """
     # Check if the base dataframe has already been created
-    if os.path.isfile("data/base.csv"):
+    if storage.exists("base"):
         print("Base dataframe already exists.")
-        base_df = pd.read_csv("data/base.csv")
+        base_df = storage.read("base")
         return base_df
     else:
         print("Generating base dataframe.")
@@ -212,7 +317,7 @@ def geodata_intersect(
 
     # Create a new dataframe with only the cities in common to remove errors
     base_df = pd.merge(reordered_df, geodata_df, on=["City", "StateCode", "County"])
-    base_df.to_csv("data/base.csv", index=False)
+    storage.write("base", base_df)
 
     # Use to vizualize the columns that failed to merge
     failed_df = reordered_df.merge(
@@ -223,7 +328,8 @@ def geodata_intersect(
     return base_df
 
 
-def clean_climate(raw_climate_df: pd.DataFrame) -> pd.DataFrame:
+@storage.uses_store
+def clean_climate(raw_climate_df: pd.DataFrame, store: storage.FeatureStore = None) -> pd.DataFrame:
     """
     Removes units and normalizes the scrapped climate data.
 
@@ -232,38 +338,30 @@ def clean_climate(raw_climate_df: pd.DataFrame) -> pd.DataFrame:
     all_df : pd.DataFrame
         Adds the climate data to the growing all.csv.
     """
-    # Check if the climate data has already been added to all.csv
-    if os.path.isfile("data/all.csv"):
-        all_df = pd.read_csv("data/all.csv")
-        if "ClimateScore" in all_df:
-            print("Climate data exists.")
-            return all_df
-    climate_df = raw_climate_df
-
-    # Replace question marks with NaN
-    climate_df.replace('?', np.nan)
-
-    # Clean climate features
+    # Check if the climate data in all.csv is up to date
+    fingerprint = integration.group_fingerprint(
+        [storage.csv_path("climate")], [clean_climate, to_numbers, normalize, schema.parse_numbers])
+    if group_is_current(store, "climate", fingerprint, "ClimateScore"):
+        print("Climate data exists.")
+        return store.read()
+    # Clean climate features, question marks become NaN
+    # Units are parsed when pages are collected, older csvs still have them
     features = ["HotScore", "ColdScore", "ClimateScore", "Rainfall", "Snowfall",
                 "Precipitation", "Sunshine", "UV", "Elevation", "Above90", "Below30", "Below0"]
-    normalize = ["HotScore", "ColdScore", "ClimateScore"]
-    for feature in features:
-        # Remove the period at the end of some columns and all non-alphanumeric characters
-        climate_df[feature] = climate_df[feature].apply(lambda x: float(
-            re.sub(r'[^0-9.]', '', str(x).strip("."))) if str(x)[-1] == "." else float(re.sub(r'[^0-9.]', '', str(x))))
-        if feature in normalize:
-            climate_df[feature] = round((climate_df[feature]-climate_df[feature].min()) /
-                                        (climate_df[feature].max()-climate_df[feature].min()), 3)
+    climate_df = to_numbers(raw_climate_df.drop(columns=schema.TRACKING_COLUMNS, errors="ignore"), features)
+    for feature in ["HotScore", "ColdScore", "ClimateScore"]:
+        climate_df[feature] = normalize(climate_df[feature])
 
     # Merge the combined data with all.csv
-    all_df = pd.merge(climate_df, all_df, on=["Place", "StateCode"])
-    all_df.to_csv("data/all.csv", index=False)
+    store.splice(climate_df, ["Place", "StateCode"])
+    store.record_group("climate", fingerprint)
     print("Climate data added to all.csv")
 
     return climate_df
 
 
-def add_house_voting_data():
+@storage.uses_store
+def add_house_voting_data(store: storage.FeatureStore = None):
     """
     Removes units and normalizes the scraped house voting data.
 
@@ -272,18 +370,22 @@ def add_house_voting_data():
     all_df : pd.DataFrame
         Adds the house averaged voting data to the growing all.csv.
     """
+    fingerprint = integration.group_fingerprint(["data/constitutional_voting_info.csv"], [add_house_voting_data])
+    if group_is_current(store, "house_voting", fingerprint, "HouseConstitutionality"):
+        print("House voting data exists.")
+        return
     voting_info = pd.read_csv(f"data/constitutional_voting_info.csv", keep_default_na=False)
     voting_info = voting_info.loc[voting_info['Branch'] == "house"][["CongressionalDistrict", "Constitutional (0-1)"]]
     voting_info = voting_info.groupby(["CongressionalDistrict"])["Constitutional (0-1)"].mean().reset_index()
     voting_info.rename(columns={'Constitutional (0-1)': 'HouseConstitutionality'}, inplace=True)
-    all_df = pd.read_csv("data/all.csv")
-    all_df = pd.merge(all_df, voting_info, on=["CongressionalDistrict"])
-    all_df.to_csv("data/all.csv", index=False)
+    store.splice(voting_info, ["CongressionalDistrict"])
+    store.record_group("house_voting", fingerprint)
 
     return voting_info
 
 
-def add_senate_voting_data():
+@storage.uses_store
+def add_senate_voting_data(store: storage.FeatureStore = None):
     """
     Removes units and normalizes the scraped senate data.
 
@@ -292,20 +394,24 @@ def add_senate_voting_data():
     all_df : pd.DataFrame
         Adds the senate averaged voting data to the growing all.csv.
     """
+    fingerprint = integration.group_fingerprint(["data/constitutional_voting_info.csv"], [add_senate_voting_data])
+    if group_is_current(store, "senate_voting", fingerprint, "SenateConstitutionality"):
+        print("Senate voting data exists.")
+        return
     voting_info = pd.read_csv(f"data/constitutional_voting_info.csv", keep_default_na=False)
     voting_info = voting_info.loc[voting_info['Branch'] == "senate"][["State", "Constitutional (0-1)"]]
     voting_info['State'] = voting_info['State'].str.lower()
     voting_info = voting_info.groupby(["State"])["Constitutional (0-1)"].mean().reset_index()
     voting_info.rename(columns={'Constitutional (0-1)': 'SenateConstitutionality'}, inplace=True)
     voting_info.rename(columns={'State': 'StateCode'}, inplace=True)
-    all_df = pd.read_csv("data/all.csv")
-    all_df = pd.merge(all_df, voting_info, on=["StateCode"])
-    all_df.to_csv("data/all.csv", index=False)
+    store.splice(voting_info, ["StateCode"])
+    store.record_group("senate_voting", fingerprint)
 
     return voting_info
 
 
-def combine_house_and_senate_data():
+@storage.uses_store
+def combine_house_and_senate_data(store: storage.FeatureStore = None):
     """
     Combines house and senate data into all.csv.
 
@@ -314,13 +420,14 @@ def combine_house_and_senate_data():
     all_df : pd.DataFrame
         Adds the senate and house averaged voting data to the growing all.csv.
     """
-    all_df = pd.read_csv("data/all.csv")
-    all_df['Constitutionality'] = (all_df['SenateConstitutionality'] + all_df['HouseConstitutionality']) * 2 / 3
-    all_df.to_csv("data/all.csv", index=False)
+    voting_df = store.read(columns=['SenateConstitutionality', 'HouseConstitutionality'])
+    constitutionality = (voting_df['SenateConstitutionality'] + voting_df['HouseConstitutionality']) * 2 / 3
+    all_df = store.assign(Constitutionality=constitutionality.values)
 
     return all_df
 
-def compute_temple_distances():
+@storage.uses_store
+def compute_temple_distances(store: storage.FeatureStore = None):
     """
     Gets the distance of each place from the nearest temple in miles.
 
@@ -330,26 +437,16 @@ def compute_temple_distances():
         Adds temple distances to the growing all.csv.
     """
     temples_df = pd.read_csv("data/temples.csv")
-    all_df = pd.read_csv("data/all.csv")
-    temple_coords = list(zip(temples_df.Latitude, temples_df.Longitude))
-
-    def get_distance(place):
-        tree = spatial.KDTree(temple_coords)
-        nearest_coord = tree.query([place])
-        temple_index = nearest_coord[1][0]
-        nearest_temple = temple_coords[temple_index]
-        return round(geodesic(place, nearest_temple).mi)
-
-    all_df['TempleDistance'] = all_df.apply(lambda x:
-                                            get_distance((x['Latitude'], x['Longitude'])),
-                                            axis=1
-                                        )
+    places_df = store.read(columns=["Latitude", "Longitude"])
 
-    all_df.to_csv("data/all.csv", index=False)
+    # One haversine ball tree over the temples answers every place at once
+    temple_distance = np.round(geo.nearest_distances(places_df, temples_df)).astype(int)
+    all_df = store.assign(TempleDistance=temple_distance)
 
     return all_df
 
-def add_housing_data():
+@storage.uses_store
+def add_housing_data(store: storage.FeatureStore = None):
     """
     Combines house data into all.csv.
 
@@ -358,21 +455,22 @@ def add_housing_data():
     all_df : pd.DataFrame
         Adds the house data to the growing all.csv.
     """
-    housing_info = pd.read_csv(f"data/housing.csv", keep_default_na=False, low_memory=False)
+    housing_info = storage.read("housing", columns=[
+        "Median Home Age", "Property Tax Rate", "Median Home Cost", "Place", "StateCode"])
     housing_info.rename(columns={
         'Median Home Age': 'MedianHomeAge',
         'Median Home Cost' : "MedianHomeCost",
         'Property Tax Rate': "PropertyTaxRate"
     }, inplace=True)
     housing_info = housing_info[["MedianHomeAge", "PropertyTaxRate", "MedianHomeCost", "Place", "StateCode"]]
-    all_df = pd.read_csv("data/all.csv")
-    all_df = pd.merge(housing_info, all_df, on=["Place", "StateCode"])
+    all_df = pd.merge(housing_info, store.read(), on=["Place", "StateCode"])
     all_df.to_csv("data/all_test.csv", index=False)
 
     return all_df
 
 
-def clean_health(raw_health_df: pd.DataFrame) -> pd.DataFrame:
+@storage.uses_store
+def clean_health(raw_health_df: pd.DataFrame, store: storage.FeatureStore = None) -> pd.DataFrame:
     """
     Removes units and normalizes the scrapped health data.
 
@@ -381,43 +479,30 @@ def clean_health(raw_health_df: pd.DataFrame) -> pd.DataFrame:
     all_df : pd.DataFrame
         Adds the health data to the growing all.csv.
     """
-    # Check if the health data has already been added to all.csv
-    if os.path.isfile("data/all.csv"):
-        all_df = pd.read_csv("data/all.csv")
-        if "Physicians" in all_df:
-            print("Health data exists.")
-            return all_df
-    health_df = raw_health_df
-
-    # Replace question marks with NaN
-    health_df = health_df.replace('?', np.nan)
-    # health_df = health_df.dropna()
-    # health_df.to_csv("data/health_error.csv", index=False)
-
-    # Clean health features
+    # Check if the health data in all.csv is up to date
+    fingerprint = integration.group_fingerprint(
+        [storage.csv_path("health")], [clean_health, to_numbers, normalize, schema.parse_numbers])
+    if group_is_current(store, "health", fingerprint, "Physicians"):
+        print("Health data exists.")
+        return store.read()
+    # Clean health features, question marks become NaN and commas like "1,024" are removed
     features = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality"]
-    normalize = ["WaterQuality", "AirQuality"]
-    reverse_normalize = ["HealthCosts"]
-    for feature in features:
-        # Remove the period at the end of some columns and all non-alphanumeric characters
-        health_df[feature] = health_df[feature].apply(lambda x: x.replace(",", "") if isinstance(x, str) else x)
-        health_df[feature] = health_df[feature].apply(lambda x: x if x == "?" else float(x))
-        if feature in normalize:
-            health_df[feature] = round((health_df[feature]-health_df[feature].min()) /
-                                       (health_df[feature].max()-health_df[feature].min()), 3)
-        if feature in reverse_normalize:
-            health_df[feature] = round(abs((health_df[feature]-health_df[feature].min()) /
-                                       (health_df[feature].max()-health_df[feature].min()) - 1), 3)
+    health_df = to_numbers(raw_health_df.drop(columns=schema.TRACKING_COLUMNS, errors="ignore"), features)
+    for feature in ["WaterQuality", "AirQuality"]:
+        health_df[feature] = normalize(health_df[feature])
+    # Lower health costs are better
+    health_df["HealthCosts"] = normalize(health_df["HealthCosts"], reverse=True)
 
     # Merge the combined data with all.csv
-    all_df = pd.merge(health_df, all_df, on=["Place", "StateCode"])
-    all_df.to_csv("data/all.csv", index=False)
+    store.splice(health_df, ["Place", "StateCode"])
+    store.record_group("health", fingerprint)
     print("Health data added to all.csv")
 
     return health_df
 
 
-def merge_home_insurance() -> pd.DataFrame:
+@storage.uses_store
+def merge_home_insurance(store: storage.FeatureStore = None) -> pd.DataFrame:
     """
     Merges the house insurance data.
 
@@ -429,44 +514,45 @@ def merge_home_insurance() -> pd.DataFrame:
     # Check whether a data collection is in progress
     if os.path.isfile("data/all_insurance.csv"):
         all_df = pd.read_csv("data/all_insurance.csv")
-    elif os.path.isfile("data/all.csv"):
-        all_df = pd.read_csv("data/all.csv")
-        if "HomeInsurance" in all_df:
-            print("HomeInsurance data exists in all.csv.")
-            return all_df
     else:
-        all_df = pd.read_csv("data/all.csv")
-        all_df["HomeInsurance"] = np.nan
+        all_df = store.read()
     homes_df = pd.read_csv("data/temp/home_insurance.csv")
 
-    # Loop over the zip codes in all.csv
-    for index_all, zips_all in all_df.iterrows():
-        prices: list[int] = []
-        # Check if a value has already been computed for the current city
-        if isinstance(all_df.at[index_all, "HomeInsurance"], int):
-            continue
-
-        # The zips codes are strings so we convert them to integars
-        zips_list = zips_all["Zip"].split()
-        zips_list = [int(z) for z in zips_list]
-
-        # Loop over the zip codes in home_insurance.csv
-        for index_home, zip_home in homes_df.iterrows():
-            if zip_home["Zip"] in zips_list:
-                prices.append(int(homes_df.iloc[index_home]["Price"].replace("$", "").replace(",", "")))
+    # Parse every price once, e.g. "$1,234" to 1234
+    homes_df["Price"] = pd.to_numeric(homes_df["Price"].astype(str).str.replace(r"[$,]", "", regex=True))
+    homes_df = homes_df[["Zip", "Price"]]
+
+    # One row per (city, zip) pair, the zips codes are strings so we convert them to integars
+    city_zips = all_df["Zip"].str.split().explode().dropna().astype(int).rename("Zip").rename_axis("Row").reset_index()
+
+    # Only cities with a zip whose price changed since the last merge need new averages
+    applied_path = "data/temp/home_insurance_applied.csv"
+    if "HomeInsurance" in all_df and os.path.isfile(applied_path):
+        applied_df = pd.read_csv(applied_path)
+        diff_df = homes_df.drop_duplicates().merge(applied_df.drop_duplicates(), how="outer", indicator=True)
+        changed_zips = diff_df.loc[diff_df["_merge"] != "both", "Zip"]
+        rows = city_zips.loc[city_zips["Zip"].isin(changed_zips), "Row"].unique()
+        if len(rows) == 0:
+            print("HomeInsurance data is up to date.")
+            return all_df
+        print(f"Updating HomeInsurance for {len(rows)} cities with new zip prices.")
+    else:
+        all_df["HomeInsurance"] = np.nan
+        rows = all_df.index.values
 
-        # Average the collected prices for each city
-        if len(prices) == 0:
-            continue
-        else:
-            average_price = sum(prices) / len(prices)
-        all_df.at[index_all, "HomeInsurance"] = average_price
+    # Join the cities' zips to the prices and average the prices of each city
+    prices = city_zips[city_zips["Row"].isin(rows)].merge(homes_df, on="Zip").groupby("Row")["Price"].mean()
+    all_df.loc[rows, "HomeInsurance"] = prices.reindex(rows).values
 
     all_df.to_csv("data/all_insurance.csv", index=False)
+    homes_df.to_csv(applied_path, index=False)
     print("Merged home insurance into all.csv")
 
+    return all_df
+
 
-def clean_drought():
+@storage.uses_store
+def clean_drought(store: storage.FeatureStore = None):
     """
     Calculates standardized drought metric from raw droughtmonitor.unl.edu data.
 
@@ -475,12 +561,11 @@ def clean_drought():
     drought_df : pd.DataFrame
         Standardized drought data combined metric normalized.
     """
-    # Look for drought complete data, checkpoint, or no data
-    if os.path.isfile("data/all.csv"):
-        all_df = pd.read_csv("data/all.csv")
-        if "Drought" in all_df:
-            print("Drought data exists in all.csv.")
-            return
+    # Look for up to date drought data, raw data, or no data
+    fingerprint = integration.group_fingerprint(["data/temp/drought_raw.csv"], [clean_drought, normalize])
+    if group_is_current(store, "drought", fingerprint, "Drought"):
+        print("Drought data exists in all.csv.")
+        return
     if os.path.isfile("data/temp/drought_raw.csv"):
         print("Raw drought data exists.")
         drought_df = pd.read_csv("data/temp/drought_raw.csv")
@@ -490,12 +575,8 @@ def clean_drought():
     print("Standardizing drought data.")
     # Change the name of the FIPS column to match the Fips column in all.csv
     drought_df.rename(columns={'FIPS': 'Fips'}, inplace=True)
-    # Create a new column for the drought metric
-    drought_df["Drought"] = 0
     # Drought metric is the severity multiplied by the affect population summed
-    drought_df["Drought"] = drought_df.apply(
-        lambda x: (x.D1) + (x.D2 * 2) + (x.D3 * 3) + (x.D4 * 4), axis=1
-    )
+    drought_df["Drought"] = drought_df["D1"] + drought_df["D2"] * 2 + drought_df["D3"] * 3 + drought_df["D4"] * 4
     drought_df = drought_df.drop(
         [
             "ValidStart",
@@ -515,15 +596,15 @@ def clean_drought():
     drought_df = drought_df.groupby(["Fips"])["Drought"].mean().reset_index()
 
     # Normalize the drought data between 0 and 1
-    drought_df["Drought"] = round((drought_df["Drought"]-drought_df["Drought"].min()) /
-                                  (drought_df["Drought"].max()-drought_df["Drought"].min()), 3)
+    drought_df["Drought"] = normalize(drought_df["Drought"])
     # Store the drought data
-    all_df = pd.merge(all_df, drought_df, on=["Fips"])
-    all_df.to_csv("data/all.csv", index=False)
+    store.splice(drought_df, ["Fips"])
+    store.record_group("drought", fingerprint)
 
     return
 
-def clean_crime(crime_df: pd.DataFrame, print_coverage: bool) -> None:
+@storage.uses_store
+def clean_crime(crime_df: pd.DataFrame, print_coverage: bool, store: storage.FeatureStore = None) -> None:
     """
     Cleans and normalizes crime data.
     Switches from integer crime incidence to crime per capita.
@@ -535,6 +616,8 @@ def clean_crime(crime_df: pd.DataFrame, print_coverage: bool) -> None:
         Crime dataframe from get_crime()
     print_coverage: bool
         Controls printing crime data coverage % by state. Defaults to False.
+    store : storage.FeatureStore
+        The all table being built, all.csv is written when it is not given.
     """
 
     if print_coverage:
@@ -551,13 +634,15 @@ def clean_crime(crime_df: pd.DataFrame, print_coverage: bool) -> None:
             total_coverage = float(total_covered) / float(total_cities) * 100.0
         print("Total number of cities: %d\nTotal coverage: %3.0f%%" % (total_cities, total_coverage))
 
-    if os.path.isfile('data/all.csv'):
-        all_df = pd.read_csv('data/all.csv')
-        if 'PropertyCrime' in all_df:
-            # Data exists
-            return
-    
+    fingerprint = integration.group_fingerprint(
+        [storage.csv_path("crime")], [clean_crime, to_numbers, normalize, fill_group_median, schema.parse_numbers])
+    if group_is_current(store, "crime", fingerprint, "PropertyCrime"):
+        # Data exists
+        return
+
+
     # Standard crime rate per 100,000
+    crime_df = to_numbers(crime_df, ["Population", "SocietalCrime", "PropertyCrime", "ViolentCrime"])
     crime_df["SocietalCrime"] = crime_df["SocietalCrime"] / crime_df["Population"] * 1e5
     crime_df["PropertyCrime"] = crime_df["PropertyCrime"] / crime_df["Population"] * 1e5
     crime_df["ViolentCrime"] = crime_df["ViolentCrime"] / crime_df["Population"] * 1e5
@@ -565,31 +650,24 @@ def clean_crime(crime_df: pd.DataFrame, print_coverage: bool) -> None:
 
     # set missing places to the median crime rate for that state
     # otherwise places that were not in NIBRS will look better than they are
-    for state_code,state in state_codes().items():
-        state_df = crime_df.loc[crime_df["StateCode"] == state_code]
-        state_df.loc[:,"SocietalCrime"] = state_df["SocietalCrime"].apply(lambda x: state_df["SocietalCrime"].median() if pd.isna(x) else x)
-        state_df.loc[:,"PropertyCrime"] = state_df["PropertyCrime"].apply(lambda x: state_df["PropertyCrime"].median() if pd.isna(x) else x)
-        state_df.loc[:,"ViolentCrime"] = state_df["ViolentCrime"].apply(lambda x: state_df["ViolentCrime"].median() if pd.isna(x) else x)
-    crime_df = crime_df.replace([np.inf, np.nan, pd.NA], 0.0)
+    crime_features = ["SocietalCrime", "PropertyCrime", "ViolentCrime"]
+    crime_df[crime_features] = crime_df[crime_features].replace([np.inf, -np.inf], np.nan)
+    crime_df = fill_group_median(crime_df, crime_features, "StateCode")
+    crime_df[crime_features] = crime_df[crime_features].fillna(0.0)
 
     # Remove the top outliers twenty times. This deals with places like
     # Loving County, TX. Apparently only 50 people live there, but the 
     # Loving County PD reported 27 property crimes in 2022. This is unfortunately 
     # a result of crime data from police departments not reflecting the actual location.
     for i in range(20):
-        crime_df["SocietalCrime"] = round((crime_df["SocietalCrime"] - crime_df["SocietalCrime"].min()) /
-                                        (crime_df["SocietalCrime"].max() - crime_df["SocietalCrime"].min()), 3)
-        crime_df["PropertyCrime"] = round((crime_df["PropertyCrime"] - crime_df["PropertyCrime"].min()) /
-                                        (crime_df["PropertyCrime"].max() - crime_df["PropertyCrime"].min()), 3)
-        crime_df["ViolentCrime"] = round((crime_df["ViolentCrime"] - crime_df["ViolentCrime"].min()) /
-                                        (crime_df["ViolentCrime"].max() - crime_df["ViolentCrime"].min()), 3)
-        crime_df.loc[crime_df["SocietalCrime"] >= 0.95] = crime_df["SocietalCrime"].median()
-        crime_df.loc[crime_df["PropertyCrime"] >= 0.95] = crime_df["PropertyCrime"].median()
-        crime_df.loc[crime_df["ViolentCrime"] >= 0.95] = crime_df["ViolentCrime"].median()
-    crime_df = crime_df.replace([np.inf, np.nan, pd.NA], 0.0)
+        for feature in crime_features:
+            crime_df[feature] = normalize(crime_df[feature])
+            crime_df.loc[crime_df[feature] >= 0.95, feature] = crime_df[feature].median()
+    crime_df[crime_features] = crime_df[crime_features].fillna(0.0)
     
-    all_df = crime_df.merge(all_df, how='right', on=["Place", "StateCode"])
-    all_df.to_csv("data/all.csv", index=False)
+    crime_df = crime_df[["Place", "StateCode"] + crime_features]
+    store.splice(crime_df, ["Place", "StateCode"], how="left")
+    store.record_group("crime", fingerprint)
 
     return
 
@@ -659,6 +737,79 @@ def state_codes() -> dict:
 
     return state_dict
 
+
+def benchmark_cleaning(repeat: int = 3) -> dict:
+    """
+    Compares the per-cell cleaning code with the vectorized cleaning functions.
+
+    Uses the full climate.csv and health.csv tables. The "before" numbers
+    are the per-cell re.sub and lambda passes clean_climate and clean_health
+    used to make, the "after" numbers are to_numbers and normalize.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of passes over each table, the fastest pass is reported.
+
+    Returns
+    -------
+    results : dict[str, tuple[float, float]]
+        Seconds (before, after) for each table.
+    """
+    climate_features = ["HotScore", "ColdScore", "ClimateScore", "Rainfall", "Snowfall",
+                        "Precipitation", "Sunshine", "UV", "Elevation", "Above90", "Below30", "Below0"]
+    health_features = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality"]
+
+    def legacy_climate(df):
+        df = df.copy()
+        for feature in climate_features:
+            df[feature] = df[feature].apply(lambda x: float(
+                re.sub(r'[^0-9.]', '', str(x).strip("."))) if str(x)[-1] == "." else float(re.sub(r'[^0-9.]', '', str(x))))
+            if feature in ["HotScore", "ColdScore", "ClimateScore"]:
+                df[feature] = round((df[feature]-df[feature].min()) / (df[feature].max()-df[feature].min()), 3)
+
+    def legacy_health(df):
+        df = df.replace('?', np.nan)
+        for feature in health_features:
+            df[feature] = df[feature].apply(lambda x: x.replace(",", "") if isinstance(x, str) else x)
+            df[feature] = df[feature].apply(lambda x: x if x == "?" else float(x))
+            if feature in ["WaterQuality", "AirQuality"]:
+                df[feature] = round((df[feature]-df[feature].min()) / (df[feature].max()-df[feature].min()), 3)
+
+    def vectorized_climate(df):
+        df = to_numbers(df, climate_features)
+        for feature in ["HotScore", "ColdScore", "ClimateScore"]:
+            df[feature] = normalize(df[feature])
+
+    def vectorized_health(df):
+        df = to_numbers(df, health_features)
+        for feature in ["WaterQuality", "AirQuality"]:
+            df[feature] = normalize(df[feature])
+        df["HealthCosts"] = normalize(df["HealthCosts"], reverse=True)
+
+    def seconds(clean, df):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            clean(df)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    results = {}
+    print("   Table |  Rows | Before (s) | After (s) | Speedup")
+    for name, legacy, vectorized in (("climate", legacy_climate, vectorized_climate),
+                                     ("health", legacy_health, vectorized_health)):
+        if not os.path.isfile(f"data/{name}.csv"):
+            continue
+        # Read as text, like the collected csvs the clean functions were written for
+        df = pd.read_csv(f"data/{name}.csv", dtype=str)
+        before, after = seconds(legacy, df), seconds(vectorized, df)
+        results[name] = (before, after)
+        print(" %7s | %5d | %10.3f | %9.3f | %6.1fx" % (name, len(df), before, after, before / after))
+
+    return results
+
+
 if __name__ == "__main__":
     # Don't forget to update the feature you want to plot
     add_housing_data()
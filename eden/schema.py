@@ -0,0 +1,175 @@
+"""Functions for typing eden's tables from one central schema."""
+
+import os
+import re
+
+import pandas as pd
+
+# Feature value used by the collectors when a page is missing a value
+MISSING = "?"
+
+# Feature columns, stored as float32 wherever they appear
+FLOAT_FEATURES = [
+    # Climate
+    "HotScore", "ColdScore", "ClimateScore", "Rainfall", "Snowfall", "Precipitation", "Sunshine",
+    "UV", "Elevation", "Above90", "Below30", "Below0",
+    # Health
+    "Physicians", "HealthCosts", "WaterQuality", "AirQuality",
+    # Crime
+    "ViolentCrime", "PropertyCrime", "SocietalCrime",
+    # Housing, named as on the BestPlaces housing page and after renaming in all
+    "Median Home Age", "Median Home Cost", "Property Tax Rate",
+    "MedianHomeAge", "MedianHomeCost", "PropertyTaxRate",
+    # Derived features
+    "Density", "HouseConstitutionality", "SenateConstitutionality", "Constitutionality",
+    "HomeInsurance", "Drought", "DemVotePred", "RepVotePred", "TempleDistance", "EdenScore",
+]
+
+# Columns recording when and with which parser version each collected row was collected
+TRACKING_COLUMNS = ["CollectedAt", "SourceVersion"]
+
+# The type of every known column in every eden table, other columns keep their inferred type
+TYPES = {
+    "StateCode": "category",
+    "County": "category",
+    "CongressionalDistrict": "category",
+    "Fips": "Int32",
+    "Population": "Int32",
+    "Zip": "string",
+    "Latitude": "float64",
+    "Longitude": "float64",
+    "CollectedAt": "string",
+    "SourceVersion": "category",
+    **{feature: "float32" for feature in FLOAT_FEATURES},
+}
+
+# Everything that is not part of a number, e.g. the units in "53.7 in." or "$245,000"
+_NOT_NUMBER = re.compile(r"[^0-9.\-]")
+
+
+def parse_number(value):
+    """
+    Converts a collected value with units into a number.
+
+    Parameters
+    ----------
+    value : str | float
+        A value such as "53.7 in.", "646 ft.", "103.3 days", "$245,000" or "1.05%".
+
+    Returns
+    -------
+    number : float | str
+        The number, or "?" if the value contains no number.
+
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(_NOT_NUMBER.sub("", str(value)).rstrip("."))
+    except ValueError:
+        return MISSING
+
+
+def parse_numbers(values: pd.Series) -> pd.Series:
+    """
+    Converts a column of values with units into numbers in one vectorized pass.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Values such as "53.7 in.", plain numbers, "?" or empty cells.
+
+    Returns
+    -------
+    numbers : pd.Series
+        The values as floats, NaN where there is no number.
+
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    # Plain numbers, including ones like "1e-05", convert directly
+    numbers = pd.to_numeric(values, errors="coerce").astype(float)
+    with_units = numbers.isna() & values.notna()
+    if with_units.any():
+        text = values[with_units].astype(str).str.replace(_NOT_NUMBER, "", regex=True).str.rstrip(".")
+        numbers[with_units] = pd.to_numeric(text, errors="coerce")
+
+    return numbers
+
+
+def apply(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts every known column of a table to its schema type.
+
+    Numeric columns stored as text, with or without units, are parsed.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Any eden table.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        A typed copy of the table.
+
+    """
+    df = df.copy(deep=False)
+    for column in df.columns.intersection(list(TYPES)):
+        dtype = TYPES[column]
+        if dtype == "category" or dtype == "string":
+            df[column] = df[column].astype(dtype)
+        elif dtype == "Int32":
+            df[column] = parse_numbers(df[column]).round().astype("Int32")
+        else:
+            df[column] = parse_numbers(df[column]).astype(dtype)
+
+    return df
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Returns the bytes a dataframe uses in memory, including its strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def report(name: str, before: pd.DataFrame, after: pd.DataFrame) -> tuple[int, int]:
+    """
+    Prints the memory footprint of a table before and after typing.
+
+    Returns
+    -------
+    footprint : tuple[int, int]
+        Bytes used (before, after).
+
+    """
+    before_bytes, after_bytes = memory_usage(before), memory_usage(after)
+    print(" %10s | %8.1f MB | %8.1f MB | %5.1fx" % (
+        name, before_bytes / 1e6, after_bytes / 1e6, before_bytes / max(after_bytes, 1)))
+
+    return before_bytes, after_bytes
+
+
+def benchmark(tables: tuple = ("base", "climate", "health", "crime", "housing", "all")) -> dict:
+    """
+    Compares the memory used by each csv read as is and read through the schema.
+
+    Returns
+    -------
+    results : dict[str, tuple[int, int]]
+        Bytes used (before, after) for each table found in the data folder.
+
+    """
+    results = {}
+    print("      Table |     Before |      After | Ratio")
+    for name in tables:
+        if not os.path.isfile(f"data/{name}.csv"):
+            continue
+        raw_df = pd.read_csv(f"data/{name}.csv", low_memory=False)
+        results[name] = report(name, raw_df, apply(raw_df))
+
+    return results
+
+
+if __name__ == "__main__":
+    # Run from the eden folder
+    benchmark()
@@ -0,0 +1,288 @@
+"""Functions for storing eden's main tables in a typed columnar format."""
+
+import functools
+import os
+from typing import Callable
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import eden.integration as integration
+import eden.schema as schema
+
+# Tables kept as parquet, each one is also exported to data/{name}.csv
+TABLES = ("base", "climate", "health", "crime", "housing", "all")
+# Columns that must not be inferred as numbers when a table is imported from csv
+CSV_DTYPES = {"Zip": str, "CongressionalDistrict": str}
+
+
+def path(name: str) -> str:
+    """Returns the parquet file of a table."""
+    return f"data/{name}.parquet"
+
+
+def csv_path(name: str) -> str:
+    """Returns the csv export of a table."""
+    return f"data/{name}.csv"
+
+
+def exists(name: str) -> bool:
+    """Checks whether a table has been stored in either format."""
+    return os.path.isfile(path(name)) or os.path.isfile(csv_path(name))
+
+
+def _sync(name: str) -> None:
+    """
+    Imports a table's csv into parquet when the csv is missing or newer.
+
+    A csv newer than its parquet file was edited by hand or written by
+    something outside this module, so it is treated as the source of truth.
+    """
+    parquet, csv = path(name), csv_path(name)
+    if os.path.isfile(parquet) and (not os.path.isfile(csv) or os.path.getmtime(parquet) >= os.path.getmtime(csv)):
+        return
+    print(f"Importing {name}.csv into {name}.parquet.")
+    df = pd.read_csv(csv, dtype=CSV_DTYPES, keep_default_na=False, na_values=[""], low_memory=False)
+    print("      Table |     Before |      After | Ratio")
+    typed_df = schema.apply(df)
+    schema.report(name, df, typed_df)
+    _write_parquet(typed_df, parquet)
+
+
+def columns(name: str) -> list[str]:
+    """
+    Lists a table's columns by reading only the parquet footer.
+
+    Parameters
+    ----------
+    name : str
+        The table, e.g. "all".
+
+    Returns
+    -------
+    columns : list[str]
+        The column names, empty if the table does not exist.
+
+    """
+    if not exists(name):
+        return []
+    _sync(name)
+
+    return [column for column in pq.read_schema(path(name)).names if not column.startswith("__index_level_")]
+
+
+def read(name: str, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Reads a table, optionally only some of its columns.
+
+    Parameters
+    ----------
+    name : str
+        The table, e.g. "all".
+    columns : list[str]
+        The columns to read. Parquet stores columns separately, so the
+        other columns are never read from disk.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The table with the types in eden.schema.
+
+    """
+    _sync(name)
+
+    return pd.read_parquet(path(name), columns=columns)
+
+
+def write(name: str, df: pd.DataFrame, export_csv: bool = True) -> None:
+    """
+    Stores a table as parquet and, by default, exports it to csv.
+
+    Both files are replaced atomically. The csv is written first so the
+    parquet file is never older than the csv it matches. Columns are
+    cast to their eden.schema types once and both files are written from
+    the typed table, so they always hold the same values.
+
+    Parameters
+    ----------
+    name : str
+        The table, e.g. "all".
+    df : pd.DataFrame
+        The data to store.
+    export_csv : bool
+        Also write data/{name}.csv for people and tools that read csv.
+
+    """
+    typed_df = schema.apply(df)
+    if export_csv:
+        integration.write_atomic(typed_df, csv_path(name))
+    _write_parquet(typed_df, path(name))
+
+
+def assign(name: str, **new_columns) -> pd.DataFrame:
+    """
+    Adds or replaces columns of a stored table.
+
+    Parameters
+    ----------
+    name : str
+        The table, e.g. "all".
+    new_columns : array-like
+        The new column values in the table's row order, keyed by column name.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The updated table.
+
+    """
+    df = read(name).assign(**new_columns)
+    write(name, df)
+
+    return df
+
+
+class FeatureStore:
+    """
+    Holds a stored table in memory while pipeline steps add columns to it.
+
+    Steps read from the store and splice their columns into it instead of
+    reading, merging and writing the whole table each time. The table is
+    written once when the outermost ``with`` block using the store exits,
+    or when checkpoint is called. The fingerprints of feature groups
+    added to the store, and any other deferred bookkeeping, are only
+    recorded once their columns are on disk.
+
+    Parameters
+    ----------
+    name : str
+        The stored table, e.g. "all".
+
+    """
+
+    def __init__(self, name: str = "all") -> None:
+        self.name = name
+        self._df = None
+        self._changed = False
+        self._groups: dict[str, str] = {}
+        self._deferred: list[Callable[[], None]] = []
+        self._depth = 0
+
+    def __enter__(self) -> "FeatureStore":
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        # Every change is a whole step's columns, so they are kept even if a later step failed
+        if self._depth == 0:
+            self.checkpoint()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """The table, read from disk the first time it is used."""
+        if self._df is None:
+            self._df = read(self.name)
+        return self._df
+
+    @property
+    def csv_path(self) -> str:
+        """The table's csv, as listed in the writes of the pipeline stages using the store."""
+        return csv_path(self.name)
+
+    def columns(self) -> list[str]:
+        """Lists the table's columns without loading it if it is not in memory yet."""
+        if self._df is None:
+            return columns(self.name)
+        return list(self._df.columns)
+
+    def read(self, columns: list[str] = None) -> pd.DataFrame:
+        """Returns a copy of the table or of some of its columns."""
+        if columns is None:
+            return self.df.copy()
+        return self.df[columns].copy()
+
+    def replace(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Replaces the whole table."""
+        self._df = df
+        self._changed = True
+        return df
+
+    def assign(self, **new_columns) -> pd.DataFrame:
+        """Adds or replaces columns given in the table's row order."""
+        return self.replace(self.df.assign(**new_columns))
+
+    def splice(self, group_df: pd.DataFrame, keys: list[str], how: str = "inner") -> pd.DataFrame:
+        """
+        Adds a feature group's columns, replacing them if they are already there.
+
+        Parameters
+        ----------
+        group_df : pd.DataFrame
+            The keys and the freshly computed columns of one feature group.
+        keys : list[str]
+            The columns the group is joined on, e.g. ["Place", "StateCode"].
+        how : str
+            Join used the first time the group is added. When the group is
+            recomputed every row of the table is kept and only its columns change.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            The table with the group's columns.
+
+        """
+        df = self.df
+        stale = [c for c in group_df.columns if c not in keys and c in df]
+        if stale:
+            df = df.drop(columns=stale)
+            how = "left"
+
+        return self.replace(df.merge(group_df, on=keys, how=how))
+
+    def record_group(self, group: str, fingerprint: str) -> None:
+        """Records a feature group's fingerprint at the next checkpoint."""
+        self._groups[group] = fingerprint
+
+    def defer(self, callback: Callable[[], None]) -> None:
+        """Runs a callback at the next checkpoint, once the changes made so far are on disk."""
+        self._deferred.append(callback)
+
+    def checkpoint(self) -> None:
+        """Writes the table to disk if it changed since it was read or last written."""
+        if self._changed:
+            print(f"Writing {self.name}.csv.")
+            write(self.name, self._df)
+            self._changed = False
+        for group, fingerprint in self._groups.items():
+            integration.record_group(group, fingerprint)
+        self._groups.clear()
+        deferred, self._deferred = self._deferred, []
+        for callback in deferred:
+            callback()
+
+
+def uses_store(function):
+    """
+    Passes a FeatureStore of all to a step as its ``store`` keyword.
+
+    When the caller passes no store the step gets its own, written to
+    disk when the step returns, so steps still work when run on their own.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, store: FeatureStore = None, **kwargs):
+        with store or FeatureStore() as opened:
+            return function(*args, store=opened, **kwargs)
+
+    return wrapper
+
+
+def _write_parquet(df: pd.DataFrame, parquet: str) -> None:
+    """Atomically writes a dataframe to parquet, storing mixed object columns as strings."""
+    df = df.copy(deep=False)
+    # Arrow needs one type per column, e.g. scores mixed with "?" are kept as text
+    for column in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[column], skipna=True) in ("mixed", "mixed-integer"):
+            df[column] = df[column].astype("string")
+    df.to_parquet(f"{parquet}.tmp", index=False)
+    os.replace(f"{parquet}.tmp", parquet)
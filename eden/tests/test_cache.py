@@ -0,0 +1,89 @@
+"""Tests for the on-disk HTTP response cache."""
+
+import os
+import time
+
+import requests
+
+import eden.cache as cache
+
+URL = "https://www.bestplaces.net/climate/city/utah/provo"
+
+
+def page(text: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.encoding = "utf-8"
+    response._content = text.encode()
+    return response
+
+
+def test_storing_a_page_again_keeps_the_size_in_step_with_the_disk(tmp_path):
+    responses = cache.ResponseCache(str(tmp_path))
+    responses.store("GET", URL, None, page("first"))
+    responses.store("GET", URL, None, page("second, a longer page " * 50))
+    responses.store("GET", URL + "/2", None, page("other"))
+
+    assert responses.size == responses.disk_usage()
+    responses.forget("GET", URL)
+    assert responses.size == responses.disk_usage()
+
+
+def test_an_entry_evicted_while_it_is_loaded_is_a_miss(tmp_path, monkeypatch):
+    responses = cache.ResponseCache(str(tmp_path))
+    responses.store("GET", URL, None, page("provo"))
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert responses.load("GET", URL) is None
+
+
+def test_pages_expire_after_their_host_ttl(tmp_path, monkeypatch):
+    responses = cache.ResponseCache(str(tmp_path), ttls={"www.bestplaces.net": 60})
+    responses.store("GET", URL, None, page("provo"))
+    assert responses.load("GET", URL).text == "provo"
+
+    stored = time.time()
+    monkeypatch.setattr(time, "time", lambda: stored + 61)
+    assert responses.load("GET", URL) is None
+    assert responses.disk_usage() == 0
+
+
+def test_hosts_without_a_ttl_are_not_cached(tmp_path):
+    responses = cache.ResponseCache(str(tmp_path))
+    responses.store("GET", "https://example.com/", None, page("example"))
+
+    assert responses.load("GET", "https://example.com/") is None
+    assert responses.disk_usage() == 0
+
+
+def test_post_bodies_are_part_of_the_key(tmp_path):
+    url = "https://www.freedomfirstsociety.org/wp-admin/admin-ajax.php?action=scorecard_query_bills"
+    responses = cache.ResponseCache(str(tmp_path))
+    responses.store("POST", url, '{"congress": 112}', page("112"))
+    responses.store("POST", url, '{"congress": 113}', page("113"))
+
+    assert responses.load("POST", url, '{"congress": 112}').text == "112"
+    assert responses.load("POST", url, '{"congress": 113}').text == "113"
+    assert responses.load("POST", url, '{"congress": 114}') is None
+
+
+def test_eviction_drops_the_least_recently_used_pages(tmp_path):
+    responses = cache.ResponseCache(str(tmp_path))
+    urls = [f"{URL}/{i}" for i in range(3)]
+    for i, url in enumerate(urls):
+        responses.store("GET", url, None, page(os.urandom(2000).hex()))
+        # Stored a minute apart, the first page is then read again
+        os.utime(responses.path("GET", url), (1000 + 60 * i, 1000 + 60 * i))
+    responses.load("GET", urls[0])
+    entry_size = os.path.getsize(responses.path("GET", urls[0]))
+
+    responses.max_bytes = entry_size * 2.5
+    responses.evict()
+
+    assert responses.load("GET", urls[0]) is not None
+    assert responses.load("GET", urls[1]) is None
+    assert responses.load("GET", urls[2]) is not None
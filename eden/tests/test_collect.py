@@ -0,0 +1,111 @@
+"""Tests for the collectors that do not need a network connection."""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import eden.collect as collect
+
+NOW = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def climate_table() -> pd.DataFrame:
+    current = collect.source_version("climate")
+    return pd.DataFrame({
+        "Place": ["fresh", "old", "untracked", "reparsed", "unknown"],
+        "StateCode": ["ut", "ut", "co", "co", "ut"],
+        "HotScore": [5.0, 6.0, 7.0, 8.0, "?"],
+        "CollectedAt": [(NOW - timedelta(days=1)).isoformat(), (NOW - timedelta(days=90)).isoformat(), "",
+                        NOW.isoformat(), NOW.isoformat()],
+        "SourceVersion": [current, current, current, "older", current],
+    })
+
+
+def test_stale_places_selects_old_untracked_and_reparsed_places():
+    places = collect.stale_places(climate_table(), "climate", NOW - timedelta(days=30))
+
+    # Places without a collection time come first, then the least recently collected
+    assert places == [("untracked", "co"), ("old", "ut"), ("reparsed", "co")]
+
+
+def test_stale_places_filters_by_state_and_missing_features():
+    df = climate_table()
+
+    assert collect.stale_places(df, "climate", NOW, state="co") == [("untracked", "co"), ("reparsed", "co")]
+    assert collect.stale_places(df, "climate", NOW, missing=True) == [("unknown", "ut")]
+    assert collect.stale_places(df, "climate", NOW, state="co", missing=True) == []
+
+
+def scorecard(query: dict) -> dict:
+    """A small scorecard answer whose votes depend on the query."""
+    bills = {"HR1": {"correct_vote": "Yea"}, "HR2": {"correct_vote": "Nay"}, "HR3": {"correct_vote": "Yea"}}
+    if query["branch"] == "house":
+        voters = [("H1", "UT"), ("H2", "UT"), ("H3", "CO")]
+    else:
+        voters = [("S1", "UT"), ("S2", "CO")]
+    votes = []
+    for i, (bioguide_id, state) in enumerate(voters):
+        vote = {"voter_meta": {"bioguide_id": bioguide_id, "state": state}}
+        for j, bill_no in enumerate(bills):
+            # Every voter skips a different bill in some sessions
+            if (i + j + query["congress"]) % 4 == 0:
+                continue
+            vote[bill_no] = "Yea" if (i * 3 + j + int(query["session"]) + len(query["party"])) % 3 else "Nay"
+        votes.append(vote)
+
+    return {"bills": bills, "votes": votes}
+
+
+def baseline_constitutionality(queries: list[dict], districts_df: pd.DataFrame) -> pd.DataFrame:
+    """The scores as the original nested loops over each scorecard computed them."""
+    house_info = {year: {} for year in range(2011, 2025)}
+    senate_info = {year: {} for year in range(2011, 2025)}
+    for query in queries:
+        year = 2011 + 2 * (query["congress"] - 112) + int(query["session"]) - 1
+        response = scorecard(query)
+        for voter in response["votes"]:
+            bioguide_id = voter["voter_meta"]["bioguide_id"]
+            state = voter["voter_meta"]["state"]
+            if query["branch"] == "senate":
+                info = senate_info[year].setdefault(state, {"correct_votes": 0, "total_votes": 0})
+            else:
+                district = districts_df.loc[districts_df["BioguideIds"] == bioguide_id][str(query["congress"])].iloc[0]
+                if not district:
+                    continue
+                info = house_info[year].setdefault(district, {"state": state, "correct_votes": 0, "total_votes": 0})
+            for bill_no, bill_info in response["bills"].items():
+                if bill_no not in voter:
+                    continue
+                info["total_votes"] += 1
+                info["correct_votes"] += bill_info["correct_vote"] == voter[bill_no]
+                info["constitutional"] = round(info["correct_votes"] / info["total_votes"], 2)
+
+    rows = []
+    for year in range(2011, 2025):
+        for district, info in house_info[year].items():
+            rows.append((district, "house", year, info["constitutional"], info["state"]))
+        for state, info in senate_info[year].items():
+            rows.append(("N\\A", "senate", year, info["constitutional"], state))
+
+    return pd.DataFrame(rows, columns=["CongressionalDistrict", "Branch", "Year", "Constitutional (0-1)", "State"])
+
+
+def test_percent_constitutionality_matches_the_scorecard_loops(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    congresses = [str(congress) for congress in range(112, 119)]
+    districts_df = pd.DataFrame(
+        [["H1", *["UT-01"] * 7], ["H2", *["UT-02"] * 7], ["H3", "CO-05", "", *["CO-05"] * 5]],
+        columns=["BioguideIds", *congresses])
+    districts_df.to_csv("data/bioguide_district_info.csv", index=False)
+    asked = []
+
+    def query_scorecards(queries):
+        asked.extend(queries)
+        return [scorecard(query) for query in queries]
+
+    monkeypatch.setattr(collect, "_query_scorecards", query_scorecards)
+    df = collect.get_percent_constitutionality(update=True)
+
+    expected = baseline_constitutionality(asked, districts_df)
+    assert df.values.tolist() == expected.values.tolist()
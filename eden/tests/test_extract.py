@@ -0,0 +1,54 @@
+"""Tests for the page parsers and how collection handles pages they reject."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import eden.cache as cache
+import eden.extract as extract
+import eden.fetch as fetch
+
+MEMBER_URL = "https://www.congress.gov/member/a/A000001"
+# A member profile whose term cell is missing the congresses
+MALFORMED_MEMBER_PAGE = """
+<div class="overview-member-column-profile">
+  <table><tr><th class="member_chamber">House:</th><td>Utah</td></tr></table>
+</div>
+"""
+
+
+class PageCache:
+    """Stands in for the HTTP cache, answering every url with the same page."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def load(self, method: str, url: str):
+        return SimpleNamespace(status_code=200, text=self.text)
+
+
+def test_parse_member_terms_rejects_malformed_term():
+    with pytest.raises(ValueError):
+        extract.parse_member_terms(MALFORMED_MEMBER_PAGE)
+
+
+def test_parse_member_terms_rejects_missing_profile():
+    with pytest.raises(ValueError):
+        extract.parse_member_terms("<html></html>")
+
+
+def test_fetch_all_skips_malformed_member_page(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "get_cache", lambda: PageCache(MALFORMED_MEMBER_PAGE))
+    collected, rejected = [], []
+
+    fetch.fetch_all(
+        [("A000001", MEMBER_URL)],
+        lambda key, record: collected.append(key),
+        parser=extract.parse_member_terms,
+        processes=1,
+        retry_queue=fetch.RetryQueue(path=str(tmp_path / "retry.jsonl")),
+        on_parse_error=lambda key, error: rejected.append(key),
+    )
+
+    assert collected == []
+    assert rejected == ["A000001"]
@@ -0,0 +1,91 @@
+"""Tests for the rate limiting and retrying fetch engine."""
+
+import asyncio
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import eden.cache as cache
+import eden.fetch as fetch
+
+
+class EmptyCache:
+    """Stands in for the HTTP cache without any stored pages."""
+
+    def load(self, method: str, url: str):
+        return None
+
+
+def response(status_code: int, headers: dict = None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {}, text="")
+
+
+def test_token_bucket_spaces_requests_at_its_rate():
+    bucket = fetch.TokenBucket(rate=20.0)
+
+    async def acquire_all():
+        for _ in range(5):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+
+    # The first token is there from the start, the next four refill at 20 per second
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_adaptive_limiter_halves_on_throttle_and_speeds_up_after_a_healthy_run():
+    limiter = fetch.AdaptiveLimiter(rate=2.0, min_rate=0.5, step=0.25, healthy_run=3)
+
+    limiter.throttle()
+    assert limiter.rate == 1.0
+    limiter.throttle()
+    limiter.throttle()
+    assert limiter.rate == 0.5
+
+    for _ in range(3):
+        limiter.success()
+    assert limiter.rate == 0.75
+
+
+def test_adaptive_limiter_pauses_for_retry_after():
+    limiter = fetch.AdaptiveLimiter(rate=2.0)
+    limiter.throttle(retry_after=30)
+
+    assert limiter.paused_until - time.monotonic() > 29
+
+
+def test_retry_after_reads_seconds_and_dates():
+    assert fetch.retry_after(response(429, {"Retry-After": "12"})) == 12.0
+    assert fetch.retry_after(response(429)) is None
+    assert fetch.retry_after(response(429, {"Retry-After": "soon"})) is None
+    in_a_minute = fetch.retry_after(response(503, {"Retry-After": formatdate(time.time() + 60, usegmt=True)}))
+    assert 55 < in_a_minute <= 60
+
+
+def test_retry_queue_survives_a_restart(tmp_path):
+    path = str(tmp_path / "retry.jsonl")
+    queue = fetch.RetryQueue(path=path)
+    queue.add("https://a.test/1", "HTTP 503")
+    queue.add("https://a.test/1", "HTTP 503")
+    queue.add("https://a.test/2", "HTTP 429")
+    queue.remove("https://a.test/2")
+
+    reopened = fetch.RetryQueue(path=path)
+    assert list(reopened.entries) == ["https://a.test/1"]
+    assert reopened.entries["https://a.test/1"]["attempts"] == 2
+
+
+def test_fetch_all_retries_overloaded_pages(monkeypatch, tmp_path):
+    statuses = {"https://a.test/1": [503, 200], "https://a.test/2": [200]}
+    monkeypatch.setattr(cache, "get_cache", lambda: EmptyCache())
+    monkeypatch.setattr(fetch, "get", lambda url, **kwargs: response(statuses[url].pop(0)))
+    monkeypatch.setattr(fetch, "RETRY_BACKOFF", 0.0)
+    queue = fetch.RetryQueue(path=str(tmp_path / "retry.jsonl"))
+    collected = []
+
+    fetch.fetch_all([(1, "https://a.test/1"), (2, "https://a.test/2")],
+                    lambda key, page: collected.append(key), rate=100.0, retry_queue=queue)
+
+    assert sorted(collected) == [1, 2]
+    assert len(queue) == 0
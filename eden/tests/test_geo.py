@@ -0,0 +1,22 @@
+"""Tests for the offline geographical lookups."""
+
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+
+import eden.geo as geo
+
+
+def test_nearest_distances_match_a_brute_force_geodesic_search():
+    rng = np.random.default_rng(1)
+    pois_df = pd.DataFrame({"Latitude": rng.uniform(25, 49, 40), "Longitude": rng.uniform(-124, -67, 40)})
+    places_df = pd.DataFrame({"Latitude": rng.uniform(25, 49, 25), "Longitude": rng.uniform(-124, -67, 25)})
+
+    distances = geo.nearest_distances(places_df, pois_df)
+
+    expected = [
+        min(geodesic(place, poi).mi for poi in zip(pois_df["Latitude"], pois_df["Longitude"]))
+        for place in zip(places_df["Latitude"], places_df["Longitude"])
+    ]
+    # Haversine and geodesic distances differ by under 0.5%, so a near tie could pick either point
+    np.testing.assert_allclose(distances, expected, rtol=5e-3)
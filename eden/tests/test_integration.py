@@ -0,0 +1,157 @@
+"""Tests for the pipeline stages and the resumable checkpoints."""
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import eden.integration as integration
+from eden.integration import Stage
+
+
+class DeferringStore:
+    """Stands in for a FeatureStore, holding deferred callbacks until checkpoint is called."""
+
+    csv_path = "data/all.csv"
+
+    def __init__(self) -> None:
+        self.deferred = []
+
+    def defer(self, callback) -> None:
+        self.deferred.append(callback)
+
+    def checkpoint(self) -> None:
+        for callback in self.deferred:
+            callback()
+        self.deferred.clear()
+
+
+def _state(path) -> dict:
+    with open(path) as statef:
+        return json.load(statef)
+
+
+def test_store_stage_is_recorded_once_the_store_is_written(tmp_path):
+    state_path = str(tmp_path / "pipeline_state.json")
+    source = tmp_path / "health.csv"
+    source.write_text("Place\n")
+    stages = [
+        Stage("own_file", lambda: None, reads=[str(source)], writes=[str(tmp_path / "out.csv")]),
+        Stage("through_store", lambda: None, reads=[str(source)], writes=["data/all.csv"]),
+    ]
+    store = DeferringStore()
+
+    statuses = integration.run_stages(stages, workers=1, state_path=state_path, store=store)
+
+    assert statuses == {"own_file": "ran", "through_store": "ran"}
+    assert list(_state(state_path)) == ["own_file"]
+    store.checkpoint()
+    assert set(_state(state_path)) == {"own_file", "through_store"}
+
+
+def test_resume_adds_tracking_columns_to_an_older_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # A checkpoint csv written before rows were tracked
+    (tmp_path / "data" / "temp").mkdir(parents=True)
+    (tmp_path / "data" / "temp" / "climate_checkpoint.csv").write_text(
+        "Place,StateCode,HotScore\nProvo,ut,5.0\nOrem,ut,\n")
+    journal = integration.Journal("climate")
+    journal.append({"Place": "Orem", "StateCode": "ut", "HotScore": 6.0,
+                    "CollectedAt": "2026-10-01T00:00:00+00:00", "SourceVersion": "abc"})
+    journal.flush()
+
+    checkpoint = integration.Checkpoint("climate", ["Place", "StateCode"])
+    df = checkpoint.resume(pd.DataFrame(columns=["Place", "StateCode", "HotScore"]), fill=True)
+
+    orem = df.set_index("Place").loc["Orem"]
+    assert orem["CollectedAt"] == "2026-10-01T00:00:00+00:00"
+    assert orem["SourceVersion"] == "abc"
+    # The older row is still collected even though it has no tracking values
+    assert checkpoint.done("Provo", "ut") and checkpoint.done("Orem", "ut")
+
+
+def test_journal_replay_cuts_off_a_partial_last_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    journal = integration.Journal("climate", flush_every=10)
+    journal.append({"Place": "Provo", "StateCode": "ut"})
+    journal.flush()
+    # A crash in the middle of the next write
+    with open(journal.path, "a") as journalf:
+        journalf.write('{"Place": "Ore')
+
+    assert journal.replay() == [{"Place": "Provo", "StateCode": "ut"}]
+    journal.append({"Place": "Orem", "StateCode": "ut"})
+    journal.flush()
+    assert [record["Place"] for record in journal.replay()] == ["Provo", "Orem"]
+
+
+def test_checkpoint_resumes_appended_rows_and_promotes_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with integration.Checkpoint("voting", ["Place", "StateCode"]) as checkpoint:
+        checkpoint.resume(pd.DataFrame(columns=["Place", "StateCode", "RepVote"]))
+        checkpoint.add({"Place": "Provo", "StateCode": "ut", "RepVote": 70.0})
+
+    resumed = integration.Checkpoint("voting", ["Place", "StateCode"])
+    df = resumed.resume(pd.DataFrame(columns=["Place", "StateCode", "RepVote"]))
+    assert resumed.done("Provo", "ut") and not resumed.done("Orem", "ut")
+
+    resumed.promote(df, expected=[("Provo", "ut")])
+    assert pd.read_csv("data/voting.csv")["Place"].tolist() == ["Provo"]
+    assert not os.path.exists(resumed.journal.path)
+
+
+def test_checkpoint_keeps_its_journal_while_expected_rows_are_missing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with integration.Checkpoint("voting", ["Place", "StateCode"]) as checkpoint:
+        df = checkpoint.resume(pd.DataFrame(columns=["Place", "StateCode", "RepVote"]))
+        checkpoint.add({"Place": "Provo", "StateCode": "ut", "RepVote": 70.0})
+
+    with pytest.raises(RuntimeError):
+        checkpoint.promote(df, expected=[("Provo", "ut"), ("Orem", "ut")])
+    assert not os.path.exists("data/voting.csv")
+    assert os.path.exists(checkpoint.journal.path)
+
+
+def test_run_stages_skips_unchanged_stages_and_reruns_what_a_change_feeds(tmp_path):
+    state_path = str(tmp_path / "pipeline_state.json")
+    source, middle, final = (str(tmp_path / name) for name in ("source.csv", "middle.csv", "final.csv"))
+    runs = []
+
+    def copy(name, read_path, write_path):
+        def stage():
+            runs.append(name)
+            with open(read_path) as readf, open(write_path, "w") as writef:
+                writef.write(readf.read())
+        return stage
+
+    stages = [
+        Stage("middle", copy("middle", source, middle), reads=[source], writes=[middle]),
+        Stage("final", copy("final", middle, final), reads=[middle], writes=[final]),
+    ]
+    with open(source, "w") as sourcef:
+        sourcef.write("1")
+
+    assert integration.run_stages(stages, state_path=state_path) == {"middle": "ran", "final": "ran"}
+    assert integration.run_stages(stages, state_path=state_path) == {"middle": "skipped", "final": "skipped"}
+    with open(source, "w") as sourcef:
+        sourcef.write("2")
+    assert integration.run_stages(stages, state_path=state_path) == {"middle": "ran", "final": "ran"}
+    assert runs == ["middle", "final", "middle", "final"]
+
+
+def test_run_stages_blocks_the_stages_depending_on_a_failure(tmp_path):
+    shared, other = str(tmp_path / "shared.csv"), str(tmp_path / "other.csv")
+
+    def fail():
+        raise ValueError("no data")
+
+    stages = [
+        Stage("broken", fail, writes=[shared]),
+        Stage("dependent", lambda: None, reads=[shared], writes=[str(tmp_path / "dependent.csv")]),
+        Stage("independent", lambda: open(other, "w").close(), writes=[other]),
+    ]
+
+    statuses = integration.run_stages(stages, state_path=str(tmp_path / "pipeline_state.json"))
+
+    assert statuses == {"broken": "failed", "dependent": "blocked", "independent": "ran"}
@@ -0,0 +1,42 @@
+"""Tests for matching place names against agency names."""
+
+import numpy as np
+import pandas as pd
+
+import eden.match as match
+
+
+def contains_scan(names, agencies: pd.Series) -> dict:
+    """The first agency containing each name, found with one str.contains scan per name as get_crime did."""
+    matches = {}
+    for name in names:
+        found = agencies[agencies.str.contains(name, regex=False) == True]  # noqa: E712
+        if len(found) != 0:
+            matches[name] = found.index[0]
+
+    return matches
+
+
+def test_first_containing_matches_the_str_contains_scan():
+    agencies = pd.Series([
+        np.nan,
+        "orange_park_police_department",
+        "orange_county_sheriff",
+        "orange",
+        "park_city",
+        "lake_orange_park",
+        "",
+    ])
+    names = ["orange", "orange_park", "park", "orange_county", "lake", "lakeland", "", "e_p"]
+
+    matches = match.first_containing(names, zip(agencies.index, agencies))
+
+    assert matches == contains_scan(names, agencies)
+    assert matches["orange"] == 1 and matches["orange_park"] == 1 and matches[""] == 1
+
+
+def test_name_index_finds_overlapping_names():
+    index = match.NameIndex(["orange", "orange_park", "park", "range"])
+
+    assert index.search("lake_orange_park_pd") == {"orange", "orange_park", "park", "range"}
+    assert index.search("orang") == set()
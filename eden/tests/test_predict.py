@@ -0,0 +1,36 @@
+"""Tests for the Eden Score."""
+
+import numpy as np
+import pandas as pd
+
+import eden.predict as predict
+
+# Every feature the original find_eden normalized, weighted or not
+FEATURES = ["Physicians", "HealthCosts", "WaterQuality", "AirQuality", "HotScore", "ClimateScore",
+            "ColdScore", "Rainfall", "Snowfall", "Sunshine", "UV", "Above90", "Elevation",
+            "Below30", "Below0", "Density", "HouseConstitutionality", "SenateConstitutionality",
+            "HomeInsurance", "Drought", "DemVotePred", "RepVotePred", "MedianHomeAge", "PropertyTaxRate",
+            "MedianHomeCost", "TempleDistance", "SocietalCrime", "PropertyCrime", "ViolentCrime"]
+
+
+def baseline_eden(x):
+    """The Eden Function as the original find_eden applied it to each row."""
+    return round(x.Physicians*(0) - x.HealthCosts*(0) + x.WaterQuality*(2) + x.AirQuality*(2) + x.Elevation*(3)
+                 + x.ColdScore*(1) + x.HotScore*(4) - x.Above90*(8) - x.Below0*(2) + x.Rainfall*(1)
+                 - x.Snowfall*(7) - x.Drought*(4) + x.Sunshine*(3) - x.Density*(1) - x.HomeInsurance*(2)
+                 + x.HouseConstitutionality*(1) + x.SenateConstitutionality*(1) - x.DemVotePred*(2)
+                 + x.RepVotePred*(2) - x.MedianHomeAge*(.5) - x.PropertyTaxRate*(3) - x.MedianHomeCost*(4)
+                 - x.TempleDistance*(1) - x.SocietalCrime*(1) - x.PropertyCrime*(2) - x.ViolentCrime*(3), 3)
+
+
+def test_eden_scores_ignore_missing_unweighted_features():
+    matrix = np.random.default_rng(0).random((5, len(FEATURES)))
+    # Missing values in the features the Eden Function never reads
+    for row, feature in enumerate(["ClimateScore", "UV", "Below30"]):
+        matrix[row, FEATURES.index(feature)] = np.nan
+
+    expected = pd.DataFrame(matrix, columns=FEATURES).apply(baseline_eden, axis=1).to_numpy()
+    scores = predict.eden_scores(matrix, FEATURES)
+
+    assert not np.isnan(scores).any()
+    np.testing.assert_allclose(scores, expected, atol=1e-3)
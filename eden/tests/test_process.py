@@ -0,0 +1,67 @@
+"""Tests for the steps that add features to all."""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+import eden.process as process
+import eden.storage as storage
+
+
+def baseline_home_insurance(all_df: pd.DataFrame, homes_df: pd.DataFrame) -> list:
+    """The average price of each city's zips as the original nested loop computed it."""
+    averages = []
+    for _, zips_all in all_df.iterrows():
+        zips_list = [int(z) for z in zips_all["Zip"].split()]
+        prices = [int(price.replace("$", "").replace(",", ""))
+                  for zip_home, price in zip(homes_df["Zip"], homes_df["Price"]) if zip_home in zips_list]
+        averages.append(sum(prices) / len(prices) if prices else np.nan)
+
+    return averages
+
+
+def test_merge_home_insurance_matches_the_loop_and_updates_only_changed_zips(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "temp").mkdir(parents=True)
+    all_df = pd.DataFrame({
+        "Place": ["provo", "orem", "lehi"],
+        "StateCode": ["ut", "ut", "ut"],
+        "Zip": ["84601 84604", "84057 84058", "84043"],
+    })
+    homes_df = pd.DataFrame({"Zip": [84601, 84604, 84057, 99999], "Price": ["$1,000", "$1,500", "$900", "$5"]})
+    homes_df.to_csv("data/temp/home_insurance.csv", index=False)
+    store = storage.FeatureStore("all")
+    store.replace(all_df)
+
+    merged = process.merge_home_insurance(store=store)
+    np.testing.assert_allclose(merged["HomeInsurance"], baseline_home_insurance(all_df, homes_df))
+
+    # Only Orem has a zip whose price changed
+    homes_df.loc[2, "Price"] = "$1,100"
+    homes_df.to_csv("data/temp/home_insurance.csv", index=False)
+    updated = process.merge_home_insurance(store=store)
+
+    np.testing.assert_allclose(updated["HomeInsurance"], baseline_home_insurance(all_df, homes_df))
+    assert pd.read_csv("data/all_insurance.csv")["HomeInsurance"].tolist()[:2] == [1250.0, 1100.0]
+
+
+def test_cleaning_kernels_match_the_per_cell_cleaning():
+    climate_df = pd.DataFrame({"Rainfall": ["53.7 in.", "12 in.", "0.4 in."], "HotScore": ["5.1", "9.9", "7."]})
+    health_df = pd.DataFrame({"HealthCosts": ["1,024", "87.5", "?"]})
+
+    cleaned = process.to_numbers(climate_df, ["Rainfall", "HotScore"])
+    for feature in ["Rainfall", "HotScore"]:
+        # The original climate cleaning, one regex per cell
+        expected = climate_df[feature].apply(lambda x: float(re.sub(r"[^0-9.]", "", str(x).strip("."))))
+        np.testing.assert_allclose(cleaned[feature], expected)
+    hot = climate_df["HotScore"].apply(lambda x: float(x.strip(".")))
+    np.testing.assert_allclose(process.normalize(cleaned["HotScore"]),
+                               round((hot - hot.min()) / (hot.max() - hot.min()), 3))
+
+    # The original health cleaning, two lambdas per cell and a reversed scale
+    costs = health_df["HealthCosts"].replace("?", np.nan).apply(
+        lambda x: x.replace(",", "") if isinstance(x, str) else x).astype(float)
+    expected = round(abs((costs - costs.min()) / (costs.max() - costs.min()) - 1), 3)
+    cleaned = process.to_numbers(health_df, ["HealthCosts"])
+    np.testing.assert_allclose(process.normalize(cleaned["HealthCosts"], reverse=True), expected)
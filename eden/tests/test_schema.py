@@ -0,0 +1,39 @@
+"""Tests for parsing collected values and typing tables from the schema."""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+import eden.schema as schema
+
+
+def test_parse_numbers_matches_parse_number():
+    values = pd.Series(["53.7 in.", "646 ft.", "103.3 days", "$245,000", "1.05%", "-4", "?", "", None, 12])
+
+    numbers = schema.parse_numbers(values)
+
+    expected = [schema.parse_number(value) if value is not None else schema.MISSING for value in values]
+    expected = [np.nan if value == schema.MISSING else value for value in expected]
+    np.testing.assert_allclose(numbers.to_numpy(), np.array(expected, dtype=float))
+
+
+def test_apply_survives_a_csv_round_trip():
+    df = pd.DataFrame({
+        "Place": ["provo", "orem"],
+        "StateCode": ["ut", "ut"],
+        "Zip": ["84601 84604", "84057"],
+        "Fips": ["49049", "49049"],
+        "Rainfall": ["21.8 in.", "?"],
+        "HomeInsurance": [1234.5, np.nan],
+    })
+
+    typed = schema.apply(df)
+    csv = io.StringIO()
+    typed.to_csv(csv, index=False)
+    csv.seek(0)
+    read_back = schema.apply(pd.read_csv(csv, dtype={"Zip": str}))
+
+    assert typed["Rainfall"].dtype == np.float32 and typed["Fips"].dtype == "Int32"
+    pd.testing.assert_frame_equal(schema.apply(typed), typed)
+    pd.testing.assert_frame_equal(read_back, typed, check_categorical=False)
@@ -0,0 +1,25 @@
+"""Tests for the in-memory feature store."""
+
+import pandas as pd
+
+import eden.storage as storage
+
+
+def test_splice_replaces_a_recomputed_group_and_keeps_every_row():
+    store = storage.FeatureStore("all")
+    store.replace(pd.DataFrame({"Place": ["provo", "orem", "lehi"], "StateCode": ["ut", "ut", "ut"]}))
+    keys = ["Place", "StateCode"]
+
+    # The first time a group is added the join drops places without it
+    store.splice(pd.DataFrame({"Place": ["provo", "orem"], "StateCode": ["ut", "ut"], "Drought": [1.0, 2.0]}), keys)
+    assert store.read()["Place"].tolist() == ["provo", "orem"]
+
+    store.replace(store.read().assign(Density=[10.0, 20.0]))
+    store.splice(pd.DataFrame({"Place": ["orem"], "StateCode": ["ut"], "Drought": [5.0]}), keys)
+
+    df = store.read()
+    assert df.columns.tolist() == ["Place", "StateCode", "Density", "Drought"]
+    assert df["Place"].tolist() == ["provo", "orem"]
+    assert df["Density"].tolist() == [10.0, 20.0]
+    assert df["Drought"].isna().tolist() == [True, False]
+    assert df.loc[1, "Drought"] == 5.0